@@ -1,13 +1,191 @@
 # admin.py (لإدارة Django Admin)
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from .models import *
 
-admin.site.register(User)
-admin.site.register(Restaurant)
-admin.site.register(Menu)
-admin.site.register(Order)
-admin.site.register(OrderItem)
-admin.site.register(Payment)
-admin.site.register(Driver)
-admin.site.register(Delivery)
-admin.site.register(Review)
\ No newline at end of file
+
+# Paginator that avoids COUNT(*) on big unfiltered tables
+class EstimatedCountPaginator(Paginator):
+    # Below this many rows an exact count is cheap enough
+    EXACT_COUNT_THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                        [queryset.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] > self.EXACT_COUNT_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+# Base admin for high-volume tables
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin):
+    list_display = ['user_id', 'email', 'name', 'phone', 'is_active', 'is_staff', 'created_at']
+    list_filter = ['is_staff', 'is_active']
+    search_fields = ['email']
+    ordering = ['-user_id']
+
+
+@admin.register(Restaurant)
+class RestaurantAdmin(admin.ModelAdmin):
+    list_display = ['restaurant_id', 'name', 'cuisine_type', 'phone', 'rating']
+    search_fields = ['name']
+
+
+@admin.register(Menu)
+class MenuAdmin(LargeTableAdmin):
+    list_display = ['menu_id', 'item_name', 'restaurant', 'price', 'availability_status']
+    list_select_related = ['restaurant']
+    list_filter = ['availability_status']
+    search_fields = ['item_name']
+    autocomplete_fields = ['restaurant']
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    raw_id_fields = ['menu_item']
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['order_id', 'user', 'restaurant', 'order_status', 'total_amount', 'created_at']
+    list_select_related = ['user', 'restaurant']
+    list_filter = ['order_status']
+    date_hierarchy = 'created_at'
+    raw_id_fields = ['user']
+    autocomplete_fields = ['restaurant']
+    inlines = [OrderItemInline]
+    ordering = ['-order_id']
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ['order_item_id', 'order_id', 'menu_item', 'quantity', 'price']
+    list_select_related = ['menu_item__restaurant']
+    raw_id_fields = ['order', 'menu_item']
+    ordering = ['-order_item_id']
+
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ['payment_id', 'order_id', 'payment_method', 'payment_status', 'amount', 'transaction_id', 'paid_at']
+    list_filter = ['payment_status', 'payment_method']
+    date_hierarchy = 'paid_at'
+    search_fields = ['=transaction_id']
+    raw_id_fields = ['order']
+    ordering = ['-payment_id']
+
+
+@admin.register(Driver)
+class DriverAdmin(admin.ModelAdmin):
+    list_display = ['driver_id', 'name', 'phone', 'vehicle_type', 'availability_status']
+    list_filter = ['availability_status']
+    search_fields = ['name', 'phone']
+    raw_id_fields = ['user']
+
+
+@admin.register(Delivery)
+class DeliveryAdmin(LargeTableAdmin):
+    list_display = ['delivery_id', 'order_id', 'driver', 'delivery_status', 'estimated_time', 'actual_time']
+    list_select_related = ['driver']
+    list_filter = ['delivery_status']
+    raw_id_fields = ['order']
+    autocomplete_fields = ['driver']
+    ordering = ['-delivery_id']
+
+
+@admin.register(Review)
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ['review_id', 'user', 'restaurant', 'order_id', 'rating', 'helpful_count', 'created_at']
+    list_select_related = ['user', 'restaurant']
+    list_filter = ['rating']
+    date_hierarchy = 'created_at'
+    raw_id_fields = ['user', 'order']
+    autocomplete_fields = ['restaurant']
+    ordering = ['-review_id']
+
+
+@admin.register(ReviewVote)
+class ReviewVoteAdmin(LargeTableAdmin):
+    list_display = ['id', 'review_id', 'user', 'created_at']
+    list_select_related = ['user']
+    raw_id_fields = ['review', 'user']
+    ordering = ['-id']
+
+
+@admin.register(CatalogChange)
+class CatalogChangeAdmin(LargeTableAdmin):
+    list_display = ['seq', 'entity', 'object_id', 'action', 'changed_at']
+    list_filter = ['entity']
+    ordering = ['-seq']
+
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ['task_id', 'name', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status']
+    ordering = ['-task_id']
+
+
+@admin.register(RestaurantSalesRollup)
+class RestaurantSalesRollupAdmin(LargeTableAdmin):
+    list_display = ['restaurant', 'grain', 'bucket_start', 'order_count', 'revenue']
+    list_select_related = ['restaurant']
+    list_filter = ['grain']
+    autocomplete_fields = ['restaurant']
+
+
+@admin.register(MenuItemSalesRollup)
+class MenuItemSalesRollupAdmin(LargeTableAdmin):
+    list_display = ['menu_item', 'grain', 'bucket_start', 'quantity', 'revenue']
+    list_select_related = ['menu_item__restaurant']
+    list_filter = ['grain']
+    raw_id_fields = ['menu_item']
+    autocomplete_fields = ['restaurant']
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ['order_id', 'user_id', 'restaurant_id', 'order_status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['order_status']
+    date_hierarchy = 'created_at'
+    search_fields = ['=order_id', '=user_id']
+    ordering = ['-order_id']
+
+
+@admin.register(Promotion)
+class PromotionAdmin(admin.ModelAdmin):
+    list_display = ['promotion_id', 'name', 'kind', 'restaurant', 'code', 'starts_at', 'ends_at', 'is_active', 'used_count', 'max_uses']
+    list_select_related = ['restaurant']
+    list_filter = ['kind', 'is_active']
+    search_fields = ['name', '=code']
+    autocomplete_fields = ['restaurant']
+    raw_id_fields = ['menu_item']
+    readonly_fields = ['used_count']
+
+
+@admin.register(PromotionRedemption)
+class PromotionRedemptionAdmin(LargeTableAdmin):
+    list_display = ['id', 'promotion', 'order_id', 'amount', 'created_at']
+    list_select_related = ['promotion']
+    raw_id_fields = ['order', 'promotion']
+    ordering = ['-id']
@@ -0,0 +1,164 @@
+# analytics.py (إحصائيات المبيعات المجمعة مسبقاً)
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Order, OrderItem, RestaurantSalesRollup, MenuItemSalesRollup
+
+# Hourly rows older than this are dropped by compact_sales_rollups; daily rows are kept
+HOURLY_RETENTION_DAYS = 35
+MAX_STATS_DAYS = 366
+
+
+def bucket_starts(moment):
+    """Return ``{'hour': ..., 'day': ...}`` bucket starts in the local time zone."""
+    local = timezone.localtime(moment)
+    hour = local.replace(minute=0, second=0, microsecond=0)
+    return {'hour': hour, 'day': hour.replace(hour=0)}
+
+
+def _bump(model, keys, increments):
+    """Add ``increments`` to the row identified by ``keys``, creating it if needed."""
+    updates = {field: F(field) + value for field, value in increments.items()}
+    if model.objects.filter(**keys).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **increments)
+    except IntegrityError:
+        # Another worker created the row first
+        model.objects.filter(**keys).update(**updates)
+
+
+def _apply(orders, items):
+    """Fold delivered orders and their items into the rollup tables."""
+    restaurant_cells = defaultdict(lambda: [0, Decimal('0')])
+    item_cells = defaultdict(lambda: [0, Decimal('0')])
+    order_buckets = {}
+    for order_id, restaurant_id, created_at, total in orders:
+        buckets = bucket_starts(created_at)
+        order_buckets[order_id] = (restaurant_id, buckets)
+        for grain, start in buckets.items():
+            cell = restaurant_cells[(restaurant_id, grain, start)]
+            cell[0] += 1
+            cell[1] += total
+    for order_id, menu_item_id, quantity, price in items:
+        restaurant_id, buckets = order_buckets[order_id]
+        for grain, start in buckets.items():
+            cell = item_cells[(menu_item_id, restaurant_id, grain, start)]
+            cell[0] += quantity
+            cell[1] += price * quantity
+
+    for (restaurant_id, grain, start), (count, revenue) in restaurant_cells.items():
+        _bump(
+            RestaurantSalesRollup,
+            {'restaurant_id': restaurant_id, 'grain': grain, 'bucket_start': start},
+            {'order_count': count, 'revenue': revenue},
+        )
+    for (menu_item_id, restaurant_id, grain, start), (quantity, revenue) in item_cells.items():
+        _bump(
+            MenuItemSalesRollup,
+            {'menu_item_id': menu_item_id, 'restaurant_id': restaurant_id, 'grain': grain, 'bucket_start': start},
+            {'quantity': quantity, 'revenue': revenue},
+        )
+
+
+def record_orders(order_ids):
+    """Add delivered, not yet recorded orders to the rollups exactly once.
+
+    Returns the number of orders recorded.
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(order_id__in=order_ids, order_status='delivered', sales_recorded=False)
+            .values_list('order_id', 'restaurant_id', 'created_at', 'total_amount')
+        )
+        if not orders:
+            return 0
+        ids = [row[0] for row in orders]
+        items = OrderItem.objects.filter(order_id__in=ids).values_list(
+            'order_id', 'menu_item_id', 'quantity', 'price'
+        )
+        _apply(orders, items)
+        Order.objects.filter(order_id__in=ids).update(sales_recorded=True)
+    return len(orders)
+
+
+def record_pending(batch_size=500):
+    """Catch up on delivered orders whose rollup task never ran."""
+    total = 0
+    while True:
+        ids = list(
+            Order.objects.filter(order_status='delivered', sales_recorded=False)
+            .order_by('order_id')
+            .values_list('order_id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += record_orders(ids)
+
+
+def drop_old_hourly(retention_days=HOURLY_RETENTION_DAYS):
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = RestaurantSalesRollup.objects.filter(grain='hour', bucket_start__lt=cutoff).delete()
+    items_deleted, _ = MenuItemSalesRollup.objects.filter(grain='hour', bucket_start__lt=cutoff).delete()
+    return deleted + items_deleted
+
+
+def _average(revenue, count):
+    return str((revenue / count).quantize(Decimal('0.01'))) if count else '0.00'
+
+
+def _series(rows):
+    return [
+        {
+            'bucket_start': start,
+            'order_count': count,
+            'revenue': str(revenue),
+            'average_ticket': _average(revenue, count),
+        }
+        for start, count, revenue in rows
+    ]
+
+
+def restaurant_stats(restaurant_id, grain, start, end, top_items=10):
+    """Read a bounded window from the rollups; cost depends on the window only."""
+    rows = list(
+        RestaurantSalesRollup.objects.filter(
+            restaurant_id=restaurant_id, grain=grain, bucket_start__gte=start, bucket_start__lt=end
+        ).order_by('bucket_start').values_list('bucket_start', 'order_count', 'revenue')
+    )
+    order_count = sum(row[1] for row in rows)
+    revenue = sum((row[2] for row in rows), Decimal('0'))
+
+    top = (
+        MenuItemSalesRollup.objects.filter(
+            restaurant_id=restaurant_id, grain=grain, bucket_start__gte=start, bucket_start__lt=end
+        )
+        .values('menu_item', item_name=F('menu_item__item_name'))
+        .annotate(quantity_sold=Sum('quantity'), item_revenue=Sum('revenue'))
+        .order_by('-quantity_sold')[:top_items]
+    )
+    return {
+        'grain': grain,
+        'start': start,
+        'end': end,
+        'order_count': order_count,
+        'revenue': str(revenue),
+        'average_ticket': _average(revenue, order_count),
+        'series': _series(rows),
+        'top_items': [
+            {
+                'menu_item': row['menu_item'],
+                'item_name': row['item_name'],
+                'quantity': row['quantity_sold'],
+                'revenue': str(Decimal(row['item_revenue']).quantize(Decimal('0.01'))),
+            }
+            for row in top
+        ],
+    }
@@ -0,0 +1,197 @@
+# archive.py (نقل الطلبات المكتملة القديمة إلى جداول الأرشيف)
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .analytics import record_orders
+from .models import (
+    ArchivedDelivery, ArchivedOrder, ArchivedOrderItem, ArchivedPayment, ArchivedPromotionRedemption,
+    Delivery, Menu, Order, OrderItem, Payment, PromotionRedemption, Restaurant, Review,
+)
+from . import usercache
+
+# Orders newer than this stay in the hot tables whatever their status
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVABLE_STATUSES = ['delivered', 'canceled']
+
+# (hot model, archive model) pairs, in the order the report lists them
+ARCHIVED_TABLES = [
+    (Order, ArchivedOrder),
+    (OrderItem, ArchivedOrderItem),
+    (Payment, ArchivedPayment),
+    (Delivery, ArchivedDelivery),
+    (PromotionRedemption, ArchivedPromotionRedemption),
+]
+
+
+def _copy(model, archive_model, order_ids, fields):
+    rows = model.objects.filter(order_id__in=order_ids).values(*fields)
+    archive_model.objects.bulk_create([archive_model(**row) for row in rows])
+
+
+def archive_batch(order_ids):
+    """Move the given finished orders and their rows into the archive tables.
+
+    Delivered orders are added to the sales rollups and item pair counts
+    first so nothing is lost from the stats; completed deliveries keep feeding
+    the ETA model from the archive. Reviews stay in place with their order set to NULL.
+    Returns the number of orders moved.
+    """
+    # numpy is heavy, keep it out of web worker startup
+    from .recommendations import record_orders as record_pairs
+
+    record_orders(order_ids)
+    record_pairs(order_ids)
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(order_id__in=order_ids, order_status__in=ARCHIVABLE_STATUSES)
+            .values('order_id', 'user_id', 'restaurant_id', 'order_status', 'total_amount',
+                    'discount_amount', 'delivery_fee', 'stock_status', 'created_at')
+        )
+        if not orders:
+            return 0
+        ids = [row['order_id'] for row in orders]
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in orders])
+        _copy(OrderItem, ArchivedOrderItem, ids,
+              ['order_item_id', 'order_id', 'menu_item_id', 'quantity', 'price'])
+        _copy(Payment, ArchivedPayment, ids,
+              ['payment_id', 'order_id', 'payment_method', 'payment_status', 'transaction_id',
+               'amount', 'paid_at', 'settled_at'])
+        _copy(Delivery, ArchivedDelivery, ids,
+              ['delivery_id', 'order_id', 'driver_id', 'delivery_status', 'assigned_at',
+               'estimated_time', 'actual_time', 'eta_recorded'])
+        _copy(PromotionRedemption, ArchivedPromotionRedemption, ids,
+              ['id', 'order_id', 'promotion_id', 'amount', 'created_at'])
+        # Set-based deletes: no per-row signals or collector queries
+        Review.objects.filter(order_id__in=ids).update(order=None)
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Payment.objects.filter(order_id__in=ids).delete()
+        Delivery.objects.filter(order_id__in=ids).delete()
+        PromotionRedemption.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(order_id__in=ids).delete()
+        user_ids = {row['user_id'] for row in orders}
+        transaction.on_commit(lambda: usercache.invalidate_archived_orders(*user_ids))
+    return len(ids)
+
+
+def archive_orders(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=1000):
+    """Archive finished orders older than the hot window in short transactions."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Order.objects.filter(
+                order_id__gt=last_id, created_at__lt=cutoff, order_status__in=ARCHIVABLE_STATUSES
+            )
+            .order_by('order_id')
+            .values_list('order_id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += archive_batch(ids)
+        last_id = ids[-1]
+
+
+def table_sizes():
+    """Row count and on-disk size (PostgreSQL only, else None) per hot/archive table."""
+    report = []
+    for model, archive_model in ARCHIVED_TABLES:
+        for current in (model, archive_model):
+            table = current._meta.db_table
+            size = None
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_total_relation_size(%s::regclass)', [table])
+                    size = cursor.fetchone()[0]
+            report.append((table, current.objects.count(), size))
+    return report
+
+
+def load_archived_orders(user, offset, limit):
+    """One page of a user's archived orders, ready for ArchivedOrderSerializer."""
+    orders = list(
+        ArchivedOrder.objects.filter(user_id=user.pk)
+        .order_by('-created_at', '-order_id')[offset:offset + limit]
+    )
+    if not orders:
+        return orders
+    items = list(ArchivedOrderItem.objects.filter(order_id__in=[o.order_id for o in orders]))
+    menus = {
+        row[0]: row[1:]
+        for row in Menu.objects.filter(menu_id__in={i.menu_item_id for i in items})
+        .values_list('menu_id', 'item_name', 'price')
+    }
+    restaurants = dict(
+        Restaurant.objects.filter(restaurant_id__in={o.restaurant_id for o in orders})
+        .values_list('restaurant_id', 'name')
+    )
+    by_order = {o.order_id: o for o in orders}
+    for order in orders:
+        order.items = []
+        order.user_email = user.email
+        order.restaurant_name = restaurants.get(order.restaurant_id)
+    for item in items:
+        item.item_name, item.item_price = menus.get(item.menu_item_id, (None, None))
+        by_order[item.order_id].items.append(item)
+    return orders
+
+
+class OrderHistoryPagination(PageNumberPagination):
+    """Page numbers over the hot orders followed by the archived ones.
+
+    The archive table is only read once the requested page runs past the
+    user's hot orders; its size comes from the per-user cache.
+    """
+
+    def paginate_history(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            raise NotFound('صفحة غير صالحة')
+        if self.number < 1:
+            raise NotFound('صفحة غير صالحة')
+
+        offset = (self.number - 1) * self.page_size
+        hot_count = queryset.count()
+        self.count = hot_count + usercache.get_archived_order_count(request.user)
+        if offset and offset >= self.count:
+            raise NotFound('صفحة غير صالحة')
+
+        hot = list(queryset[offset:offset + self.page_size]) if offset < hot_count else []
+        archived = []
+        if len(hot) < self.page_size and self.count > hot_count:
+            archived = load_archived_orders(
+                request.user, max(0, offset - hot_count), self.page_size - len(hot)
+            )
+        return hot, archived
+
+    def get_next_link(self):
+        if self.number * self.page_size >= self.count:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.number + 1)
+
+    def get_previous_link(self):
+        if self.number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
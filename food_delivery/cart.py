@@ -0,0 +1,210 @@
+# cart.py (سلة المشتريات على الخادم مع لقطات الأسعار)
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Cart, CatalogChange, Menu
+
+MAX_QUANTITY = 99
+
+
+class CartError(Exception):
+    pass
+
+
+class CartChanged(CartError):
+    """Some lines were re-priced or became unavailable since they were added."""
+
+    def __init__(self, cart):
+        super().__init__('تغيرت بعض عناصر السلة، يرجى المراجعة')
+        self.cart = cart
+
+
+def empty_cart():
+    return {'restaurant': None, 'items': {}}
+
+
+def get_cart(user_id):
+    data = Cart.objects.filter(user_id=user_id).values_list('data', flat=True).first()
+    return data or empty_cart()
+
+
+def _locked_cart(user_id):
+    # The Cart row is the only copy, shared by every worker: mutations
+    # read it under a row lock so two tabs can't overwrite each other
+    data = (
+        Cart.objects.select_for_update().filter(user_id=user_id).values_list('data', flat=True).first()
+    )
+    return data or empty_cart()
+
+
+def _save(user_id, data):
+    if data['items']:
+        Cart.objects.update_or_create(user_id=user_id, defaults={'data': data})
+    else:
+        data['restaurant'] = None
+        Cart.objects.filter(user_id=user_id).delete()
+    return data
+
+
+def catalog_seq():
+    """Current catalog change-log position, used as the version of a snapshot."""
+    return CatalogChange.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+
+def _snapshot(menu, quantity, seq):
+    return {
+        'quantity': quantity,
+        'item_name': menu['item_name'],
+        'price': str(menu['price']),
+        'available': menu['availability_status'] == 'available',
+        'seq': seq,
+    }
+
+
+def _menu_rows(menu_ids):
+    return {
+        row['menu_id']: row for row in Menu.objects.filter(menu_id__in=menu_ids).values(
+            'menu_id', 'restaurant_id', 'item_name', 'price', 'availability_status', 'stock'
+        )
+    }
+
+
+@transaction.atomic
+def add_item(user_id, menu_id, quantity):
+    data = _locked_cart(user_id)
+    # Read the version before the row so a change in between is seen at checkout
+    seq = catalog_seq()
+    menu = _menu_rows([menu_id]).get(menu_id)
+    if menu is None:
+        raise CartError('عنصر القائمة غير موجود')
+    if menu['availability_status'] != 'available':
+        raise CartError('هذا العنصر غير متاح حالياً')
+    if data['restaurant'] not in (None, menu['restaurant_id']):
+        raise CartError('لا يمكن الطلب من أكثر من مطعم في نفس السلة')
+
+    line = data['items'].get(str(menu_id))
+    quantity += line['quantity'] if line else 0
+    if quantity > MAX_QUANTITY:
+        raise CartError(f'الحد الأقصى للكمية هو {MAX_QUANTITY}')
+    if menu['stock'] is not None and quantity > menu['stock']:
+        raise CartError('الكمية المتوفرة غير كافية')
+    data['restaurant'] = menu['restaurant_id']
+    data['items'][str(menu_id)] = _snapshot(menu, quantity, seq)
+    return _save(user_id, data)
+
+
+@transaction.atomic
+def update_quantity(user_id, menu_id, quantity):
+    """Change a line's quantity from its snapshot; 0 removes it."""
+    data = _locked_cart(user_id)
+    line = data['items'].get(str(menu_id))
+    if line is None:
+        raise CartError('العنصر غير موجود في السلة')
+    if quantity:
+        line['quantity'] = quantity
+    else:
+        del data['items'][str(menu_id)]
+    return _save(user_id, data)
+
+
+def clear(user_id):
+    return _save(user_id, empty_cart())
+
+
+def refresh_changed(data):
+    """Re-read only the lines whose menu item changed since its snapshot.
+
+    Returns True when a re-read line's price or availability differs, with
+    the cart updated in place.
+    """
+    items = data['items']
+    if not items:
+        return False
+    ids = [int(menu_id) for menu_id in items]
+    latest = dict(
+        CatalogChange.objects.filter(
+            entity='menu', object_id__in=ids, seq__gt=min(line['seq'] for line in items.values())
+        ).order_by().values_list('object_id').annotate(last=Max('seq'))
+    )
+    stale = [menu_id for menu_id in ids if latest.get(menu_id, 0) > items[str(menu_id)]['seq']]
+    if not stale:
+        return False
+
+    seq = catalog_seq()
+    rows = _menu_rows(stale)
+    changed = False
+    for menu_id in stale:
+        line = items[str(menu_id)]
+        menu = rows.get(menu_id)
+        if menu is None or menu['restaurant_id'] != data['restaurant']:
+            # Deleted items can't be ordered: keep the line so the client can show why
+            fresh = dict(line, available=False, seq=seq)
+        else:
+            fresh = _snapshot(menu, line['quantity'], seq)
+        changed |= (fresh['price'], fresh['available']) != (line['price'], line['available'])
+        items[str(menu_id)] = fresh
+    return changed
+
+
+def checkout(user_id, coupon=''):
+    """Turn the cart into a pending order, re-checking only changed menu items.
+
+    Raises CartChanged (with the refreshed cart) when a price or
+    availability moved since the items were added.
+    """
+    from .serializers import CreateOrderSerializer
+
+    changed = None
+    with transaction.atomic():
+        data = _locked_cart(user_id)
+        if not data['items']:
+            raise CartError('السلة فارغة')
+        if refresh_changed(data) or not all(line['available'] for line in data['items'].values()):
+            # Committed before CartChanged is raised: the refreshed snapshots
+            # are what the client reviews next
+            changed = _save(user_id, data)
+        else:
+            # Deleting the row claims the cart: a double-tapped checkout, on
+            # this worker or another, finds nothing left to order
+            if not Cart.objects.filter(user_id=user_id).delete()[0]:
+                raise CartError('جارٍ إتمام طلب آخر من هذه السلة')
+            items = [
+                {
+                    'menu_item': Menu(menu_id=int(menu_id), restaurant_id=data['restaurant']),
+                    'quantity': line['quantity'],
+                    'price': Decimal(line['price']),
+                }
+                for menu_id, line in data['items'].items()
+            ]
+            # Same path as a client-built order: stock is reserved there. The
+            # prices are the snapshots refresh_changed just checked, not re-read
+            order = CreateOrderSerializer(context={'prices_checked': True}).create({
+                'user_id': user_id,
+                'restaurant_id': data['restaurant'],
+                'items': items,
+                'coupon': coupon,
+            })
+    if changed is not None:
+        raise CartChanged(changed)
+    return order
+
+
+def summary(data):
+    lines = [
+        {
+            'menu_item': int(menu_id),
+            'item_name': line['item_name'],
+            'price': line['price'],
+            'quantity': line['quantity'],
+            'available': line['available'],
+            'line_total': str(Decimal(line['price']) * line['quantity']),
+        }
+        for menu_id, line in data['items'].items()
+    ]
+    return {
+        'restaurant': data['restaurant'],
+        'items': lines,
+        'total': str(sum((Decimal(line['line_total']) for line in lines), Decimal('0'))),
+    }
@@ -0,0 +1,46 @@
+# checks.py (فحوصات النظام لإعدادات الوسائط حسب المسار وبوابة الدفع)
+from django.conf import settings
+from django.core.checks import Error, register
+
+# What admin.E408-E410 look for in MIDDLEWARE
+ADMIN_MIDDLEWARE = [
+    ('django.contrib.auth.middleware.AuthenticationMiddleware', 'admin.E408'),
+    ('django.contrib.messages.middleware.MessageMiddleware', 'admin.E409'),
+    ('django.contrib.sessions.middleware.SessionMiddleware', 'admin.E410'),
+]
+
+
+@register()
+def check_admin_middleware(app_configs, **kwargs):
+    """The admin's session, auth and messages middleware, wherever /admin/ gets them."""
+    from .middleware import scope_prefix
+
+    scopes = getattr(settings, 'SCOPED_MIDDLEWARE', {})
+    prefix = scope_prefix('/admin/', scopes)
+    available = list(settings.MIDDLEWARE) + list(scopes.get(prefix, ()) if prefix is not None else ())
+    return [
+        Error(
+            f"'{path}' must be in MIDDLEWARE or in the SCOPED_MIDDLEWARE chain serving /admin/.",
+            id=f'food_delivery.{check_id.split(".")[1]}',
+        )
+        for path, check_id in ADMIN_MIDDLEWARE
+        if path not in available
+    ]
+
+
+@register(deploy=True)
+def check_payment_webhook_secret(app_configs, **kwargs):
+    """Without a secret every gateway webhook is rejected with a 403.
+
+    A deploy check: gunicorn.conf.py runs these before serving, while tests
+    and management commands that never receive webhooks run without one.
+    """
+    options = getattr(settings, 'PAYMENT_GATEWAY', {}).get('OPTIONS', {})
+    if options.get('webhook_secret'):
+        return []
+    return [
+        Error(
+            "PAYMENT_GATEWAY['OPTIONS']['webhook_secret'] is empty: set PAYMENT_WEBHOOK_SECRET.",
+            id='food_delivery.E001',
+        )
+    ]
@@ -0,0 +1,179 @@
+# compression.py (ضغط الاستجابات gzip/Brotli وتخزين الكتالوج مضغوطاً)
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .models import CatalogChange
+from .usercache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    # Pre-compressed catalog variants are written once, so spend more CPU on them
+    'CACHED_GZIP_LEVEL': 9,
+    'CACHED_BROTLI_QUALITY': 11,
+    'CACHE_MAX_BYTES': 64 * 1024 * 1024,
+    'CACHE_MAX_ENTRIES': 5000,
+    'CACHE_TTL': 3600,
+    'EXCLUDE_PATHS': [],
+}
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+def config(name):
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+def accepted_encodings(request):
+    """Codings the client accepts (q > 0), e.g. ``{'br', 'gzip'}``."""
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request):
+    accepted = accepted_encodings(request)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, cached=False):
+    if encoding == 'br':
+        quality = config('CACHED_BROTLI_QUALITY' if cached else 'BROTLI_QUALITY')
+        return brotli.compress(data, quality=quality)
+    level = config('CACHED_GZIP_LEVEL' if cached else 'GZIP_LEVEL')
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class VariantStore:
+    """Bounded LRU of encoded bodies keyed by content hash, sized in bytes."""
+
+    def __init__(self, max_bytes, max_entries):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest, encoding):
+        with self._lock:
+            variants = self._data.get(digest)
+            if variants is None:
+                return None
+            self._data.move_to_end(digest)
+            return variants.get(encoding)
+
+    def add(self, digest, encoding, body):
+        with self._lock:
+            variants = self._data.setdefault(digest, {})
+            self._data.move_to_end(digest)
+            if encoding in variants:
+                return
+            variants[encoding] = body
+            self.size += len(body)
+            while self._data and (self.size > self.max_bytes or len(self._data) > self.max_entries):
+                _, evicted = self._data.popitem(last=False)
+                self.size -= sum(len(b) for b in evicted.values())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+
+variants = VariantStore(config('CACHE_MAX_BYTES'), config('CACHE_MAX_ENTRIES'))
+# (generation, absolute URL) -> content hash; entries die with their generation
+cached_paths = LRUCache(maxsize=config('CACHE_MAX_ENTRIES'), ttl=config('CACHE_TTL'))
+
+
+def catalog_generation():
+    """The catalog change-log position: every catalog write adds a CatalogChange row.
+
+    Read from the database rather than the cache, so writes from another
+    worker, the task runner or import_catalog retire this worker's entries.
+    """
+    return CatalogChange.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+
+def cached_catalog_response(request, render, renderer_context):
+    """Serve a public catalog GET from the pre-compressed cache.
+
+    ``render`` produces the DRF Response on a miss; only 200 JSON responses
+    are stored. The body is stored once per content hash in every encoding
+    the client asks for, so identical pages (e.g. the same menu reached by
+    different query strings) share their compressed bytes.
+    """
+    renderer = request.accepted_renderer
+    if renderer.format != 'json':
+        return render()
+
+    # The absolute URL, not just the path: pagination links in the body carry the host
+    key = f'{catalog_generation()}:{request.build_absolute_uri()}'
+    digest = cached_paths.get(key)
+    encoding = choose_encoding(request) or 'identity'
+    body = variants.get(digest, encoding) if digest else None
+    if body is None:
+        identity = variants.get(digest, 'identity') if digest else None
+        if identity is None:
+            response = render()
+            if response.status_code != 200:
+                return response
+            identity = renderer.render(response.data, request.accepted_media_type, renderer_context)
+            digest = hashlib.sha256(identity).hexdigest()[:32]
+            variants.add(digest, 'identity', identity)
+            cached_paths.set(key, digest)
+        body = identity if encoding == 'identity' else compress(identity, encoding, cached=True)
+        variants.add(digest, encoding, body)
+
+    # One tag per encoded representation; any of them proves the client has this content
+    etag = f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+    if digest in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=renderer.media_type)
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+class CachedCatalogMixin:
+    """Pre-compressed, cached list/retrieve for public catalog viewsets."""
+
+    def list(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request, lambda: super(CachedCatalogMixin, self).list(request, *args, **kwargs),
+            self.get_renderer_context(),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request, lambda: super(CachedCatalogMixin, self).retrieve(request, *args, **kwargs),
+            self.get_renderer_context(),
+        )
@@ -0,0 +1,157 @@
+# dispatch.py (تعيين السائقين للطلبات الجاهزة دفعة واحدة)
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, Driver, Delivery
+from .eta import predict_estimated_times
+
+# Orders in these states have been accepted by the restaurant and need a driver
+READY_STATUSES = ['confirmed', 'preparing']
+
+EARTH_RADIUS_KM = 6371.0
+# Used when a restaurant or driver has no coordinates yet
+UNKNOWN_DISTANCE_KM = 5.0
+# How many kilometres of extra driving one minute of customer waiting is worth
+WAIT_WEIGHT_KM_PER_MIN = 0.1
+DEFAULT_MAX_DISTANCE_KM = 15.0
+
+
+def haversine_matrix(lat1, lng1, lat2, lng2):
+    """Pairwise great-circle distance in km between two sets of points (rows x cols)."""
+    lat1 = np.radians(lat1)[:, None]
+    lng1 = np.radians(lng1)[:, None]
+    lat2 = np.radians(lat2)[None, :]
+    lng2 = np.radians(lng2)[None, :]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def build_cost_matrix(order_lat, order_lng, wait_minutes, driver_lat, driver_lng,
+                      max_distance_km=DEFAULT_MAX_DISTANCE_KM):
+    """Return ``(cost, distance)`` matrices of shape (orders, drivers).
+
+    Cost is pickup distance minus a bonus for how long the order has waited,
+    so older orders win ties for the same driver. Pairs beyond
+    ``max_distance_km`` get an infinite cost.
+    """
+    distance = haversine_matrix(order_lat, order_lng, driver_lat, driver_lng)
+    np.nan_to_num(distance, copy=False, nan=UNKNOWN_DISTANCE_KM)
+    cost = distance - WAIT_WEIGHT_KM_PER_MIN * np.asarray(wait_minutes, dtype=float)[:, None]
+    cost[distance > max_distance_km] = np.inf
+    return cost, distance
+
+
+def assign_greedy(cost):
+    """Cheapest-pair-first assignment. Returns a list of (order_idx, driver_idx)."""
+    n_orders, n_drivers = cost.shape
+    if not n_orders or not n_drivers:
+        return []
+    flat = np.argsort(cost, axis=None, kind='stable')
+    finite = np.isfinite(cost.ravel()[flat])
+    flat = flat[finite]
+
+    rows, cols = np.divmod(flat, n_drivers)
+    used_orders = np.zeros(n_orders, dtype=bool)
+    used_drivers = np.zeros(n_drivers, dtype=bool)
+    pairs = []
+    limit = min(n_orders, n_drivers)
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        if used_orders[r] or used_drivers[c]:
+            continue
+        used_orders[r] = used_drivers[c] = True
+        pairs.append((r, c))
+        if len(pairs) == limit:
+            break
+    return pairs
+
+
+def assign_hungarian(cost):
+    """Optimal assignment; needs SciPy, which is not a hard dependency."""
+    from scipy.optimize import linear_sum_assignment
+
+    finite = np.isfinite(cost)
+    if not finite.any():
+        return []
+    penalty = cost[finite].max() + 1e6
+    rows, cols = linear_sum_assignment(np.where(finite, cost, penalty))
+    return [(r, c) for r, c in zip(rows.tolist(), cols.tolist()) if finite[r, c]]
+
+
+ASSIGNERS = {
+    'greedy': assign_greedy,
+    'hungarian': assign_hungarian,
+}
+
+
+def _coords(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def dispatch_pending_orders(method='greedy', max_distance_km=DEFAULT_MAX_DISTANCE_KM, limit=None):
+    """Assign available drivers to ready, undelivered orders in one batch.
+
+    Returns the list of created ``Delivery`` objects.
+    """
+    assign = ASSIGNERS[method]
+    now = timezone.now()
+
+    with transaction.atomic():
+        orders_qs = (
+            Order.objects.filter(order_status__in=READY_STATUSES, delivery__isnull=True)
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('created_at')
+            .values_list(
+                'order_id', 'created_at', 'restaurant_id',
+                'restaurant__latitude', 'restaurant__longitude',
+            )
+        )
+        drivers_qs = (
+            Driver.objects.filter(availability_status='available')
+            .select_for_update(skip_locked=True)
+            .values_list('driver_id', 'vehicle_type', 'latitude', 'longitude')
+        )
+        if limit:
+            orders_qs = orders_qs[:limit]
+            drivers_qs = drivers_qs[:limit]
+        orders = list(orders_qs)
+        drivers = list(drivers_qs)
+        if not orders or not drivers:
+            return []
+
+        order_ids, created, restaurant_ids, order_lat, order_lng = zip(*orders)
+        driver_ids, vehicle_types, driver_lat, driver_lng = zip(*drivers)
+        wait_minutes = [(now - ts).total_seconds() / 60 for ts in created]
+
+        cost, distance = build_cost_matrix(
+            _coords(order_lat), _coords(order_lng), wait_minutes,
+            _coords(driver_lat), _coords(driver_lng),
+            max_distance_km=max_distance_km,
+        )
+        pairs = assign(cost)
+        if not pairs:
+            return []
+
+        estimated = predict_estimated_times(
+            [restaurant_ids[r] for r, _ in pairs],
+            [vehicle_types[c] for _, c in pairs],
+            started_at=now,
+        )
+        deliveries = [
+            Delivery(
+                order_id=order_ids[r],
+                driver_id=driver_ids[c],
+                delivery_status='assigned',
+                assigned_at=now,
+                estimated_time=eta,
+            )
+            for (r, c), eta in zip(pairs, estimated)
+        ]
+        Delivery.objects.bulk_create(deliveries, batch_size=500)
+        Driver.objects.filter(driver_id__in=[driver_ids[c] for _, c in pairs]).update(
+            availability_status='busy'
+        )
+    return deliveries
@@ -0,0 +1,98 @@
+# driver_sync.py (مزامنة حالات التوصيل من تطبيق السائق دفعة واحدة)
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .models import Delivery, Driver, Order
+from .tasks import enqueue_on_commit
+from .usercache import invalidate_active_orders
+
+# Allowed delivery status changes; anything else is reported, not applied
+TRANSITIONS = {
+    'assigned': {'on_the_way', 'delivered', 'canceled'},
+    'on_the_way': {'delivered', 'canceled'},
+    'delivered': set(),
+    'canceled': set(),
+}
+
+
+def apply_driver_sync(driver_id, updates, locations=()):
+    """Apply a backlog of status changes and location stamps for one driver.
+
+    ``updates`` is a list of ``{'delivery_id', 'delivery_status', 'recorded_at'}``
+    applied in order; ``locations`` a list of ``{'latitude', 'longitude',
+    'recorded_at'}`` of which only the newest is stored. Writes are one UPDATE
+    per resulting status (plus one for orders and one for the location)
+    whatever the batch size. Returns one result dict per update.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        current = dict(
+            Delivery.objects.select_for_update()
+            .filter(driver_id=driver_id, delivery_id__in={u['delivery_id'] for u in updates})
+            .values_list('delivery_id', 'delivery_status')
+        )
+        state = dict(current)
+        delivered_at = {}
+        results = []
+        for update in updates:
+            delivery_id = update['delivery_id']
+            new_status = update['delivery_status']
+            old_status = state.get(delivery_id)
+            if old_status is None:
+                outcome = 'not_found'
+            elif new_status == old_status:
+                outcome = 'unchanged'
+            elif new_status not in TRANSITIONS[old_status]:
+                outcome = 'invalid_transition'
+            else:
+                state[delivery_id] = new_status
+                if new_status == 'delivered':
+                    delivered_at[delivery_id] = min(update.get('recorded_at') or now, now)
+                outcome = 'applied'
+            results.append({
+                'delivery_id': delivery_id,
+                'result': outcome,
+                'delivery_status': state.get(delivery_id),
+            })
+
+        by_status = defaultdict(list)
+        for delivery_id, new_status in state.items():
+            if new_status != current[delivery_id]:
+                by_status[new_status].append(delivery_id)
+
+        for new_status, ids in by_status.items():
+            fields = {'delivery_status': new_status}
+            if new_status == 'delivered':
+                fields['actual_time'] = Case(
+                    *[When(delivery_id=pk, then=Value(delivered_at[pk])) for pk in ids],
+                    output_field=DateTimeField(),
+                )
+            Delivery.objects.filter(delivery_id__in=ids).update(**fields)
+
+        delivered = by_status.get('delivered', [])
+        if delivered:
+            order_ids = list(
+                Delivery.objects.filter(delivery_id__in=delivered).values_list('order_id', flat=True)
+            )
+            Order.objects.filter(order_id__in=order_ids).update(order_status='delivered')
+            user_ids = set(Order.objects.filter(order_id__in=order_ids).values_list('user_id', flat=True))
+            transaction.on_commit(lambda: invalidate_active_orders(*user_ids))
+            # .update() skips post_save, so queue the rollup work explicitly
+            enqueue_on_commit('record_order_sales', order_ids=order_ids)
+
+        for delivery_id in delivered + by_status.get('canceled', []):
+            enqueue_on_commit(
+                'delivery_status_changed', delivery_id=delivery_id, delivery_status=state[delivery_id]
+            )
+
+        if locations:
+            latest = max(locations, key=lambda loc: loc.get('recorded_at') or now)
+            Driver.objects.filter(driver_id=driver_id).update(
+                latitude=latest['latitude'],
+                longitude=latest['longitude'],
+                location_updated_at=min(latest.get('recorded_at') or now, now),
+            )
+    return results
@@ -0,0 +1,241 @@
+# eta.py (تقدير وقت التوصيل من التوصيلات السابقة)
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from operator import itemgetter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedDelivery, ArchivedOrder, Delivery, Driver, EtaStat
+
+# Used before any delivery has been completed
+DEFAULT_ETA_SECONDS = 35 * 60
+# Pseudo-count pulling sparse cells towards their coarser estimate
+SMOOTHING = 5.0
+# How long a process keeps its in-memory table before re-reading EtaStat
+TABLE_TTL_SECONDS = 300
+# Durations outside this range are bad data (e.g. status fixed days later)
+MIN_SECONDS = 60
+MAX_SECONDS = 4 * 60 * 60
+# Deliveries read per table and round by refresh_stats
+REFRESH_BATCH = 5000
+
+
+def normalize_vehicle(vehicle_type):
+    return (vehicle_type or '').strip().lower()
+
+
+def _completed(model):
+    return model.objects.filter(delivery_status='delivered', actual_time__isnull=False)
+
+
+def _archived_rows():
+    # ArchivedDelivery keeps plain ids, so the order and driver columns come from subqueries
+    order = ArchivedOrder.objects.filter(order_id=OuterRef('order_id'))
+    return (
+        _completed(ArchivedDelivery)
+        .annotate(
+            restaurant_id=Subquery(order.values('restaurant_id')[:1]),
+            vehicle_type=Subquery(
+                Driver.objects.filter(driver_id=OuterRef('driver_id')).values('vehicle_type')[:1]
+            ),
+            started_at=Coalesce('assigned_at', Subquery(order.values('created_at')[:1])),
+        )
+        .order_by('actual_time')
+        .values_list('restaurant_id', 'vehicle_type', 'started_at', 'actual_time')
+    )
+
+
+def completed_deliveries(delivery_ids=None, archived_ids=None):
+    """Yield ``(restaurant_id, hour, vehicle_type, seconds, actual_time)`` observations.
+
+    Hot and archived deliveries are merged in ``actual_time`` order. Pass
+    ``delivery_ids`` and ``archived_ids`` to read only those rows.
+    """
+    hot = (
+        _completed(Delivery)
+        .annotate(started_at=Coalesce('assigned_at', 'order__created_at'))
+        .order_by('actual_time')
+        .values_list('order__restaurant_id', 'driver__vehicle_type', 'started_at', 'actual_time')
+    )
+    archived = _archived_rows()
+    if delivery_ids is not None:
+        hot = hot.filter(delivery_id__in=delivery_ids)
+    if archived_ids is not None:
+        archived = archived.filter(delivery_id__in=archived_ids)
+    rows = heapq.merge(
+        hot.iterator(chunk_size=2000), archived.iterator(chunk_size=2000), key=itemgetter(3)
+    )
+    for restaurant_id, vehicle_type, started_at, actual_time in rows:
+        if started_at is None:
+            continue
+        seconds = (actual_time - started_at).total_seconds()
+        if not MIN_SECONDS <= seconds <= MAX_SECONDS:
+            continue
+        hour = timezone.localtime(started_at).hour
+        yield restaurant_id, hour, normalize_vehicle(vehicle_type), seconds, actual_time
+
+
+def aggregate(observations):
+    """Sum observations into ``{(restaurant_id, hour, vehicle): [count, total, last]}``."""
+    cells = defaultdict(lambda: [0, 0.0, None])
+    for restaurant_id, hour, vehicle, seconds, actual_time in observations:
+        cell = cells[(restaurant_id, hour, vehicle)]
+        cell[0] += 1
+        cell[1] += seconds
+        cell[2] = actual_time
+    return cells
+
+
+def _pending(model):
+    return _completed(model).filter(eta_recorded=False).select_for_update().order_by('delivery_id')
+
+
+def _fold(cells):
+    existing = {
+        (stat.restaurant_id, stat.hour, stat.vehicle_type): stat
+        for stat in EtaStat.objects.select_for_update().filter(
+            restaurant_id__in={key[0] for key in cells}
+        )
+    }
+    to_create, to_update = [], []
+    for key, (count, total, last) in cells.items():
+        stat = existing.get(key)
+        if stat is None:
+            to_create.append(EtaStat(
+                restaurant_id=key[0], hour=key[1], vehicle_type=key[2],
+                sample_count=count, total_seconds=total, last_observed_at=last,
+            ))
+        else:
+            stat.sample_count += count
+            stat.total_seconds += total
+            stat.last_observed_at = max(stat.last_observed_at, last)
+            to_update.append(stat)
+    EtaStat.objects.bulk_create(to_create, batch_size=1000)
+    EtaStat.objects.bulk_update(
+        to_update, ['sample_count', 'total_seconds', 'last_observed_at'], batch_size=1000
+    )
+
+
+def refresh_stats(full=False):
+    """Fold completed deliveries not counted yet into EtaStat.
+
+    Progress is the ``eta_recorded`` flag, not an ``actual_time`` watermark:
+    the driver app's offline sync back-dates ``actual_time``, so a delivery
+    can arrive older than ones already counted.
+    Returns the number of deliveries processed.
+    """
+    processed = 0
+    with transaction.atomic():
+        if full:
+            EtaStat.objects.all().delete()
+            Delivery.objects.filter(eta_recorded=True).update(eta_recorded=False)
+            ArchivedDelivery.objects.filter(eta_recorded=True).update(eta_recorded=False)
+        while True:
+            delivery_ids = list(_pending(Delivery).values_list('delivery_id', flat=True)[:REFRESH_BATCH])
+            archived_ids = list(
+                _pending(ArchivedDelivery).values_list('delivery_id', flat=True)[:REFRESH_BATCH]
+            )
+            if not delivery_ids and not archived_ids:
+                break
+            cells = aggregate(completed_deliveries(delivery_ids, archived_ids))
+            if cells:
+                _fold(cells)
+            # Bad data is marked too, so it isn't read again on every refresh
+            Delivery.objects.filter(delivery_id__in=delivery_ids).update(eta_recorded=True)
+            ArchivedDelivery.objects.filter(delivery_id__in=archived_ids).update(eta_recorded=True)
+            processed += sum(cell[0] for cell in cells.values())
+    if processed or full:
+        invalidate()
+    return processed
+
+
+class EtaTable:
+    """Dense (restaurant x hour x vehicle) array of expected delivery seconds.
+
+    Index 0 on the restaurant and vehicle axes is the "unknown" slot, so any
+    lookup hits a smoothed fallback instead of a missing key.
+    """
+
+    def __init__(self, cells):
+        restaurant_ids = sorted({key[0] for key in cells})
+        vehicles = sorted({key[2] for key in cells})
+        self.restaurant_index = {rid: i + 1 for i, rid in enumerate(restaurant_ids)}
+        self.vehicle_index = {v: i + 1 for i, v in enumerate(vehicles)}
+
+        shape = (len(restaurant_ids) + 1, 24, len(vehicles) + 1)
+        counts = np.zeros(shape)
+        totals = np.zeros(shape)
+        for (rid, hour, vehicle), cell in cells.items():
+            idx = (self.restaurant_index[rid], hour, self.vehicle_index[vehicle])
+            counts[idx] += cell[0]
+            totals[idx] += cell[1]
+
+        n = counts.sum()
+        global_mean = totals.sum() / n if n else DEFAULT_ETA_SECONDS
+
+        # hour x vehicle across all restaurants
+        hv_mean = (totals.sum(axis=0) + SMOOTHING * global_mean) / (counts.sum(axis=0) + SMOOTHING)
+        # restaurant-wide slowness relative to the global mean
+        r_mean = (totals.sum(axis=(1, 2)) + SMOOTHING * global_mean) / (counts.sum(axis=(1, 2)) + SMOOTHING)
+        r_factor = r_mean / global_mean
+
+        prior = hv_mean[None, :, :] * r_factor[:, None, None]
+        self.table = (totals + SMOOTHING * prior) / (counts + SMOOTHING)
+        self.global_mean = global_mean
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_db(cls):
+        cells = {
+            (rid, hour, vehicle): (count, total)
+            for rid, hour, vehicle, count, total in EtaStat.objects.values_list(
+                'restaurant_id', 'hour', 'vehicle_type', 'sample_count', 'total_seconds'
+            ).iterator(chunk_size=5000)
+        }
+        return cls(cells)
+
+    def predict_seconds(self, restaurant_ids, hours, vehicle_types):
+        """Vectorized prediction for a batch; returns a float array of seconds."""
+        r = np.fromiter((self.restaurant_index.get(rid, 0) for rid in restaurant_ids), dtype=np.intp)
+        v = np.fromiter(
+            (self.vehicle_index.get(normalize_vehicle(vt), 0) for vt in vehicle_types), dtype=np.intp
+        )
+        h = np.asarray(hours, dtype=np.intp) % 24
+        return self.table[r, h, v]
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_table():
+    global _table
+    table = _table
+    if table is None or time.monotonic() - table.loaded_at > TABLE_TTL_SECONDS:
+        with _table_lock:
+            if _table is None or _table is table:
+                _table = EtaTable.from_db()
+            table = _table
+    return table
+
+
+def invalidate():
+    global _table
+    _table = None
+
+
+def predict_estimated_times(restaurant_ids, vehicle_types, started_at=None):
+    """Return one ``estimated_time`` datetime per (restaurant, vehicle) pair."""
+    started_at = started_at or timezone.now()
+    hour = timezone.localtime(started_at).hour
+    seconds = get_table().predict_seconds(
+        restaurant_ids, [hour] * len(restaurant_ids), vehicle_types
+    )
+    return [started_at + timedelta(seconds=float(s)) for s in seconds]
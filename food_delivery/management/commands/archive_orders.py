@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from food_delivery.archive import ARCHIVE_AFTER_DAYS, archive_orders, table_sizes
+
+
+class Command(BaseCommand):
+    help = 'Move finished orders older than the hot window into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--report-only', action='store_true', help='Only print table sizes')
+
+    def report(self, title):
+        self.stdout.write(title)
+        for table, rows, size in table_sizes():
+            size = f'{size / 1024 / 1024:.1f} MB' if size is not None else '-'
+            self.stdout.write(f'  {table:<36} {rows:>12} rows  {size:>10}')
+
+    def handle(self, *args, **options):
+        self.report('Table sizes:')
+        if options['report_only']:
+            return
+        moved = archive_orders(options['days'], options['batch_size'])
+        self.stdout.write(f'Archived {moved} orders older than {options["days"]} days')
+        self.report('Table sizes after archiving:')
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from food_delivery.dispatch import ASSIGNERS, build_cost_matrix
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the dispatch cost matrix and assignment on synthetic data (no database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--drivers', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_orders, n_drivers = options['orders'], options['drivers']
+        # A ~30 km wide city around Riyadh
+        order_lat = 24.7 + rng.random(n_orders) * 0.3
+        order_lng = 46.6 + rng.random(n_orders) * 0.3
+        driver_lat = 24.7 + rng.random(n_drivers) * 0.3
+        driver_lng = 46.6 + rng.random(n_drivers) * 0.3
+        wait = rng.random(n_orders) * 30
+
+        methods = ['greedy']
+        try:
+            import scipy  # noqa: F401
+            methods.append('hungarian')
+        except ImportError:
+            self.stdout.write('SciPy not installed, skipping hungarian')
+
+        self.stdout.write(f'{n_orders} orders x {n_drivers} drivers, best of {options["repeat"]}')
+        matrix_times = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            cost, distance = build_cost_matrix(order_lat, order_lng, wait, driver_lat, driver_lng)
+            matrix_times.append(time.perf_counter() - started)
+        self.stdout.write(f'  cost matrix: {min(matrix_times) * 1000:.1f} ms')
+
+        for method in methods:
+            times = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                pairs = ASSIGNERS[method](cost)
+                times.append(time.perf_counter() - started)
+            total_km = sum(distance[r, c] for r, c in pairs)
+            self.stdout.write(
+                f'  {method}: {min(times) * 1000:.1f} ms, '
+                f'{len(pairs)} assigned, {total_km / max(len(pairs), 1):.2f} km mean pickup'
+            )
@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from food_delivery.models import Menu, Order, OrderItem, Restaurant, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size, queries and latency of full vs ?fields=/?expand= responses (data is rolled back)'
+
+    # (screen, full URL, sparse URL)
+    SCREENS = [
+        ('restaurant list', '/api/restaurants/', '/api/restaurants/?fields=restaurant_id,name,rating'),
+        ('menu list', '/api/menus/', '/api/menus/?fields=menu_id,item_name,price,availability_status'),
+        ('menu list, expanded', '/api/menus/?expand=restaurant',
+         '/api/menus/?fields=menu_id,item_name,price,restaurant&expand=restaurant'),
+        ('order history', '/api/orders/', '/api/orders/?fields=order_id,restaurant_name,order_status,total_amount,created_at'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--menus-per-restaurant', type=int, default=20)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def seed(self, options):
+        rng = random.Random(0)
+        restaurants = Restaurant.objects.bulk_create([
+            Restaurant(name=f'Bench {i}', address='x' * 120, phone='0500000000', cuisine_type='bench',
+                       rating=rng.random() * 5)
+            for i in range(options['restaurants'])
+        ])
+        menus = Menu.objects.bulk_create([
+            Menu(restaurant=r, item_name=f'Item {j}', description='d' * 200, price=Decimal('20.00'),
+                 image_url=f'https://cdn.example.com/{r.pk}/{j}.jpg')
+            for r in restaurants for j in range(options['menus_per_restaurant'])
+        ])
+        user = User.objects.create_user(email='bench-fieldsets@example.com', name='bench', phone='1')
+        orders = Order.objects.bulk_create([
+            Order(user=user, restaurant=rng.choice(restaurants), total_amount=Decimal('60.00'))
+            for _ in range(options['orders'])
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=o, menu_item=rng.choice(menus), quantity=1, price=Decimal('20.00'))
+            for o in orders for _ in range(3)
+        ])
+        return user
+
+    def measure(self, client, url, repeat):
+        times = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                times.append(time.perf_counter() - started)
+        return len(response.content), len(queries), statistics.median(times) * 1000
+
+    def handle(self, *args, **options):
+        # The benchmark would trip the per-route rate limits
+        try:
+            with override_settings(RATE_LIMITS={}), transaction.atomic():
+                user = self.seed(options)
+                client = APIClient()
+                client.force_authenticate(user)
+                self.stdout.write(f'{"screen":<24}{"bytes":>16}{"queries":>10}{"ms (median)":>18}')
+                for screen, full_url, sparse_url in self.SCREENS:
+                    full = self.measure(client, full_url, options['repeat'])
+                    sparse = self.measure(client, sparse_url, options['repeat'])
+                    self.stdout.write(
+                        f'{screen:<24}{full[0]:>7} -> {sparse[0]:<6}{full[1]:>4} -> {sparse[1]:<3}'
+                        f'{full[2]:>7.1f} -> {sparse[2]:<6.1f}'
+                        f' ({1 - sparse[0] / full[0]:.0%} smaller, {1 - sparse[2] / full[2]:.0%} faster)'
+                    )
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,79 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from food_delivery.models import User
+
+SCOPED = 'food_delivery.middleware.ScopedMiddleware'
+
+
+def full_stack():
+    """MIDDLEWARE as it was before scoping: the fallback chain inlined for every path."""
+    stack = []
+    for path in settings.MIDDLEWARE:
+        stack.extend(settings.SCOPED_MIDDLEWARE.get('', []) if path == SCOPED else [path])
+    return stack
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request middleware time on /api/ with the scoped stack against the full one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email used for the authenticated requests')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def time_requests(self, middleware, path, headers):
+        with override_settings(MIDDLEWARE=middleware, RATE_LIMITS={}, DEBUG=False):
+            # The handler alone: no test client bookkeeping around each request
+            handler = BaseHandler()
+            handler.load_middleware()
+            factory = RequestFactory()
+            response = handler.get_response(factory.get(path, **headers))
+            requests = [factory.get(path, **headers) for _ in range(self.options['requests'])]
+            started = time.perf_counter()
+            for request in requests:
+                handler.get_response(request)
+            elapsed = time.perf_counter() - started
+        return elapsed / self.options['requests'], response
+
+    def handle(self, *args, **options):
+        self.options = options
+        # One "Unauthorized" warning per request would swamp the table
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        user = User.objects.filter(email=options['user']).first() if options['user'] else User.objects.first()
+        if user is None:
+            raise CommandError('No user to authenticate with')
+        token = str(RefreshToken.for_user(user).access_token)
+        routes = [
+            # Nothing but URL resolution past the middleware
+            ('404 (no view)', '/api/no-such-route/', {}),
+            ('unauthenticated 401', '/api/profile/', {}),
+            ('GET /api/profile/', '/api/profile/', {'HTTP_AUTHORIZATION': f'Bearer {token}'}),
+            ('GET /api/restaurants/', '/api/restaurants/', {'HTTP_AUTHORIZATION': f'Bearer {token}'}),
+        ]
+        stacks = {'full': full_stack(), 'scoped': list(settings.MIDDLEWARE)}
+
+        self.stdout.write(f'{"route":<24}{"full":>10}{"scoped":>10}{"saved":>10}')
+        for name, path, headers in routes:
+            times = {key: [] for key in stacks}
+            # Interleaved rounds so drift (GC, CPU frequency) hits both stacks alike
+            for _ in range(options['rounds']):
+                for key, middleware in stacks.items():
+                    elapsed, response = self.time_requests(middleware, path, headers)
+                    times[key].append(elapsed)
+                    if key == 'scoped' and ('X-Frame-Options' in response or response.cookies):
+                        raise CommandError(f'{path} still went through the browser middleware')
+            # Best round: the least disturbed by the rest of the machine
+            full = min(times['full']) * 1e6
+            scoped = min(times['scoped']) * 1e6
+            self.stdout.write(
+                f'{name:<24}{full:>8.0f}us{scoped:>8.0f}us{full - scoped:>7.0f}us ({1 - scoped / full:.1%})'
+            )
+
@@ -0,0 +1,144 @@
+import json
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from food_delivery import payments, tasks
+from food_delivery.models import Order, Payment, Restaurant, Task, User
+
+
+def _run_in_thread(task_obj):
+    try:
+        return tasks.run(task_obj)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the payment flow against the simulator: process_payment request, '
+        'submit_payment task, gateway webhook (writes bench rows and deletes them afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=200)
+        parser.add_argument('--latency-ms', type=float, default=300)
+        parser.add_argument('--failure-rate', type=float, default=0.05)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, total):
+        restaurant = Restaurant.objects.create(name='Bench payments', address='x', phone='0500000000', cuisine_type='bench')
+        user = User.objects.create_user(email='bench-payments@example.com', name='bench', phone='1')
+        orders = Order.objects.bulk_create([
+            Order(user=user, restaurant=restaurant, total_amount=Decimal('25.00')) for _ in range(total)
+        ])
+        Payment.objects.bulk_create([
+            Payment(order=order, payment_method='card', amount=order.total_amount) for order in orders
+        ])
+        return restaurant, user, list(Payment.objects.filter(order__in=orders).values_list('payment_id', flat=True))
+
+    def drain(self, workers):
+        """Run queued tasks like run_tasks would until no submit_payment is left.
+
+        Returns the number of submit_payment runs, retries included.
+        """
+        ran = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                batch = tasks.claim(batch_size=workers)
+                if not batch:
+                    if not Task.objects.filter(name='submit_payment', status__in=['queued', 'running']).exists():
+                        return ran
+                    continue
+                ran += sum(1 for task_obj in batch if task_obj.name == 'submit_payment')
+                list(pool.map(_run_in_thread, batch))
+
+    def handle(self, *args, **options):
+        if not 0 <= options['failure_rate'] <= 1:
+            raise CommandError('--failure-rate must be between 0 and 1')
+        total = options['payments']
+        # One "failed permanently" line per given-up task would swamp the table
+        logging.getLogger('food_delivery.tasks').setLevel(logging.CRITICAL)
+        gateway = payments.SimulatorGateway(
+            latency_ms=options['latency_ms'], failure_rate=options['failure_rate'],
+            async_confirm=True, seed=options['seed'], webhook_secret='bench',
+        )
+        saved_gateway, saved_backoff = payments._gateway, tasks.RETRY_BASE_SECONDS
+        first_task = Task.objects.order_by('-task_id').values_list('task_id', flat=True).first() or 0
+        restaurant, user, payment_ids = self.seed(total)
+        payments._gateway = gateway
+        # Retries run as soon as a worker is free: this measures throughput,
+        # not the backoff schedule. max_attempts still caps them.
+        tasks.RETRY_BASE_SECONDS = 0
+        client = APIClient()
+        client.force_authenticate(user)
+        webhook = APIClient()
+
+        self.stdout.write(
+            f"{total} payments, {options['latency_ms']:.0f} ms gateway latency, "
+            f"{options['failure_rate']:.0%} transient failures"
+        )
+        try:
+            with override_settings(RATE_LIMITS={}):
+                for workers in options['concurrency']:
+                    Payment.objects.filter(payment_id__in=payment_ids).update(
+                        payment_status='pending', transaction_id=None
+                    )
+                    request_times = []
+                    for payment_id in payment_ids:
+                        began = time.perf_counter()
+                        response = client.post(f'/api/payments/{payment_id}/process_payment/')
+                        request_times.append(time.perf_counter() - began)
+                        if response.status_code != 202:
+                            raise CommandError(f'process_payment answered {response.status_code}')
+
+                    started = time.perf_counter()
+                    ran = self.drain(workers)
+                    elapsed = time.perf_counter() - started
+
+                    webhook_times = []
+                    waiting = Payment.objects.filter(
+                        payment_id__in=payment_ids, payment_status='processing'
+                    ).exclude(transaction_id=None).values_list('transaction_id', flat=True)
+                    for transaction_id in list(waiting):
+                        body = json.dumps({'transaction_id': transaction_id, 'status': 'completed'}).encode()
+                        began = time.perf_counter()
+                        response = webhook.post(
+                            '/api/payments/webhook/', body, content_type='application/json',
+                            HTTP_X_SIGNATURE=gateway.sign(body),
+                        )
+                        webhook_times.append(time.perf_counter() - began)
+                        if response.status_code != 200:
+                            raise CommandError(f'webhook answered {response.status_code}')
+                    # The receipts the webhooks queued, so the next round starts empty
+                    self.drain(workers)
+
+                    statuses = dict.fromkeys(['completed', 'failed', 'pending', 'processing'], 0)
+                    for payment_status in Payment.objects.filter(payment_id__in=payment_ids).values_list(
+                        'payment_status', flat=True
+                    ):
+                        statuses[payment_status] += 1
+                    webhook_median = statistics.median(webhook_times) * 1000 if webhook_times else 0
+                    self.stdout.write(
+                        f'  {workers:>3} workers: {total / elapsed:7.1f} payments/s through the gateway '
+                        f'({ran - total} retries, {elapsed:.1f} s); '
+                        f'process_payment {statistics.median(request_times) * 1000:.1f} ms, '
+                        f'webhook {webhook_median:.1f} ms median; '
+                        f"{statuses['completed']} completed, {statuses['failed']} failed, "
+                        f"{statuses['pending']} given up, {statuses['processing']} stuck"
+                    )
+        finally:
+            payments._gateway, tasks.RETRY_BASE_SECONDS = saved_gateway, saved_backoff
+            Task.objects.filter(
+                task_id__gt=first_task, name__in=['submit_payment', 'send_payment_receipt']
+            ).delete()
+            restaurant.delete()
+            user.delete()
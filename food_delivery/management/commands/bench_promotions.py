@@ -0,0 +1,142 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from food_delivery import promotions
+from food_delivery.models import Menu, Promotion, Restaurant, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark checkout pricing with the compiled promotion index against reading every promotion per order (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--promotions', type=int, default=5000)
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--items-per-restaurant', type=int, default=30)
+        parser.add_argument('--quotes', type=int, default=2000)
+        parser.add_argument('--scan-quotes', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=200)
+
+    def seed(self, options, rng):
+        now = timezone.now()
+        restaurants = Restaurant.objects.bulk_create([
+            Restaurant(name=f'Bench {i}', address='x', phone='0500000000', cuisine_type='bench')
+            for i in range(options['restaurants'])
+        ])
+        Menu.objects.bulk_create([
+            Menu(restaurant=restaurant, item_name=f'Item {j}', price=Decimal(rng.randint(500, 9000)) / 100)
+            for restaurant in restaurants
+            for j in range(options['items_per_restaurant'])
+        ], batch_size=2000)
+        menus = list(Menu.objects.filter(restaurant__in=restaurants).values_list('menu_id', 'restaurant_id', 'price'))
+
+        rows = []
+        for i in range(options['promotions']):
+            kind = rng.choices(['percent_off', 'buy_x_get_y', 'free_delivery'], [5, 4, 1])[0]
+            menu_id, restaurant_id, _ = rng.choice(menus)
+            rows.append(Promotion(
+                name=f'Bench {i}', kind=kind,
+                # A few site-wide campaigns, the rest per restaurant
+                restaurant_id=None if rng.random() < 0.01 else restaurant_id,
+                menu_item_id=menu_id if kind == 'buy_x_get_y' else None,
+                code=f'BENCH{i}' if rng.random() < 0.2 else None,
+                percent=Decimal(rng.randint(5, 30)) if kind == 'percent_off' else None,
+                buy_quantity=rng.randint(1, 3) if kind == 'buy_x_get_y' else None,
+                free_quantity=1 if kind == 'buy_x_get_y' else None,
+                min_subtotal=Decimal(rng.choice([0, 0, 50, 100])),
+                # Past, running and future campaigns
+                starts_at=now + timedelta(days=rng.randint(-30, 5)),
+                ends_at=now + timedelta(days=rng.randint(1, 30)),
+                max_uses=rng.choice([None, None, 1000]),
+            ))
+        Promotion.objects.bulk_create(rows, batch_size=2000)
+        return restaurants, menus
+
+    def carts(self, count, menus_by_restaurant, rng):
+        carts = []
+        for _ in range(count):
+            restaurant_id = rng.choice(list(menus_by_restaurant))
+            size = rng.choice([1, 2, 3, 5, 10, 20])
+            carts.append((restaurant_id, [
+                {'menu_item': Menu(menu_id=menu_id), 'quantity': rng.randint(1, 4), 'price': price}
+                for menu_id, price in rng.sample(menus_by_restaurant[restaurant_id], size)
+            ]))
+        return carts
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        try:
+            with override_settings(RATE_LIMITS={}, DELIVERY_FEE='7.00'), transaction.atomic():
+                restaurants, menus = self.seed(options, rng)
+                menus_by_restaurant = {}
+                for menu_id, restaurant_id, price in menus:
+                    menus_by_restaurant.setdefault(restaurant_id, []).append((menu_id, price))
+                carts = self.carts(options['quotes'], menus_by_restaurant, rng)
+
+                started = time.perf_counter()
+                index = promotions.compile_index()
+                self.stdout.write(
+                    f'compiled {index.size} live promotions ({len(index.codes)} coupons) '
+                    f'in {(time.perf_counter() - started) * 1000:.0f} ms'
+                )
+
+                scan_times, scanned = [], []
+                for restaurant_id, items in carts[:options['scan_quotes']]:
+                    began = time.perf_counter()
+                    # What checkout did without the index: read every live promotion per order
+                    quote = promotions.evaluate(promotions.compile_index(), restaurant_id, promotions._lines(items))
+                    scan_times.append(time.perf_counter() - began)
+                    scanned.append((quote.discount, quote.delivery_fee))
+
+                by_size, quoted = {}, []
+                promotions.get_index()
+                for restaurant_id, items in carts:
+                    began = time.perf_counter()
+                    quote = promotions.quote(restaurant_id, items)
+                    by_size.setdefault(len(items), []).append(time.perf_counter() - began)
+                    quoted.append((quote.discount, quote.delivery_fee))
+                if quoted[:len(scanned)] != scanned:
+                    raise RuntimeError('Index and full scan disagree')
+
+                discounted = sum(1 for discount, fee in quoted if discount or not fee)
+                self.stdout.write(f'{discounted / len(quoted):.0%} of carts got a promotion')
+                self.stdout.write(f'read every promotion per order: {statistics.median(scan_times) * 1000:.1f} ms median')
+                for size, times in sorted(by_size.items()):
+                    self.stdout.write(
+                        f'compiled index, {size:>2} items: {statistics.median(times) * 1000:.3f} ms median '
+                        f'(p99 {sorted(times)[int(len(times) * 0.99)] * 1000:.3f} ms)'
+                    )
+
+                user = User.objects.create_user(email='bench-promotions@example.com', name='bench', phone='1')
+                client = APIClient()
+                client.force_authenticate(user)
+                api_times = []
+                for restaurant_id, items in carts[:options['orders']]:
+                    payload = {
+                        'restaurant': restaurant_id,
+                        'total_amount': str(sum(item['price'] * item['quantity'] for item in items)),
+                        'items': [
+                            {'menu_item': item['menu_item'].pk, 'quantity': item['quantity'], 'price': str(item['price'])}
+                            for item in items
+                        ],
+                    }
+                    began = time.perf_counter()
+                    response = client.post('/api/orders/', payload, format='json')
+                    api_times.append(time.perf_counter() - began)
+                    assert response.status_code == 201, response.content
+                self.stdout.write(f'POST /api/orders/: {statistics.median(api_times) * 1000:.1f} ms median')
+                raise Rollback
+        except Rollback:
+            pass
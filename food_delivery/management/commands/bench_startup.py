@@ -0,0 +1,37 @@
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from food_delivery.startup import cold_start
+
+
+class Command(BaseCommand):
+    help = 'Measure worker cold start (boot + first request) with and without gunicorn --preload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/api/restaurants/')
+        parser.add_argument('--target-ms', type=float, default=1500,
+                            help='Cold start budget for a new worker without preload')
+        parser.add_argument('--fail', action='store_true', help='Exit non-zero when over target')
+
+    def handle(self, *args, **options):
+        runs = [cold_start(options['path']) for _ in range(options['runs'])]
+        status = runs[0]['status']
+        boot = statistics.median(r['boot_ms'] for r in runs)
+        first = statistics.median(r['first_request_ms'] for r in runs)
+        forked = statistics.median(r['forked_first_request_ms'] for r in runs)
+        cold = statistics.median(r['boot_ms'] + r['first_request_ms'] for r in runs)
+
+        self.stdout.write(f"{options['runs']} runs, GET {options['path']} -> {status} (medians)")
+        self.stdout.write(f'  boot (import + django.setup + urlconf): {boot:8.1f} ms')
+        self.stdout.write(f'  first request after boot:               {first:8.1f} ms')
+        self.stdout.write(f'  cold start without preload:             {cold:8.1f} ms  (target {options["target_ms"]:.0f} ms)')
+        self.stdout.write(f'  forked worker first request (preload):  {forked:8.1f} ms')
+        if cold > options['target_ms']:
+            message = f'Cold start {cold:.0f} ms is over the {options["target_ms"]:.0f} ms target'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Within target'))
@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from food_delivery import zones
+from food_delivery.models import DeliveryZoneCell, Restaurant
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the delivery-zone grid index against scanning every polygon (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=50000)
+        parser.add_argument('--cities', type=int, default=20)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--scan-queries', type=int, default=20)
+
+    def seed(self, options, rng):
+        cities = [(rng.uniform(18, 30), rng.uniform(36, 50)) for _ in range(options['cities'])]
+        restaurants = []
+        for i in range(options['restaurants']):
+            city_lat, city_lng = rng.choice(cities)
+            lat, lng = rng.gauss(city_lat, 0.3), rng.gauss(city_lng, 0.3)
+            restaurants.append(Restaurant(
+                name=f'Bench {i}', address='x', phone='0500000000', cuisine_type='bench',
+                latitude=lat, longitude=lng,
+                delivery_zone=zones.circle(lat, lng, rng.uniform(3, 10), vertices=rng.randint(8, 24)),
+            ))
+        Restaurant.objects.bulk_create(restaurants, batch_size=2000)
+        return cities
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        try:
+            with override_settings(RATE_LIMITS={}), transaction.atomic():
+                started = time.perf_counter()
+                cities = self.seed(options, rng)
+                self.stdout.write(f'seeded {options["restaurants"]} restaurants in {time.perf_counter() - started:.1f}s')
+
+                started = time.perf_counter()
+                indexed = zones.rebuild_index()
+                cells = DeliveryZoneCell.objects.count()
+                full = DeliveryZoneCell.objects.filter(full=True).count()
+                self.stdout.write(
+                    f'indexed {indexed} zones into {cells} cells ({full / cells:.0%} full) '
+                    f'in {time.perf_counter() - started:.1f}s'
+                )
+
+                points = [
+                    (rng.gauss(lat, 0.3), rng.gauss(lng, 0.3))
+                    for lat, lng in (rng.choice(cities) for _ in range(options['queries']))
+                ]
+
+                started = time.perf_counter()
+                all_zones = list(Restaurant.objects.values_list('restaurant_id', 'delivery_zone'))
+                scan_times, scanned = [], []
+                for lat, lng in points[:options['scan_queries']]:
+                    began = time.perf_counter()
+                    scanned.append(sorted(pk for pk, zone in all_zones if zone and zones.contains(zone, lat, lng)))
+                    scan_times.append(time.perf_counter() - began)
+                load = time.perf_counter() - started - sum(scan_times)
+
+                lookup_times, matches = [], []
+                for lat, lng in points:
+                    began = time.perf_counter()
+                    matches.append(sorted(zones.restaurants_delivering_to(lat, lng)))
+                    lookup_times.append(time.perf_counter() - began)
+                if matches[:len(scanned)] != scanned:
+                    raise RuntimeError('Index and full scan disagree')
+
+                client = APIClient()
+                api_times = []
+                for lat, lng in points[:200]:
+                    began = time.perf_counter()
+                    response = client.get('/api/restaurants/', {'lat': lat, 'lng': lng})
+                    api_times.append(time.perf_counter() - began)
+                    assert response.status_code == 200, response.status_code
+
+                self.stdout.write(
+                    f'restaurants per point: median {statistics.median(map(len, matches)):.0f}, '
+                    f'max {max(map(len, matches))}'
+                )
+                self.stdout.write(
+                    f'full scan: {statistics.median(scan_times) * 1000:.1f} ms per point '
+                    f'(+{load * 1000:.0f} ms to load every polygon)'
+                )
+                self.stdout.write(
+                    f'grid index: {statistics.median(lookup_times) * 1000:.2f} ms per point '
+                    f'(p99 {sorted(lookup_times)[int(len(lookup_times) * 0.99)] * 1000:.2f} ms)'
+                )
+                self.stdout.write(f'GET /api/restaurants/?lat=&lng=: {statistics.median(api_times) * 1000:.1f} ms median')
+                raise Rollback
+        except Rollback:
+            pass
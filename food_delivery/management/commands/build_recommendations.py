@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from food_delivery.recommendations import TOP_K, rebuild, rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently ordered together" tables from delivered orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, help='Only rebuild this restaurant')
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+
+    def handle(self, *args, **options):
+        if options['restaurant']:
+            orders = rebuild(options['restaurant'], options['top_k'])
+        else:
+            orders = rebuild_all(options['top_k'])
+        self.stdout.write(f'Rebuilt recommendations from {orders} orders')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from food_delivery.zones import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the delivery-zone grid index for every restaurant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(f'Indexed {indexed} delivery zones')
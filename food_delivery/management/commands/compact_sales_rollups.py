@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from food_delivery.analytics import HOURLY_RETENTION_DAYS, drop_old_hourly, record_pending
+
+
+class Command(BaseCommand):
+    help = 'Record delivered orders missing from the sales rollups and drop expired hourly rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hourly-retention-days', type=int, default=HOURLY_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        recorded = record_pending(batch_size=options['batch_size'])
+        dropped = drop_old_hourly(options['hourly_retention_days'])
+        self.stdout.write(f'Recorded {recorded} orders, dropped {dropped} hourly rows')
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from food_delivery.dispatch import ASSIGNERS, DEFAULT_MAX_DISTANCE_KM, dispatch_pending_orders
+
+
+class Command(BaseCommand):
+    help = 'Assign available drivers to ready orders in one batch (optionally in a loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=sorted(ASSIGNERS), default='greedy')
+        parser.add_argument('--max-distance-km', type=float, default=DEFAULT_MAX_DISTANCE_KM)
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Maximum orders and drivers considered per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep dispatching until interrupted')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds between batches')
+
+    def handle(self, *args, **options):
+        if options['method'] == 'hungarian':
+            try:
+                import scipy  # noqa: F401
+            except ImportError:
+                raise CommandError('The hungarian method requires SciPy')
+
+        while True:
+            started = time.perf_counter()
+            deliveries = dispatch_pending_orders(
+                method=options['method'],
+                max_distance_km=options['max_distance_km'],
+                limit=options['limit'],
+            )
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'Assigned {len(deliveries)} deliveries in {elapsed:.1f} ms')
+            if not options['loop']:
+                break
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                break
@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from food_delivery.eta import EtaTable, aggregate, completed_deliveries
+
+
+class Command(BaseCommand):
+    help = 'Train the ETA tables on older deliveries and report accuracy on the most recent ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--holdout', type=float, default=0.2,
+                            help='Fraction of the most recent deliveries held out for evaluation')
+
+    def handle(self, *args, **options):
+        observations = list(completed_deliveries())
+        if len(observations) < 10:
+            raise CommandError(f'Need at least 10 completed deliveries, found {len(observations)}')
+
+        # Observations come ordered by actual_time, so the split is by time
+        split = int(len(observations) * (1 - options['holdout']))
+        train, test = observations[:split], observations[split:]
+        table = EtaTable(aggregate(train))
+
+        restaurant_ids, hours, vehicles, actual, _ = zip(*test)
+        actual = np.asarray(actual)
+        started = time.perf_counter()
+        predicted = table.predict_seconds(restaurant_ids, hours, vehicles)
+        elapsed = time.perf_counter() - started
+
+        errors = np.abs(predicted - actual) / 60
+        baseline = np.abs(table.global_mean - actual) / 60
+        self.stdout.write(f'Trained on {len(train)}, evaluated on {len(test)} deliveries')
+        self.stdout.write(f'  MAE:          {errors.mean():.1f} min (global mean baseline {baseline.mean():.1f} min)')
+        self.stdout.write(f'  median |err|: {np.median(errors):.1f} min')
+        self.stdout.write(f'  p90 |err|:    {np.percentile(errors, 90):.1f} min')
+        self.stdout.write(f'  predict:      {elapsed / len(test) * 1e6:.2f} us/order')
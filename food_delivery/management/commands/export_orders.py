@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from food_delivery import transfer
+
+
+class Command(BaseCommand):
+    help = 'Stream orders with their items and payments to CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=transfer.FORMATS, default='csv')
+        parser.add_argument('--since', help='ISO datetime, inclusive')
+        parser.add_argument('--until', help='ISO datetime, exclusive')
+        parser.add_argument('-o', '--output', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('since', 'until'):
+            if options[name]:
+                try:
+                    bounds[name] = parse_datetime(options[name])
+                except ValueError:
+                    # Well-formed but impossible, like 2024-02-30T10:00
+                    bounds[name] = None
+                if bounds[name] is None:
+                    raise CommandError(f'Invalid --{name}: {options[name]}')
+
+        chunks = transfer.render_rows(transfer.iter_order_rows(**bounds), options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as out:
+                out.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from food_delivery import transfer
+
+
+class Command(BaseCommand):
+    help = 'Stream-import restaurants or menu items from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(transfer.IMPORT_KINDS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=transfer.FORMATS, default=None,
+                            help='Defaults to ndjson for .ndjson/.jsonl files, csv otherwise')
+        parser.add_argument('--batch-size', type=int, default=transfer.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or transfer.guess_format(options['path'])
+        try:
+            handle = open(options['path'], encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with handle:
+            report = transfer.import_records(
+                options['kind'], transfer.iter_records(handle, fmt), batch_size=options['batch_size']
+            )
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(f'Created {report.created}, failed {report.failed}')
@@ -0,0 +1,122 @@
+import json
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from food_delivery import profiling
+from food_delivery.models import User
+
+# "GET /api/menus/?page=2 HTTP/1.1" inside an nginx/gunicorn access log line
+ACCESS_LOG = re.compile(r'"(GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS) (\S+) HTTP/[\d.]+"')
+PLAIN = re.compile(r'^(GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS)\s+(\S+)')
+
+
+class Rollback(Exception):
+    pass
+
+
+def parse_log(lines):
+    """Requests as ``{'method', 'path', 'body', 'user'}`` from NDJSON, access-log or "METHOD /path" lines."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            record = json.loads(line)
+            yield {
+                'method': record.get('method', 'GET').upper(),
+                'path': record['path'],
+                'body': record.get('body'),
+                'user': record.get('user'),
+            }
+            continue
+        match = ACCESS_LOG.search(line) or PLAIN.match(line)
+        if match:
+            yield {'method': match.group(1), 'path': match.group(2), 'body': None, 'user': None}
+
+
+class Command(BaseCommand):
+    help = 'Replay a request log with the sampling profiler on and print per-route stacks (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='NDJSON, access log or "METHOD /path" lines')
+        parser.add_argument('--user', help='Email to authenticate requests that name no user')
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--interval-ms', type=float, default=1.0)
+        parser.add_argument('--max-overhead', type=float, default=0.05)
+        parser.add_argument('--mode', choices=['auto', 'signal', 'thread'], default='auto')
+        parser.add_argument('--output', help='Write collapsed stacks here (for flamegraph.pl / speedscope)')
+
+    def replay(self, requests, profiled, options):
+        settings = {'ENABLED': profiled, 'SAMPLE_RATE': 1.0, 'INTERVAL_MS': options['interval_ms'],
+                    'MAX_OVERHEAD': options['max_overhead'], 'MODE': options['mode']}
+        users = {}
+        try:
+            # Rate limits would turn the replay into 429s
+            with override_settings(PROFILING=settings, RATE_LIMITS={}), transaction.atomic():
+                client = APIClient()
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    for request in requests:
+                        email = request['user'] or options['user']
+                        if email not in users:
+                            users[email] = User.objects.filter(email=email).first() if email else None
+                        client.force_authenticate(users[email])
+                        client.generic(
+                            request['method'], request['path'],
+                            json.dumps(request['body']) if request['body'] is not None else '',
+                            content_type='application/json',
+                        )
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        return elapsed
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['log'], encoding='utf-8') as f:
+                requests = list(parse_log(f))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {options["log"]}: {exc}')
+        if not requests:
+            raise CommandError('No requests found in the log')
+
+        self.replay(requests, False, options)  # warm-up: imports, caches, query plans
+        baseline = self.replay(requests, False, options)
+        profiling.profile.clear()
+        profiling.samplers.clear()
+        profiled = self.replay(requests, True, options)
+
+        snapshot = profiling.profile.snapshot()
+        cost = profiling.overhead()
+        total = len(requests) * options['repeat']
+        self.stdout.write(f'{"route":<48}{"requests":>10}{"samples":>10}  hottest frame')
+        for row in profiling.summary(snapshot['routes'], snapshot['requests'], top=1):
+            hottest = row['top_frames'][0] if row['top_frames'] else {'frame': '-', 'share': 0}
+            self.stdout.write(
+                f'{row["route"]:<48}{row["requests"]:>10}{row["samples"]:>10}  '
+                f'{hottest["frame"]} ({hottest["share"]:.0%})'
+            )
+        self.stdout.write(
+            f'\n{total} requests: {baseline * 1000 / total:.2f} ms/request unprofiled, '
+            f'{profiled * 1000 / total:.2f} ms/request profiled '
+            f'({profiled / baseline - 1:+.1%} wall time)'
+        )
+        if cost['profiled_seconds']:
+            self.stdout.write(
+                f'sampler: {cost["samples"]} samples, '
+                f'{cost["sampling_seconds"] / cost["profiled_seconds"]:.1%} of profiled time spent sampling'
+            )
+
+        text = ''.join(
+            profiling.collapsed(stacks, prefix=route) for route, stacks in snapshot['routes'].items()
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(text)
+            self.stdout.write(f'collapsed stacks written to {options["output"]}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from food_delivery.startup import by_package, import_times
+
+
+class Command(BaseCommand):
+    help = 'Report import time per module for a cold boot of the WSGI application'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument('--prefix', default='', help='Only list modules starting with this name')
+
+    def handle(self, *args, **options):
+        modules = import_times()
+        total = sum(self_us for _, self_us, _, _ in modules)
+        self.stdout.write(f'{len(modules)} modules imported in {total / 1000:.1f} ms')
+
+        self.stdout.write('\nBy package (self time):')
+        for package, self_us in by_package(modules)[:options['top']]:
+            self.stdout.write(f'  {self_us / 1000:8.1f} ms  {package}')
+
+        listed = [m for m in modules if m[0].startswith(options['prefix'])]
+        self.stdout.write('\nSlowest modules (cumulative, self):')
+        for name, self_us, cumulative_us, _ in sorted(listed, key=lambda m: m[2], reverse=True)[:options['top']]:
+            self.stdout.write(f'  {cumulative_us / 1000:8.1f} ms {self_us / 1000:8.1f} ms  {name}')
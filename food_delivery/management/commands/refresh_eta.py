@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from food_delivery.eta import refresh_stats
+
+
+class Command(BaseCommand):
+    help = 'Fold newly completed deliveries into the ETA lookup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild the tables from scratch')
+
+    def handle(self, *args, **options):
+        processed = refresh_stats(full=options['full'])
+        self.stdout.write(f'Processed {processed} deliveries')
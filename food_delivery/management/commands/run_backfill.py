@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from food_delivery.models import BackfillProgress
+from food_delivery.online_schema import find_backfills
+
+
+class Command(BaseCommand):
+    help = 'Run or resume a batched backfill from the migrations ahead of deploying them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Backfill to run; lists them when omitted')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--pause', type=float, help='Seconds to sleep between batches')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches (resume later)')
+        parser.add_argument('--restart', action='store_true', help='Forget saved progress first')
+
+    def handle(self, *args, **options):
+        backfills = find_backfills()
+        progress = {p.name: p for p in BackfillProgress.objects.filter(name__in=backfills)}
+        if not options['name']:
+            for name in sorted(backfills):
+                state = progress.get(name)
+                if state is None:
+                    status = 'not started'
+                elif state.finished_at:
+                    status = f'finished {state.finished_at:%Y-%m-%d %H:%M}, {state.rows_updated} rows'
+                else:
+                    status = f'at pk {state.last_pk}, {state.rows_updated} rows'
+                self.stdout.write(f'{name:<40}{backfills[name].model:<32}{status}')
+            return
+
+        backfill = backfills.get(options['name'])
+        if backfill is None:
+            raise CommandError(f'Unknown backfill {options["name"]!r}')
+        if options['restart']:
+            BackfillProgress.objects.filter(name=backfill.name).delete()
+        updated = backfill.run(
+            max_batches=options['max_batches'], batch_size=options['batch_size'], pause=options['pause']
+        )
+        state = BackfillProgress.objects.get(name=backfill.name)
+        done = 'finished' if state.finished_at else f'paused at pk {state.last_pk}'
+        self.stdout.write(f'Updated {updated} rows, {done}')
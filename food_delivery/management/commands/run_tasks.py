@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from food_delivery import tasks
+
+
+def _run_in_thread(task_obj):
+    try:
+        return tasks.run(task_obj)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Tasks run in parallel')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                tasks.requeue_stale()
+                batch = tasks.claim(batch_size=concurrency)
+                if batch:
+                    results = list(pool.map(_run_in_thread, batch))
+                    ok = sum(results)
+                    self.stdout.write(f'Ran {len(batch)} tasks ({ok} ok, {len(batch) - ok} failed)')
+                    continue
+                if options['once']:
+                    break
+                try:
+                    time.sleep(options['poll_interval'])
+                except KeyboardInterrupt:
+                    break
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from food_delivery.payments import SETTLEMENT_BATCH_SIZE, reconcile_webhook_events, settle_pending
+
+
+class Command(BaseCommand):
+    help = 'Apply webhooks kept for late transaction ids, then settle completed payments in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SETTLEMENT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        reconciled = reconcile_webhook_events(batch_size=options['batch_size'])
+        settled = settle_pending(batch_size=options['batch_size'])
+        self.stdout.write(f'Applied {reconciled} early webhooks, settled {settled} payments')
@@ -0,0 +1,290 @@
+# middleware.py
+import random
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from . import profiling
+from .compression import COMPRESSIBLE_TYPES, choose_encoding, compress, config
+
+
+def queue_latency_ms(request, now=None):
+    """Time the request spent queued before Django saw it, from X-Request-Start.
+
+    Accepts ``t=<epoch>`` or a bare epoch in seconds, milliseconds or
+    microseconds, as set by common proxies. Returns None when unknown.
+    """
+    header = request.META.get('HTTP_X_REQUEST_START', '')
+    if header.startswith('t='):
+        header = header[2:]
+    try:
+        started = float(header)
+    except ValueError:
+        return None
+    now = now or time.time()
+    # Normalise the unit by magnitude
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, (now - started) * 1000)
+
+
+class LoadSheddingMiddleware:
+    """Return 503 on non-critical routes while the server is overloaded.
+
+    Overload is detected from the request's queue latency (X-Request-Start)
+    or the number of requests in flight in this process. Shedding is
+    probabilistic and grows with the overload, so traffic degrades gradually
+    instead of flipping off; critical paths such as order placement are
+    never shed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'LOAD_SHEDDING', {})
+        self.enabled = config.get('ENABLED', True)
+        self.max_queue_ms = config.get('MAX_QUEUE_LATENCY_MS', 500)
+        self.max_in_flight = config.get('MAX_IN_FLIGHT', 0)
+        self.retry_after = config.get('RETRY_AFTER', 5)
+        self.critical_paths = tuple(config.get('CRITICAL_PATHS', ()))
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def overload(self, request):
+        """0 when healthy, growing above 0 the further past the limits we are."""
+        level = 0.0
+        latency = queue_latency_ms(request)
+        if latency is not None and self.max_queue_ms:
+            level = max(level, latency / self.max_queue_ms - 1)
+        if self.max_in_flight:
+            level = max(level, self.in_flight / self.max_in_flight - 1)
+        return level
+
+    def is_critical(self, request):
+        return request.method == 'OPTIONS' or request.path.startswith(self.critical_paths)
+
+    def __call__(self, request):
+        if self.enabled and not self.is_critical(request):
+            level = self.overload(request)
+            if level > 0 and random.random() < min(1.0, level):
+                response = JsonResponse({'error': 'الخادم مشغول حالياً، حاول مرة أخرى'}, status=503)
+                response['Retry-After'] = str(self.retry_after)
+                return response
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self.get_response(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class CompressionMiddleware:
+    """Compress other responses on the fly when they are big enough to be worth it.
+
+    Skips responses that are already encoded (the catalog cache, WhiteNoise),
+    streamed, too small, not text-like, or on EXCLUDE_PATHS (responses that
+    echo secrets such as tokens, where compression enables BREACH-style attacks).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = config('MIN_SIZE')
+        self.exclude_paths = tuple(config('EXCLUDE_PATHS'))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < self.min_size
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+            or request.path.startswith(self.exclude_paths)
+        ):
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            # A strong ETag names the identity bytes, not these
+            response['ETag'] = 'W/' + response['ETag'].removeprefix('W/')
+        return response
+
+
+class ProfilingMiddleware:
+    """Sample the stacks of a random fraction of requests, grouped by route.
+
+    Off unless PROFILING['ENABLED']; unsampled requests only pay for one
+    random() call. See profiling.py for the sampler and its overhead cap.
+    """
+
+    def __init__(self, get_response):
+        if not profiling.config('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.should_profile():
+            return self.get_response(request)
+        sampler = profiling.get_sampler()
+        started = time.perf_counter()
+        stacks = sampler.start(sys._getframe())
+        try:
+            return self.get_response(request)
+        finally:
+            sampler.stop()
+            sampler.profiled_seconds += time.perf_counter() - started
+            profiling.profile.add(profiling.route_name(request), stacks)
+            profiling.profile.maybe_flush()
+
+
+def scope_prefix(path, prefixes):
+    """The longest of ``prefixes`` that ``path`` starts with, or None."""
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        if path.startswith(prefix):
+            return prefix
+    return None
+
+
+class Chain:
+    def __init__(self, handler):
+        self.handler = handler
+        self.view = []
+        self.template_response = []
+        self.exception = []
+
+
+class ScopedMiddleware:
+    """Run a different middleware chain per URL prefix, from SCOPED_MIDDLEWARE.
+
+    Each chain is built once, the way Django builds MIDDLEWARE, and the
+    longest matching prefix wins ('' is the fallback). The chosen chain's
+    process_view, process_exception and process_template_response hooks
+    run from this middleware's own, at its place in MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        scopes = getattr(settings, 'SCOPED_MIDDLEWARE', {})
+        # Longest prefix first, so the first match is the most specific
+        self.chains = [
+            (prefix, self.build(scopes[prefix], get_response))
+            for prefix in sorted(scopes, key=len, reverse=True)
+        ]
+        self.passthrough = Chain(get_response)
+
+    @staticmethod
+    def build(paths, get_response):
+        chain = Chain(get_response)
+        handler = get_response
+        for path in reversed(paths):
+            try:
+                middleware = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            # Same hook order as BaseHandler.load_middleware
+            if hasattr(middleware, 'process_view'):
+                chain.view.insert(0, middleware.process_view)
+            if hasattr(middleware, 'process_template_response'):
+                chain.template_response.append(middleware.process_template_response)
+            if hasattr(middleware, 'process_exception'):
+                chain.exception.append(middleware.process_exception)
+            handler = convert_exception_to_response(middleware)
+        chain.handler = handler
+        return chain
+
+    def chain(self, request):
+        path = request.path_info
+        for prefix, chain in self.chains:
+            if path.startswith(prefix):
+                return chain
+        return self.passthrough
+
+    def __call__(self, request):
+        return self.chain(request).handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for hook in self.chain(request).view:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_exception(self, request, exception):
+        for hook in self.chain(request).exception:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for hook in self.chain(request).template_response:
+            response = hook(request, response)
+        return response
+
+
+class StatelessSession(SessionBase):
+    """request.session for API requests: starts empty, never loaded or saved."""
+
+    def exists(self, session_key):
+        return False
+
+    def create(self):
+        self._session_key = None
+
+    def save(self, must_create=False):
+        pass
+
+    def delete(self, session_key=None):
+        pass
+
+    def load(self):
+        return {}
+
+
+def jwt_user(request):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        result = None
+    return result[0] if result else AnonymousUser()
+
+
+class JWTUserMiddleware:
+    """Session-free stand-in for the session and auth middleware on the API.
+
+    request.user comes from the Authorization header, decoded only if
+    something reads it outside a DRF view (views authenticate on their own
+    and replace it). request.session never touches the session store.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user = SimpleLazyObject(lambda: jwt_user(request))
+        request.session = SimpleLazyObject(StatelessSession)
+        return self.get_response(request)
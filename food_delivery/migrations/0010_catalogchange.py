@@ -0,0 +1,43 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+def seed_catalog_changes(apps, schema_editor):
+    # Existing rows predate the log; give them "created" entries so a
+    # client syncing from scratch receives the whole catalog.
+    CatalogChange = apps.get_model('food_delivery', 'CatalogChange')
+    Restaurant = apps.get_model('food_delivery', 'Restaurant')
+    Menu = apps.get_model('food_delivery', 'Menu')
+    for entity, model in (('restaurant', Restaurant), ('menu', Menu)):
+        ids = model.objects.order_by('pk').values_list('pk', flat=True)
+        CatalogChange.objects.bulk_create(
+            [CatalogChange(entity=entity, object_id=pk, action='created') for pk in ids.iterator()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0009_alter_user_options_user_groups_user_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(choices=[('restaurant', 'مطعم'), ('menu', 'عنصر قائمة')], max_length=20, verbose_name='النوع')),
+                ('object_id', models.IntegerField(verbose_name='رقم العنصر')),
+                ('action', models.CharField(choices=[('created', 'إنشاء'), ('updated', 'تعديل'), ('deleted', 'حذف')], max_length=10, verbose_name='العملية')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='وقت التغيير')),
+            ],
+            options={
+                'verbose_name': 'تغيير في الكتالوج',
+                'verbose_name_plural': 'تغييرات الكتالوج',
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.RunPython(seed_catalog_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0010_catalogchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='خط العرض'),
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='location_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='آخر تحديث للموقع'),
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='خط الطول'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='خط العرض'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='خط الطول'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0011_restaurant_driver_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='assigned_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='وقت التعيين'),
+        ),
+        migrations.CreateModel(
+            name='EtaStat',
+            fields=[
+                ('eta_stat_id', models.AutoField(primary_key=True, serialize=False)),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='الساعة')),
+                ('vehicle_type', models.CharField(max_length=50, verbose_name='نوع المركبة')),
+                ('sample_count', models.PositiveIntegerField(default=0, verbose_name='عدد العينات')),
+                ('total_seconds', models.FloatField(default=0.0, verbose_name='مجموع المدة بالثواني')),
+                ('last_observed_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر توصيل محسوب')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eta_stats', to='food_delivery.restaurant', verbose_name='المطعم')),
+            ],
+            options={
+                'unique_together': {('restaurant', 'hour', 'vehicle_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0012_delivery_assigned_at_etastat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('task_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, verbose_name='اسم المهمة')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='البيانات')),
+                ('status', models.CharField(choices=[('queued', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('done', 'مكتمل'), ('failed', 'فشل')], default='queued', max_length=10, verbose_name='الحالة')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='عدد المحاولات')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='أقصى عدد للمحاولات')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='التنفيذ بعد')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الحجز')),
+                ('last_error', models.TextField(blank=True, verbose_name='آخر خطأ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx')],
+            },
+        ),
+    ]
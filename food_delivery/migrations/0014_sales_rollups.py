@@ -0,0 +1,70 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0013_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemSalesRollup',
+            fields=[
+                ('rollup_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('grain', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4, verbose_name='الدقة')),
+                ('bucket_start', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='الكمية')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإيرادات')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RestaurantSalesRollup',
+            fields=[
+                ('rollup_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('grain', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4, verbose_name='الدقة')),
+                ('bucket_start', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإيرادات')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_recorded',
+            field=models.BooleanField(default=False, verbose_name='محتسب في الإحصائيات'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('sales_recorded', False)), fields=['order_status'], name='order_unrecorded_sales_idx'),
+        ),
+        migrations.AddField(
+            model_name='menuitemsalesrollup',
+            name='menu_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='food_delivery.menu', verbose_name='عنصر القائمة'),
+        ),
+        migrations.AddField(
+            model_name='menuitemsalesrollup',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_sales_rollups', to='food_delivery.restaurant', verbose_name='المطعم'),
+        ),
+        migrations.AddField(
+            model_name='restaurantsalesrollup',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='food_delivery.restaurant', verbose_name='المطعم'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitemsalesrollup',
+            index=models.Index(fields=['restaurant', 'grain', 'bucket_start'], name='item_rollup_restaurant_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='menuitemsalesrollup',
+            unique_together={('menu_item', 'grain', 'bucket_start')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='restaurantsalesrollup',
+            unique_together={('restaurant', 'grain', 'bucket_start')},
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:46
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_settled(apps, schema_editor):
+    # Payments completed before the gateway existed have nothing to settle
+    Payment = apps.get_model('food_delivery', 'Payment')
+    Payment.objects.filter(payment_status='completed').update(settled_at=F('paid_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0015_admin_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='settled_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='تاريخ التسوية'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_status',
+            field=models.CharField(choices=[('pending', 'قيد الانتظار'), ('processing', 'قيد المعالجة'), ('completed', 'مكتمل'), ('failed', 'فشل'), ('refunded', 'تم الاسترداد')], default='pending', max_length=20, verbose_name='حالة الدفع'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('payment_status', 'completed'), ('settled_at__isnull', True)), fields=['payment_id'], name='payment_unsettled_idx'),
+        ),
+        migrations.RunPython(mark_existing_settled, migrations.RunPython.noop),
+    ]
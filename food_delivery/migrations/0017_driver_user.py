@@ -0,0 +1,20 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0016_payment_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='driver', to=settings.AUTH_USER_MODEL, verbose_name='حساب المستخدم'),
+        ),
+    ]
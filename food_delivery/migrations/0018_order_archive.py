@@ -0,0 +1,69 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0017_driver_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDelivery',
+            fields=[
+                ('delivery_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('order_id', models.IntegerField(unique=True, verbose_name='الطلب')),
+                ('driver_id', models.IntegerField(blank=True, null=True, verbose_name='السائق')),
+                ('delivery_status', models.CharField(choices=[('assigned', 'تم التعيين'), ('on_the_way', 'في الطريق'), ('delivered', 'تم التسليم'), ('canceled', 'ملغي')], max_length=20, verbose_name='حالة التوصيل')),
+                ('assigned_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت التعيين')),
+                ('estimated_time', models.DateTimeField(verbose_name='الوقت المقدر للتوصيل')),
+                ('actual_time', models.DateTimeField(blank=True, null=True, verbose_name='الوقت الفعلي للتوصيل')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('order_item_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('order_id', models.IntegerField(db_index=True, verbose_name='الطلب')),
+                ('menu_item_id', models.IntegerField(verbose_name='عنصر القائمة')),
+                ('quantity', models.PositiveIntegerField(verbose_name='الكمية')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='السعر')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('payment_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('order_id', models.IntegerField(unique=True, verbose_name='الطلب')),
+                ('payment_method', models.CharField(choices=[('card', 'بطاقة ائتمانية'), ('paypal', 'PayPal'), ('cash', 'نقدي عند الاستلام')], max_length=20, verbose_name='طريقة الدفع')),
+                ('payment_status', models.CharField(choices=[('pending', 'قيد الانتظار'), ('processing', 'قيد المعالجة'), ('completed', 'مكتمل'), ('failed', 'فشل'), ('refunded', 'تم الاسترداد')], max_length=20, verbose_name='حالة الدفع')),
+                ('transaction_id', models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='رقم المعاملة')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='المبلغ')),
+                ('paid_at', models.DateTimeField(verbose_name='تاريخ الدفع')),
+                ('settled_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ التسوية')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='food_delivery.order', verbose_name='الطلب'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('order_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(verbose_name='المستخدم')),
+                ('restaurant_id', models.IntegerField(verbose_name='المطعم')),
+                ('order_status', models.CharField(choices=[('pending', 'قيد الانتظار'), ('confirmed', 'تم التأكيد'), ('preparing', 'قيد التحضير'), ('on_the_way', 'في الطريق'), ('delivered', 'تم التسليم'), ('canceled', 'ملغي')], max_length=20, verbose_name='حالة الطلب')),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='المبلغ الإجمالي')),
+                ('created_at', models.DateTimeField(verbose_name='تاريخ الإنشاء')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الأرشفة')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', '-created_at'], name='archived_order_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:54
+
+import django.db.models.deletion
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+# Frozen copy of models.review_score at the time of this migration
+SCORE_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+RECENCY_SECONDS = 3 * 24 * 3600
+
+
+def dedupe_and_score(apps, schema_editor):
+    Review = apps.get_model('food_delivery', 'Review')
+    # Keep the first review per (user, order) so the unique constraint can be added
+    duplicates = (
+        Review.objects.filter(order__isnull=False)
+        .values('user_id', 'order_id')
+        .annotate(first=Min('review_id'), n=Count('review_id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates:
+        Review.objects.filter(user_id=row['user_id'], order_id=row['order_id']).exclude(
+            review_id=row['first']
+        ).delete()
+    reviews = list(Review.objects.only('review_id', 'created_at'))
+    for review in reviews:
+        review.score = (review.created_at - SCORE_EPOCH).total_seconds() / RECENCY_SECONDS
+    Review.objects.bulk_update(reviews, ['score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0018_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='helpful_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='عدد الإشادات'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='score',
+            field=models.FloatField(default=0.0, verbose_name='درجة الترتيب'),
+        ),
+        migrations.RunPython(dedupe_and_score, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['restaurant', '-created_at', '-review_id'], name='review_restaurant_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['restaurant', '-score', '-review_id'], name='review_restaurant_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('user', 'order'), name='review_unique_user_order'),
+        ),
+        migrations.AddField(
+            model_name='reviewvote',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='food_delivery.review', verbose_name='التقييم'),
+        ),
+        migrations.AddField(
+            model_name='reviewvote',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_votes', to=settings.AUTH_USER_MODEL, verbose_name='المستخدم'),
+        ),
+        migrations.AddConstraint(
+            model_name='reviewvote',
+            constraint=models.UniqueConstraint(fields=('review', 'user'), name='review_vote_unique_user'),
+        ),
+    ]
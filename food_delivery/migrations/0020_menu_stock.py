@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0019_review_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menu',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='الكمية المتوفرة'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stock_status',
+            field=models.CharField(blank=True, choices=[('reserved', 'محجوز'), ('committed', 'مؤكد'), ('released', 'مُعاد')], default='', max_length=20, verbose_name='حالة حجز المخزون'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.10 on 2026-10-19 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0020_menu_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='pairs_recorded',
+            field=models.BooleanField(default=False, verbose_name='محتسب في التوصيات'),
+        ),
+        migrations.CreateModel(
+            name='ItemPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.menu', verbose_name='عنصر القائمة')),
+                ('other_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.menu', verbose_name='العنصر المرافق')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.restaurant', verbose_name='المطعم')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'other_item'), name='item_pair_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='الترتيب')),
+                ('score', models.FloatField(verbose_name='الدرجة')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='food_delivery.menu', verbose_name='عنصر القائمة')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.menu', verbose_name='العنصر المقترح')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'rank'), name='menu_recommendation_rank_unique')],
+            },
+        ),
+    ]
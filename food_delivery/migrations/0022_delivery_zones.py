@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0021_item_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='delivery_zone',
+            field=models.JSONField(blank=True, null=True, verbose_name='منطقة التوصيل'),
+        ),
+        migrations.CreateModel(
+            name='DeliveryZoneCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.BigIntegerField(verbose_name='الخلية')),
+                ('full', models.BooleanField(default=False, verbose_name='داخل المنطقة بالكامل')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zone_cells', to='food_delivery.restaurant', verbose_name='المطعم')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cell', 'restaurant'), name='zone_cell_unique')],
+            },
+        ),
+    ]
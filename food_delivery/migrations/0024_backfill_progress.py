@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0023_cart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='الاسم')),
+                ('last_pk', models.BigIntegerField(default=0, verbose_name='آخر مفتاح')),
+                ('rows_updated', models.BigIntegerField(default=0, verbose_name='الصفوف المحدثة')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='وقت البدء')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الانتهاء')),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.10 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+from food_delivery.online_schema import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('food_delivery', '0024_backfill_progress'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='catalogchange',
+            index=models.Index(fields=['entity', 'object_id', 'seq'], name='catalog_change_object_idx'),
+        ),
+    ]
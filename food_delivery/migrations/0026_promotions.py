@@ -0,0 +1,64 @@
+# Generated by Django 5.2.10 on 2026-10-19 15:19
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0025_catalog_change_object_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delivery_fee',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='رسوم التوصيل'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='discount_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='قيمة الخصم'),
+        ),
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('promotion_id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200, verbose_name='اسم العرض')),
+                ('kind', models.CharField(choices=[('percent_off', 'خصم بنسبة مئوية'), ('buy_x_get_y', 'اشترِ X واحصل على Y'), ('free_delivery', 'توصيل مجاني')], max_length=20, verbose_name='نوع العرض')),
+                ('code', models.CharField(blank=True, max_length=40, null=True, unique=True, verbose_name='رمز القسيمة')),
+                ('percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)], verbose_name='نسبة الخصم')),
+                ('buy_quantity', models.PositiveIntegerField(blank=True, null=True, verbose_name='الكمية المشتراة')),
+                ('free_quantity', models.PositiveIntegerField(blank=True, null=True, verbose_name='الكمية المجانية')),
+                ('min_subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='الحد الأدنى للطلب')),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='يبدأ في')),
+                ('ends_at', models.DateTimeField(blank=True, null=True, verbose_name='ينتهي في')),
+                ('is_active', models.BooleanField(default=True, verbose_name='مفعّل')),
+                ('max_uses', models.PositiveIntegerField(blank=True, null=True, verbose_name='الحد الأقصى للاستخدام')),
+                ('used_count', models.PositiveIntegerField(default=0, verbose_name='مرات الاستخدام')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('menu_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='food_delivery.menu', verbose_name='عنصر القائمة')),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='food_delivery.restaurant', verbose_name='المطعم')),
+            ],
+            options={
+                'verbose_name': 'عرض',
+                'verbose_name_plural': 'العروض',
+            },
+        ),
+        migrations.CreateModel(
+            name='PromotionRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='قيمة الخصم')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الاستخدام')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='food_delivery.order', verbose_name='الطلب')),
+                ('promotion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='food_delivery.promotion', verbose_name='العرض')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('order', 'promotion'), name='redemption_order_promotion_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0026_promotions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promotion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='آخر تحديث'),
+        ),
+    ]
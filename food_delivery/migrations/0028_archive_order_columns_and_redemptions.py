@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-19 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0027_promotion_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPromotionRedemption',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('order_id', models.IntegerField(db_index=True, verbose_name='الطلب')),
+                ('promotion_id', models.IntegerField(db_index=True, verbose_name='العرض')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='قيمة الخصم')),
+                ('created_at', models.DateTimeField(verbose_name='تاريخ الاستخدام')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='delivery_fee',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='رسوم التوصيل'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='discount_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='قيمة الخصم'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='stock_status',
+            field=models.CharField(blank=True, choices=[('reserved', 'محجوز'), ('committed', 'مؤكد'), ('released', 'مُعاد')], default='', max_length=20, verbose_name='حالة حجز المخزون'),
+        ),
+    ]
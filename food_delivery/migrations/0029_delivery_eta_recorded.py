@@ -0,0 +1,41 @@
+# Generated by Django 5.2.10 on 2026-10-19 16:08
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_counted_deliveries(apps, schema_editor):
+    # EtaStat so far held everything completed up to its newest observation
+    EtaStat = apps.get_model('food_delivery', 'EtaStat')
+    last = EtaStat.objects.aggregate(last=Max('last_observed_at'))['last']
+    if last is None:
+        return
+    for name in ('Delivery', 'ArchivedDelivery'):
+        apps.get_model('food_delivery', name).objects.filter(
+            delivery_status='delivered', actual_time__lte=last
+        ).update(eta_recorded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0028_archive_order_columns_and_redemptions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archiveddelivery',
+            name='eta_recorded',
+            field=models.BooleanField(default=False, verbose_name='محتسب في تقدير الوقت'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='eta_recorded',
+            field=models.BooleanField(default=False, verbose_name='محتسب في تقدير الوقت'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(condition=models.Q(('eta_recorded', False)), fields=['delivery_status'], name='delivery_eta_pending_idx'),
+        ),
+        migrations.RunPython(mark_counted_deliveries, migrations.RunPython.noop),
+    ]
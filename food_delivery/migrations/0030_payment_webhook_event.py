@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-19 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0029_delivery_eta_recorded'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('event_id', models.AutoField(primary_key=True, serialize=False)),
+                ('transaction_id', models.CharField(db_index=True, max_length=100, verbose_name='رقم المعاملة')),
+                ('status', models.CharField(choices=[('pending', 'قيد الانتظار'), ('processing', 'قيد المعالجة'), ('completed', 'مكتمل'), ('failed', 'فشل'), ('refunded', 'تم الاسترداد')], max_length=20, verbose_name='الحالة')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الاستلام')),
+            ],
+        ),
+    ]
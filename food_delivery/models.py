@@ -1,8 +1,12 @@
 # models.py
 # models.py
+import math
+from datetime import datetime, timezone as dt_timezone
+
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 # Custom User Manager
 class UserManager(BaseUserManager):
@@ -70,6 +74,10 @@ class Restaurant(models.Model):
         verbose_name='التقييم'
     )
     cuisine_type = models.CharField(max_length=100, verbose_name='نوع المطبخ')
+    latitude = models.FloatField(null=True, blank=True, verbose_name='خط العرض')
+    longitude = models.FloatField(null=True, blank=True, verbose_name='خط الطول')
+    # Polygon of [lat, lng] vertices; indexed into DeliveryZoneCell, see zones.py
+    delivery_zone = models.JSONField(null=True, blank=True, verbose_name='منطقة التوصيل')
     
     def __str__(self):
         return self.name
@@ -103,9 +111,53 @@ class Menu(models.Model):
         default='available',
         verbose_name='حالة التوفر'
     )
+    # NULL means stock is not tracked for this item
+    stock = models.PositiveIntegerField(null=True, blank=True, verbose_name='الكمية المتوفرة')
     
     def __str__(self):
         return f"{self.item_name} - {self.restaurant.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        menu = super().from_db(db, field_names, values)
+        # The stock as loaded: save() only writes it back when it was changed
+        menu._loaded_stock = menu.__dict__.get('stock', models.DEFERRED)
+        return menu
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        if fields is None or 'stock' in fields:
+            self._loaded_stock = self.__dict__.get('stock', models.DEFERRED)
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Read first: a deferred stock is loaded here and recorded as loaded
+        stock = self.stock
+        loaded = getattr(self, '_loaded_stock', models.DEFERRED)
+        if not self._state.adding and update_fields is None and stock == loaded:
+            # Stock untouched: leave the column to the reservations' conditional
+            # UPDATEs, which may have moved it since this row was loaded
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'stock' and field.attname not in deferred
+            ]
+        elif update_fields is None or 'stock' in update_fields:
+            # Set by hand: keep the flag in step, only when the stock crosses
+            # zero against the row as it is now. A status chosen by hand stays.
+            before = None
+            if not self._state.adding:
+                before = Menu.objects.filter(pk=self.pk).values_list('stock', flat=True).first()
+            status = self.availability_status
+            if stock == 0 and before != 0 and status == 'available':
+                self.availability_status = 'out_of_stock'
+            elif stock and before == 0 and status == 'out_of_stock':
+                self.availability_status = 'available'
+            if update_fields is not None and self.availability_status != status:
+                kwargs['update_fields'] = {*update_fields, 'availability_status'}
+        super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is None or 'stock' in kwargs['update_fields']:
+            self._loaded_stock = stock
 
 # Order Model
 class Order(models.Model):
@@ -117,6 +169,11 @@ class Order(models.Model):
         ('delivered', 'تم التسليم'),
         ('canceled', 'ملغي'),
     ]
+    STOCK_STATUS = [
+        ('reserved', 'محجوز'),
+        ('committed', 'مؤكد'),
+        ('released', 'مُعاد'),
+    ]
     
     order_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(
@@ -143,9 +200,45 @@ class Order(models.Model):
         verbose_name='المبلغ الإجمالي'
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    # Set once the delivered order has been added to the sales rollups
+    sales_recorded = models.BooleanField(default=False, verbose_name='محتسب في الإحصائيات')
+    # Set once the delivered order's item pairs are in the co-occurrence counts
+    pairs_recorded = models.BooleanField(default=False, verbose_name='محتسب في التوصيات')
+    # Promotions applied at checkout, see promotions.py; total_amount is net of both
+    discount_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name='قيمة الخصم'
+    )
+    delivery_fee = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name='رسوم التوصيل'
+    )
+    # Stock reservation lifecycle for the order's items, see stock.py
+    stock_status = models.CharField(
+        max_length=20,
+        choices=STOCK_STATUS,
+        blank=True,
+        default='',
+        verbose_name='حالة حجز المخزون'
+    )
     
     def __str__(self):
         return f"Order #{self.order_id} - {self.user.email}"
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['order_status'],
+                condition=models.Q(sales_recorded=False),
+                name='order_unrecorded_sales_idx',
+            ),
+            models.Index(fields=['order_status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
 
 # OrderItem Model
 class OrderItem(models.Model):
@@ -182,6 +275,7 @@ class Payment(models.Model):
     
     PAYMENT_STATUS = [
         ('pending', 'قيد الانتظار'),
+        ('processing', 'قيد المعالجة'),
         ('completed', 'مكتمل'),
         ('failed', 'فشل'),
         ('refunded', 'تم الاسترداد'),
@@ -218,9 +312,32 @@ class Payment(models.Model):
         verbose_name='المبلغ'
     )
     paid_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الدفع')
+    settled_at = models.DateTimeField(null=True, blank=True, verbose_name='تاريخ التسوية')
     
     def __str__(self):
-        return f"Payment #{self.payment_id} - {self.order.order_id}"
+        return f"Payment #{self.payment_id} - {self.order_id}"
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['payment_id'],
+                condition=models.Q(payment_status='completed', settled_at__isnull=True),
+                name='payment_unsettled_idx',
+            ),
+            models.Index(fields=['payment_status', 'paid_at'], name='payment_status_paid_idx'),
+            models.Index(fields=['paid_at'], name='payment_paid_idx'),
+        ]
+
+# Payment Webhook Event Model (gateway notifications that arrived before
+# submit_payment stored their transaction_id, see payments.py)
+class PaymentWebhookEvent(models.Model):
+    event_id = models.AutoField(primary_key=True)
+    transaction_id = models.CharField(max_length=100, db_index=True, verbose_name='رقم المعاملة')
+    status = models.CharField(max_length=20, choices=Payment.PAYMENT_STATUS, verbose_name='الحالة')
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الاستلام')
+    
+    def __str__(self):
+        return f"{self.transaction_id} -> {self.status}"
 
 # Driver Model
 class Driver(models.Model):
@@ -231,6 +348,14 @@ class Driver(models.Model):
     ]
     
     driver_id = models.AutoField(primary_key=True)
+    user = models.OneToOneField(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='driver',
+        verbose_name='حساب المستخدم'
+    )
     name = models.CharField(max_length=100, verbose_name='الاسم')
     phone = models.CharField(max_length=15, verbose_name='رقم الهاتف')
     vehicle_type = models.CharField(max_length=50, verbose_name='نوع المركبة')
@@ -240,6 +365,9 @@ class Driver(models.Model):
         default='available',
         verbose_name='حالة التوفر'
     )
+    latitude = models.FloatField(null=True, blank=True, verbose_name='خط العرض')
+    longitude = models.FloatField(null=True, blank=True, verbose_name='خط الطول')
+    location_updated_at = models.DateTimeField(null=True, blank=True, verbose_name='آخر تحديث للموقع')
     
     def __str__(self):
         return self.name
@@ -273,15 +401,49 @@ class Delivery(models.Model):
         default='assigned',
         verbose_name='حالة التوصيل'
     )
+    assigned_at = models.DateTimeField(null=True, blank=True, verbose_name='وقت التعيين')
     estimated_time = models.DateTimeField(verbose_name='الوقت المقدر للتوصيل')
     actual_time = models.DateTimeField(
         null=True,
         blank=True,
         verbose_name='الوقت الفعلي للتوصيل'
     )
+    # Set once the completed delivery has been folded into EtaStat, see eta.py
+    eta_recorded = models.BooleanField(default=False, verbose_name='محتسب في تقدير الوقت')
     
     def __str__(self):
-        return f"Delivery #{self.delivery_id} - Order #{self.order.order_id}"
+        return f"Delivery #{self.delivery_id} - Order #{self.order_id}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['delivery_status'], name='delivery_status_idx'),
+            models.Index(
+                fields=['delivery_status'],
+                condition=models.Q(eta_recorded=False),
+                name='delivery_eta_pending_idx',
+            ),
+        ]
+
+# ETA Statistics Model (lookup table for delivery time prediction)
+class EtaStat(models.Model):
+    eta_stat_id = models.AutoField(primary_key=True)
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='eta_stats',
+        verbose_name='المطعم'
+    )
+    hour = models.PositiveSmallIntegerField(verbose_name='الساعة')
+    vehicle_type = models.CharField(max_length=50, verbose_name='نوع المركبة')
+    sample_count = models.PositiveIntegerField(default=0, verbose_name='عدد العينات')
+    total_seconds = models.FloatField(default=0.0, verbose_name='مجموع المدة بالثواني')
+    last_observed_at = models.DateTimeField(null=True, blank=True, verbose_name='آخر توصيل محسوب')
+    
+    def __str__(self):
+        return f"ETA {self.restaurant_id} @{self.hour}h {self.vehicle_type}"
+    
+    class Meta:
+        unique_together = [('restaurant', 'hour', 'vehicle_type')]
 
 # Review Model
 class Review(models.Model):
@@ -298,9 +460,12 @@ class Review(models.Model):
         related_name='reviews',
         verbose_name='المطعم'
     )
+    # Becomes NULL when the order is moved to the archive; the review stays
     order = models.ForeignKey(
         Order,
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
         related_name='reviews',
         verbose_name='الطلب'
     )
@@ -309,7 +474,461 @@ class Review(models.Model):
         verbose_name='التقييم'
     )
     comment = models.TextField(blank=True, verbose_name='تعليق')
+    helpful_count = models.PositiveIntegerField(default=0, verbose_name='عدد الإشادات')
+    # Ranking for the "top" feed; see review_score()
+    score = models.FloatField(default=0.0, verbose_name='درجة الترتيب')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    
+    def __str__(self):
+        return f"Review by {self.user.email} for {self.restaurant.name}"
+    
+    def save(self, *args, **kwargs):
+        self.score = review_score(self.helpful_count, self.created_at or timezone.now())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'helpful_count' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'score'}
+        super().save(*args, **kwargs)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='review_created_idx'),
+            models.Index(fields=['restaurant', '-created_at', '-review_id'], name='review_restaurant_recent_idx'),
+            models.Index(fields=['restaurant', '-score', '-review_id'], name='review_restaurant_score_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'order'], name='review_unique_user_order'),
+        ]
+
+# Review ranking: log-scaled helpfulness plus a recency term that grows with
+# creation time, so newer reviews outrank older ones without ever rescoring
+# existing rows. A review needs ten times the helpful votes to outrank one
+# written REVIEW_RECENCY_SECONDS later.
+REVIEW_SCORE_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+REVIEW_RECENCY_SECONDS = 3 * 24 * 3600
+
+def review_score(helpful_count, created_at):
+    age = (created_at - REVIEW_SCORE_EPOCH).total_seconds()
+    return math.log10(helpful_count + 1) + age / REVIEW_RECENCY_SECONDS
+
+# Review Vote Model (one "helpful" vote per user and review)
+class ReviewVote(models.Model):
+    review = models.ForeignKey(
+        Review,
+        on_delete=models.CASCADE,
+        related_name='votes',
+        verbose_name='التقييم'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='review_votes',
+        verbose_name='المستخدم'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
     
     def __str__(self):
-        return f"Review by {self.user.email} for {self.restaurant.name}"
\ No newline at end of file
+        return f"Vote by {self.user_id} on review #{self.review_id}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['review', 'user'], name='review_vote_unique_user'),
+        ]
+
+# Catalog Change Log Model (delta sync for the mobile app)
+class CatalogChange(models.Model):
+    ACTIONS = [
+        ('created', 'إنشاء'),
+        ('updated', 'تعديل'),
+        ('deleted', 'حذف'),
+    ]
+    
+    ENTITIES = [
+        ('restaurant', 'مطعم'),
+        ('menu', 'عنصر قائمة'),
+    ]
+    
+    # seq is the monotonic sync position handed out to clients
+    seq = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITIES, verbose_name='النوع')
+    object_id = models.IntegerField(verbose_name='رقم العنصر')
+    action = models.CharField(max_length=10, choices=ACTIONS, verbose_name='العملية')
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name='وقت التغيير')
+    
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.entity} {self.object_id}"
+    
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            # Latest change per object, e.g. the cart's snapshot version check
+            models.Index(fields=['entity', 'object_id', 'seq'], name='catalog_change_object_idx'),
+        ]
+        verbose_name = 'تغيير في الكتالوج'
+        verbose_name_plural = 'تغييرات الكتالوج'
+
+
+# Background Task Model (durable queue for work done after the response)
+class Task(models.Model):
+    TASK_STATUS = [
+        ('queued', 'في الانتظار'),
+        ('running', 'قيد التنفيذ'),
+        ('done', 'مكتمل'),
+        ('failed', 'فشل'),
+    ]
+    
+    task_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100, verbose_name='اسم المهمة')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='البيانات')
+    status = models.CharField(max_length=10, choices=TASK_STATUS, default='queued', verbose_name='الحالة')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='عدد المحاولات')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='أقصى عدد للمحاولات')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='التنفيذ بعد')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='وقت الحجز')
+    last_error = models.TextField(blank=True, verbose_name='آخر خطأ')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    
+    def __str__(self):
+        return f"Task #{self.task_id} {self.name} ({self.status})"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+
+
+# Sales Rollup Models (pre-aggregated dashboard statistics)
+GRAIN_CHOICES = [
+    ('hour', 'ساعة'),
+    ('day', 'يوم'),
+]
+
+class RestaurantSalesRollup(models.Model):
+    rollup_id = models.BigAutoField(primary_key=True)
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups',
+        verbose_name='المطعم'
+    )
+    grain = models.CharField(max_length=4, choices=GRAIN_CHOICES, verbose_name='الدقة')
+    bucket_start = models.DateTimeField(verbose_name='بداية الفترة')
+    order_count = models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='الإيرادات')
+    
+    def __str__(self):
+        return f"{self.restaurant_id} {self.grain} {self.bucket_start:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        unique_together = [('restaurant', 'grain', 'bucket_start')]
+
+class MenuItemSalesRollup(models.Model):
+    rollup_id = models.BigAutoField(primary_key=True)
+    menu_item = models.ForeignKey(
+        Menu,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups',
+        verbose_name='عنصر القائمة'
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='item_sales_rollups',
+        verbose_name='المطعم'
+    )
+    grain = models.CharField(max_length=4, choices=GRAIN_CHOICES, verbose_name='الدقة')
+    bucket_start = models.DateTimeField(verbose_name='بداية الفترة')
+    quantity = models.PositiveIntegerField(default=0, verbose_name='الكمية')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='الإيرادات')
+    
+    def __str__(self):
+        return f"{self.menu_item_id} {self.grain} {self.bucket_start:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        unique_together = [('menu_item', 'grain', 'bucket_start')]
+        indexes = [
+            models.Index(fields=['restaurant', 'grain', 'bucket_start'], name='item_rollup_restaurant_idx'),
+        ]
+
+
+# Archive Models (completed orders moved out of the hot tables)
+# Plain integer columns instead of foreign keys so archived rows never
+# block or cascade from deletes in the live tables.
+class ArchivedOrder(models.Model):
+    order_id = models.IntegerField(primary_key=True)
+    user_id = models.IntegerField(verbose_name='المستخدم')
+    restaurant_id = models.IntegerField(verbose_name='المطعم')
+    order_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS, verbose_name='حالة الطلب')
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='المبلغ الإجمالي')
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='قيمة الخصم')
+    delivery_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='رسوم التوصيل')
+    stock_status = models.CharField(max_length=20, choices=Order.STOCK_STATUS, blank=True, default='', verbose_name='حالة حجز المخزون')
+    created_at = models.DateTimeField(verbose_name='تاريخ الإنشاء')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الأرشفة')
+    
+    def __str__(self):
+        return f"Archived order #{self.order_id}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', '-created_at'], name='archived_order_user_idx'),
+        ]
+
+class ArchivedOrderItem(models.Model):
+    order_item_id = models.IntegerField(primary_key=True)
+    order_id = models.IntegerField(db_index=True, verbose_name='الطلب')
+    menu_item_id = models.IntegerField(verbose_name='عنصر القائمة')
+    quantity = models.PositiveIntegerField(verbose_name='الكمية')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='السعر')
+    
+    def __str__(self):
+        return f"Archived item #{self.order_item_id}"
+
+class ArchivedPayment(models.Model):
+    payment_id = models.IntegerField(primary_key=True)
+    order_id = models.IntegerField(unique=True, verbose_name='الطلب')
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHODS, verbose_name='طريقة الدفع')
+    payment_status = models.CharField(max_length=20, choices=Payment.PAYMENT_STATUS, verbose_name='حالة الدفع')
+    transaction_id = models.CharField(max_length=100, unique=True, null=True, blank=True, verbose_name='رقم المعاملة')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='المبلغ')
+    paid_at = models.DateTimeField(verbose_name='تاريخ الدفع')
+    settled_at = models.DateTimeField(null=True, blank=True, verbose_name='تاريخ التسوية')
+    
+    def __str__(self):
+        return f"Archived payment #{self.payment_id}"
+
+class ArchivedDelivery(models.Model):
+    delivery_id = models.IntegerField(primary_key=True)
+    order_id = models.IntegerField(unique=True, verbose_name='الطلب')
+    driver_id = models.IntegerField(null=True, blank=True, verbose_name='السائق')
+    delivery_status = models.CharField(max_length=20, choices=Delivery.DELIVERY_STATUS, verbose_name='حالة التوصيل')
+    assigned_at = models.DateTimeField(null=True, blank=True, verbose_name='وقت التعيين')
+    estimated_time = models.DateTimeField(verbose_name='الوقت المقدر للتوصيل')
+    actual_time = models.DateTimeField(null=True, blank=True, verbose_name='الوقت الفعلي للتوصيل')
+    eta_recorded = models.BooleanField(default=False, verbose_name='محتسب في تقدير الوقت')
+    
+    def __str__(self):
+        return f"Archived delivery #{self.delivery_id}"
+
+
+# Item Co-occurrence Model ("frequently ordered together")
+# One cell of the sparse item x item matrix: in how many delivered orders both
+# items appear. The diagonal (menu_item == other_item) holds the item's own
+# order count, used to normalise scores.
+class ItemPairCount(models.Model):
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='المطعم'
+    )
+    menu_item = models.ForeignKey(
+        Menu,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='عنصر القائمة'
+    )
+    other_item = models.ForeignKey(
+        Menu,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='العنصر المرافق'
+    )
+    order_count = models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات')
+    
+    def __str__(self):
+        return f"{self.menu_item_id} + {self.other_item_id}: {self.order_count}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'other_item'], name='item_pair_unique'),
+        ]
+
+# Menu Recommendation Model (top-k neighbours per item, rebuilt from ItemPairCount)
+class MenuRecommendation(models.Model):
+    menu_item = models.ForeignKey(
+        Menu,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='عنصر القائمة'
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name='الترتيب')
+    recommended = models.ForeignKey(
+        Menu,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='العنصر المقترح'
+    )
+    score = models.FloatField(verbose_name='الدرجة')
+    
+    def __str__(self):
+        return f"{self.menu_item_id} -> {self.recommended_id} (#{self.rank})"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'rank'], name='menu_recommendation_rank_unique'),
+        ]
+
+
+# Delivery Zone Cell Model (grid cell -> restaurants whose zone touches it)
+class DeliveryZoneCell(models.Model):
+    cell = models.BigIntegerField(verbose_name='الخلية')
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='zone_cells',
+        verbose_name='المطعم'
+    )
+    # The whole cell lies inside the zone: no polygon test needed
+    full = models.BooleanField(default=False, verbose_name='داخل المنطقة بالكامل')
+    
+    def __str__(self):
+        return f"{self.cell} -> {self.restaurant_id}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cell', 'restaurant'], name='zone_cell_unique'),
+        ]
+
+
+# Cart Model (server-side cart: the row is the only copy, shared by every worker)
+class Cart(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='cart',
+        verbose_name='المستخدم'
+    )
+    data = models.JSONField(default=dict, verbose_name='محتوى السلة')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')
+    
+    def __str__(self):
+        return f"Cart of {self.user_id}"
+
+
+# Backfill Progress Model (resume point of a batched backfill, see online_schema.py)
+class BackfillProgress(models.Model):
+    name = models.CharField(max_length=100, unique=True, verbose_name='الاسم')
+    last_pk = models.BigIntegerField(default=0, verbose_name='آخر مفتاح')
+    rows_updated = models.BigIntegerField(default=0, verbose_name='الصفوف المحدثة')
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name='وقت البدء')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='وقت الانتهاء')
+    
+    def __str__(self):
+        return f"{self.name} @ {self.last_pk}"
+
+
+# Promotion Model (automatic discounts and coupons, compiled into an in-memory index, see promotions.py)
+class Promotion(models.Model):
+    KINDS = [
+        ('percent_off', 'خصم بنسبة مئوية'),
+        ('buy_x_get_y', 'اشترِ X واحصل على Y'),
+        ('free_delivery', 'توصيل مجاني'),
+    ]
+    
+    promotion_id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=200, verbose_name='اسم العرض')
+    kind = models.CharField(max_length=20, choices=KINDS, verbose_name='نوع العرض')
+    # NULL applies to every restaurant
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='promotions',
+        verbose_name='المطعم'
+    )
+    # The discounted item of a buy_x_get_y promotion
+    menu_item = models.ForeignKey(
+        Menu,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='promotions',
+        verbose_name='عنصر القائمة'
+    )
+    # Coupon code the customer enters; NULL for promotions applied automatically
+    code = models.CharField(max_length=40, unique=True, null=True, blank=True, verbose_name='رمز القسيمة')
+    percent = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        verbose_name='نسبة الخصم'
+    )
+    buy_quantity = models.PositiveIntegerField(null=True, blank=True, verbose_name='الكمية المشتراة')
+    free_quantity = models.PositiveIntegerField(null=True, blank=True, verbose_name='الكمية المجانية')
+    min_subtotal = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name='الحد الأدنى للطلب'
+    )
+    starts_at = models.DateTimeField(default=timezone.now, verbose_name='يبدأ في')
+    ends_at = models.DateTimeField(null=True, blank=True, verbose_name='ينتهي في')
+    is_active = models.BooleanField(default=True, verbose_name='مفعّل')
+    # NULL means unlimited; used_count only moves through conditional UPDATEs
+    max_uses = models.PositiveIntegerField(null=True, blank=True, verbose_name='الحد الأقصى للاستخدام')
+    used_count = models.PositiveIntegerField(default=0, verbose_name='مرات الاستخدام')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    # With the row count, the version workers compare to recompile their index
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='آخر تحديث')
+    
+    def __str__(self):
+        return self.name
+    
+    def clean(self):
+        # Not a module import: views and serializers star-import this module
+        # and use DRF's ValidationError
+        from django.core.exceptions import ValidationError
+        
+        if self.kind == 'percent_off' and not self.percent:
+            raise ValidationError({'percent': 'نسبة الخصم مطلوبة لهذا النوع'})
+        if self.kind == 'buy_x_get_y':
+            if self.menu_item_id is None or not self.buy_quantity or not self.free_quantity:
+                raise ValidationError('عنصر القائمة والكميات مطلوبة لعرض اشترِ X واحصل على Y')
+            if self.restaurant_id is not None and self.menu_item.restaurant_id != self.restaurant_id:
+                raise ValidationError({'menu_item': 'العنصر لا يتبع هذا المطعم'})
+        if self.ends_at is not None and self.ends_at <= self.starts_at:
+            raise ValidationError({'ends_at': 'يجب أن ينتهي العرض بعد بدايته'})
+    
+    class Meta:
+        verbose_name = 'عرض'
+        verbose_name_plural = 'العروض'
+
+
+# Promotion Redemption Model (one promotion applied to one order, released on cancel)
+class PromotionRedemption(models.Model):
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='redemptions',
+        verbose_name='الطلب'
+    )
+    promotion = models.ForeignKey(
+        Promotion,
+        on_delete=models.CASCADE,
+        related_name='redemptions',
+        verbose_name='العرض'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='قيمة الخصم')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الاستخدام')
+    
+    def __str__(self):
+        return f"{self.promotion_id} on order {self.order_id}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'promotion'], name='redemption_order_promotion_unique'),
+        ]
+
+class ArchivedPromotionRedemption(models.Model):
+    id = models.IntegerField(primary_key=True)
+    order_id = models.IntegerField(db_index=True, verbose_name='الطلب')
+    promotion_id = models.IntegerField(db_index=True, verbose_name='العرض')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='قيمة الخصم')
+    created_at = models.DateTimeField(verbose_name='تاريخ الاستخدام')
+    
+    def __str__(self):
+        return f"Archived redemption #{self.id}"
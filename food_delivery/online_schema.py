@@ -0,0 +1,204 @@
+# online_schema.py (تغييرات المخطط دون قفل الجداول: فهارس متزامنة وتعبئة على دفعات)
+import logging
+import time
+
+from django.apps import apps as global_apps
+from django.db import NotSupportedError, migrations, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _concurrently(operation, schema_editor):
+    """True on PostgreSQL, where the migration must not run in a transaction."""
+    if schema_editor.connection.vendor != 'postgresql':
+        # SQLite has a single writer anyway: a plain build is the same lock
+        return False
+    if schema_editor.atomic_migration:
+        raise NotSupportedError(
+            f'{operation.__class__.__name__} needs a migration with atomic = False on PostgreSQL'
+        )
+    return True
+
+
+def _drop_invalid_index(schema_editor, name):
+    # A failed CONCURRENTLY build leaves an INVALID index behind that blocks the retry
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE c.relname = %s AND NOT i.indisvalid',
+            [name],
+        )
+        invalid = cursor.fetchone() is not None
+    if invalid:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}')
+
+
+def _add_index(operation, schema_editor, model, index):
+    if _concurrently(operation, schema_editor):
+        _drop_invalid_index(schema_editor, index.name)
+        schema_editor.add_index(model, index, concurrently=True)
+    else:
+        schema_editor.add_index(model, index)
+
+
+def _remove_index(operation, schema_editor, model, index):
+    if _concurrently(operation, schema_editor):
+        schema_editor.remove_index(model, index, concurrently=True)
+    else:
+        schema_editor.remove_index(model, index)
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """AddIndex that builds with CREATE INDEX CONCURRENTLY on PostgreSQL.
+
+    Writes to the table keep going during the build. The migration needs
+    ``atomic = False``. Other databases get a plain CREATE INDEX.
+    """
+
+    def describe(self):
+        return f'Concurrently create index {self.index.name} on {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            _add_index(self, schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            _remove_index(self, schema_editor, model, self.index)
+
+
+class RemoveIndexConcurrently(migrations.RemoveIndex):
+    """RemoveIndex that drops with DROP INDEX CONCURRENTLY on PostgreSQL."""
+
+    def describe(self):
+        return f'Concurrently remove index {self.name} from {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            _remove_index(self, schema_editor, model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            _add_index(self, schema_editor, model, index)
+
+
+def _check_integer_pk(model):
+    # Progress is kept as a number (BackfillProgress.last_pk) and resumed with pk__gt
+    pk = model._meta.pk
+    if pk.is_relation:
+        pk = pk.target_field
+    if not isinstance(pk, models.IntegerField):
+        raise ValueError(f'Backfill needs an integer primary key, {model._meta.label} has {pk.get_internal_type()}')
+
+
+class Backfill:
+    """Update every row of a table in primary-key order, one short transaction per batch.
+
+    The table needs an integer primary key (ValueError otherwise).
+    ``values`` is passed to ``QuerySet.update()``; ``update`` is a callable
+    taking the batch queryset for anything more involved. ``where`` limits
+    the batch to rows that still need it. Progress is saved in
+    BackfillProgress with each batch, so a rerun carries on from the last
+    committed key. Between batches it sleeps ``pause`` seconds, plus enough
+    to keep the writes to ``duty_cycle`` of the wall time.
+
+    In a migration, use ``backfill.operation()`` in a migration with
+    ``atomic = False`` that depends on the one creating BackfillProgress.
+    ``manage.py run_backfill`` runs the same backfill ahead of a deploy.
+    """
+
+    def __init__(self, name, model, values=None, update=None, where=None,
+                 batch_size=1000, pause=0.05, duty_cycle=0.5):
+        if (values is None) == (update is None):
+            raise ValueError('Pass exactly one of values or update')
+        if not 0 < duty_cycle <= 1:
+            raise ValueError('duty_cycle must be in (0, 1]')
+        try:
+            _check_integer_pk(global_apps.get_model(model))
+        except LookupError:
+            # Model since removed from the code: run() checks the migration's version
+            pass
+        self.name = name
+        self.model = model
+        self.values = values
+        self.update = update
+        self.where = where
+        self.batch_size = batch_size
+        self.pause = pause
+        self.duty_cycle = duty_cycle
+
+    def _batch(self, queryset):
+        if self.where is not None:
+            queryset = queryset.filter(self.where)
+        if self.update is not None:
+            return self.update(queryset) or 0
+        return queryset.update(**self.values)
+
+    def run(self, apps=global_apps, max_batches=None, batch_size=None, pause=None):
+        """Run (or resume) the backfill. Returns the number of rows updated by this call."""
+        model = apps.get_model(self.model)
+        _check_integer_pk(model)
+        progress_model = apps.get_model('food_delivery', 'BackfillProgress')
+        progress, _ = progress_model.objects.get_or_create(name=self.name)
+        if progress.finished_at is not None:
+            return 0
+        batch_size = batch_size or self.batch_size
+        pause = self.pause if pause is None else pause
+        manager = model._base_manager
+        last_pk = progress.last_pk
+        updated = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            started = time.monotonic()
+            with transaction.atomic():
+                keys = list(
+                    manager.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+                )
+                count = 0
+                if keys:
+                    # A key range rather than pk__in keeps the UPDATE an index range scan
+                    count = self._batch(manager.filter(pk__gt=last_pk, pk__lte=keys[-1]))
+                    last_pk = keys[-1]
+                done = len(keys) < batch_size
+                progress_model.objects.filter(pk=progress.pk).update(
+                    last_pk=last_pk,
+                    rows_updated=F('rows_updated') + count,
+                    finished_at=timezone.now() if done else None,
+                )
+            updated += count
+            batches += 1
+            if done:
+                logger.info('Backfill %s finished', self.name)
+                return updated
+            elapsed = time.monotonic() - started
+            time.sleep(pause + elapsed * (1 / self.duty_cycle - 1))
+        return updated
+
+    def _migrate(self, apps, schema_editor):
+        self.run(apps)
+
+    def operation(self):
+        """A RunPython operation running this backfill with the migration's models."""
+        return migrations.RunPython(self._migrate, migrations.RunPython.noop, elidable=True)
+
+
+def find_backfills():
+    """Every Backfill used by a migration on disk, by name."""
+    from django.db.migrations.loader import MigrationLoader
+
+    found = {}
+    for migration in MigrationLoader(None, ignore_no_migrations=True).disk_migrations.values():
+        for operation in migration.operations:
+            code = getattr(operation, 'code', None)
+            backfill = getattr(code, '__self__', None)
+            if isinstance(backfill, Backfill):
+                found[backfill.name] = backfill
+    return found
@@ -0,0 +1,253 @@
+# payments.py (معالجة المدفوعات عبر بوابة دفع قابلة للتبديل)
+import hashlib
+import hmac
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Payment, PaymentWebhookEvent
+
+SETTLEMENT_BATCH_SIZE = 500
+
+
+class GatewayError(Exception):
+    """Transient gateway failure (timeout, 5xx); the submission is retried."""
+
+
+@dataclass
+class GatewayResult:
+    transaction_id: str
+    # 'completed', 'failed', or 'processing' when the outcome arrives by webhook
+    status: str
+
+
+class PaymentGateway:
+    """Interface every payment gateway backend implements.
+
+    ``submit`` may be retried after a crash, so backends must pass
+    ``payment.payment_id`` to the gateway as the idempotency key.
+    """
+
+    def __init__(self, webhook_secret=''):
+        self.webhook_secret = webhook_secret
+
+    def submit(self, payment):
+        raise NotImplementedError
+
+    def settle(self, transaction_ids):
+        """Settle captured transactions; returns the ids the gateway accepted."""
+        raise NotImplementedError
+
+    def sign(self, body):
+        return hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+
+    def verify_webhook(self, body, signature):
+        if not self.webhook_secret or not signature:
+            return False
+        return hmac.compare_digest(self.sign(body), signature)
+
+
+class SimulatorGateway(PaymentGateway):
+    """Local stand-in for a real gateway, for development and offline load tests.
+
+    ``latency_ms`` is slept on every call, ``failure_rate`` of submissions raise
+    GatewayError (retried) and ``decline_rate`` come back as failed payments.
+    With ``async_confirm`` the result is left as 'processing' for a webhook.
+    """
+
+    def __init__(self, latency_ms=200, failure_rate=0.0, decline_rate=0.0,
+                 async_confirm=False, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self.async_confirm = async_confirm
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        with self._lock:
+            return self._random.random()
+
+    def submit(self, payment):
+        time.sleep(self.latency_ms / 1000)
+        roll = self._roll()
+        if roll < self.failure_rate:
+            raise GatewayError('simulated gateway timeout')
+        transaction_id = f"sim_{uuid.uuid4().hex}"
+        if roll < self.failure_rate + self.decline_rate:
+            return GatewayResult(transaction_id, 'failed')
+        return GatewayResult(transaction_id, 'processing' if self.async_confirm else 'completed')
+
+    def settle(self, transaction_ids):
+        time.sleep(self.latency_ms / 1000)
+        return list(transaction_ids)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                config = getattr(settings, 'PAYMENT_GATEWAY', {})
+                backend = import_string(config.get('BACKEND', 'food_delivery.payments.SimulatorGateway'))
+                _gateway = backend(**config.get('OPTIONS', {}))
+    return _gateway
+
+
+def request_payment(payment_id):
+    """Move a pending payment to 'processing' and queue its gateway submission.
+
+    The task row is written in the same transaction as the status change, so
+    either both happen or neither does. Returns False if the payment is not
+    pending (already submitted, completed, ...).
+    """
+    from .tasks import enqueue
+
+    with transaction.atomic():
+        claimed = Payment.objects.filter(payment_id=payment_id, payment_status='pending').update(
+            payment_status='processing'
+        )
+        if claimed:
+            enqueue('submit_payment', payment_id=payment_id)
+    return bool(claimed)
+
+
+def submit_payment(payment_id):
+    payment = Payment.objects.filter(payment_id=payment_id, payment_status='processing').first()
+    if payment is None:
+        return None
+    if payment.transaction_id:
+        # Already submitted; the outcome will arrive by webhook
+        return payment.payment_status
+    result = get_gateway().submit(payment)
+    with transaction.atomic():
+        Payment.objects.filter(payment_id=payment_id, payment_status='processing').update(
+            transaction_id=result.transaction_id,
+            payment_status=result.status,
+        )
+        if result.status == 'completed':
+            _payment_completed(payment_id)
+        # The webhook can arrive while the gateway call is still returning
+        _replay_events([result.transaction_id])
+    return result.status
+
+
+def submission_given_up(payment_id):
+    """Hand a payment whose submission kept failing back to 'pending'.
+
+    The customer can then request it again; the gateway sees the same
+    payment_id as idempotency key, so an earlier attempt that did get
+    through is not charged twice. A payment with a transaction_id is
+    left alone: its outcome arrives by webhook.
+    """
+    return Payment.objects.filter(
+        payment_id=payment_id, payment_status='processing', transaction_id__isnull=True
+    ).update(payment_status='pending')
+
+
+def _payment_completed(payment_id):
+    from .tasks import enqueue_on_commit
+
+    enqueue_on_commit('send_payment_receipt', payment_id=payment_id)
+
+
+def _apply(transaction_id, new_status):
+    allowed_from = ['completed'] if new_status == 'refunded' else ['processing']
+    payment_ids = list(
+        Payment.objects.select_for_update()
+        .filter(transaction_id=transaction_id, payment_status__in=allowed_from)
+        .values_list('payment_id', flat=True)
+    )
+    Payment.objects.filter(payment_id__in=payment_ids).update(payment_status=new_status)
+    if new_status == 'completed':
+        for payment_id in payment_ids:
+            _payment_completed(payment_id)
+    return len(payment_ids)
+
+
+def apply_webhook(transaction_id, new_status):
+    """Reconcile a gateway notification; matched through the unique transaction_id.
+
+    A notification for a transaction_id no payment has yet (submit_payment
+    stores it only once the gateway call returns) is kept as a
+    PaymentWebhookEvent and applied once the id is stored.
+    """
+    if not transaction_id or new_status not in ('completed', 'failed', 'refunded'):
+        raise ValueError(new_status)
+    with transaction.atomic():
+        updated = _apply(transaction_id, new_status)
+        if not updated and not Payment.objects.filter(transaction_id=transaction_id).exists():
+            PaymentWebhookEvent.objects.create(transaction_id=transaction_id, status=new_status)
+    return updated
+
+
+def _replay_events(transaction_ids):
+    """Apply the kept notifications for transaction_ids that now have a payment."""
+    known = set(
+        Payment.objects.filter(transaction_id__in=transaction_ids).values_list('transaction_id', flat=True)
+    )
+    events = list(
+        PaymentWebhookEvent.objects.select_for_update()
+        .filter(transaction_id__in=known)
+        .order_by('event_id')
+    )
+    for event in events:
+        _apply(event.transaction_id, event.status)
+    PaymentWebhookEvent.objects.filter(event_id__in=[event.event_id for event in events]).delete()
+    return len(events)
+
+
+def reconcile_webhook_events(batch_size=SETTLEMENT_BATCH_SIZE):
+    """Apply kept notifications whose payment got its transaction_id since.
+
+    submit_payment replays them itself; this catches a notification stored
+    concurrently with that replay. Returns the number of events applied.
+    """
+    applied = 0
+    last_id = 0
+    while True:
+        batch = list(
+            PaymentWebhookEvent.objects.filter(event_id__gt=last_id)
+            .order_by('event_id')
+            .values_list('event_id', 'transaction_id')[:batch_size]
+        )
+        if not batch:
+            return applied
+        last_id = batch[-1][0]
+        with transaction.atomic():
+            applied += _replay_events({transaction_id for _, transaction_id in batch})
+
+
+def settle_pending(batch_size=SETTLEMENT_BATCH_SIZE):
+    """Send completed, unsettled payments to the gateway in batches."""
+    gateway = get_gateway()
+    settled = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Payment.objects.filter(
+                payment_status='completed', settled_at__isnull=True, payment_id__gt=last_id
+            )
+            .exclude(transaction_id=None)
+            .order_by('payment_id')
+            .values_list('payment_id', 'transaction_id')[:batch_size]
+        )
+        if not batch:
+            return settled
+        last_id = batch[-1][0]
+        accepted = gateway.settle([transaction_id for _, transaction_id in batch])
+        settled += Payment.objects.filter(transaction_id__in=accepted, settled_at__isnull=True).update(
+            settled_at=timezone.now()
+        )
@@ -0,0 +1,345 @@
+# profiling.py (محلل أداء بأخذ العينات لكل مسار في واجهة البرمجة)
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULTS = {
+    'ENABLED': False,
+    # 'auto': SIGPROF on the main thread, a sampler thread elsewhere; or 'signal' / 'thread'
+    'MODE': 'auto',
+    # Fraction of requests whose stacks are sampled
+    'SAMPLE_RATE': 0.01,
+    'INTERVAL_MS': 5,
+    # The sampler backs off so it never takes more than this share of the process
+    'MAX_OVERHEAD': 0.05,
+    'MAX_DEPTH': 64,
+    # The SIGPROF timer is switched off once no request was profiled for this long
+    'IDLE_SECONDS': 1,
+    # Distinct stacks kept per route; the rest are counted under one bucket
+    'MAX_STACKS_PER_ROUTE': 5000,
+    # How often a worker publishes its stacks to the shared cache
+    'FLUSH_SECONDS': 10,
+    'CACHE_TTL': 24 * 3600,
+}
+
+WORKERS_KEY = 'profiling:workers'
+RESET_KEY = 'profiling:reset'
+TRUNCATED = '[other stacks]'
+
+
+def config(name):
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def _label(code, module):
+    return f'{module}:{code.co_qualname}'
+
+
+class BaseSampler:
+    def __init__(self, interval, max_overhead, max_depth):
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.max_depth = max_depth
+        # Accounting for the overhead report
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self.profiled_seconds = 0.0
+
+    def _stack(self, frame, base):
+        labels = []
+        while frame is not None and frame is not base and len(labels) < self.max_depth:
+            labels.append(_label(frame.f_code, frame.f_globals.get('__name__', '?')))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def _next_interval(self, spent):
+        # Stretch the interval so sampling stays under max_overhead of the time profiled
+        return max(self.interval, spent / self.max_overhead - spent)
+
+
+class SignalSampler(BaseSampler):
+    """SIGPROF timer sampling the main thread, e.g. a gunicorn sync worker.
+
+    ITIMER_PROF counts process CPU time, so this shows where CPU goes
+    (serialization, JWT, ORM query building) and not time blocked on the
+    database. The handler runs between bytecodes, so it isn't biased towards
+    the points where the request releases the GIL.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.idle_seconds = config('IDLE_SECONDS')
+        self._base = None
+        self._stacks = None
+        self._period = None
+        self._stopped = time.monotonic()
+        signal.signal(signal.SIGPROF, self._handle)
+
+    def start(self, base_frame):
+        self._base = base_frame
+        self._stacks = Counter()
+        if self._period is None:
+            # Left running between profiled requests, since re-arming restarts
+            # the countdown. A random first tick lets requests shorter than
+            # the interval (most of them) get samples in proportion to their
+            # CPU time.
+            self._period = self.interval
+            signal.setitimer(signal.ITIMER_PROF, random.uniform(0, self._period) or self._period, self._period)
+        return self._stacks
+
+    def stop(self):
+        self._base = self._stacks = None
+        self._stopped = time.monotonic()
+
+    def disarm(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        self._period = None
+
+    def _handle(self, signum, frame):
+        started = time.perf_counter()
+        stacks = self._stacks
+        if stacks is None:
+            # Ticks only come while the worker burns CPU on unprofiled requests
+            if time.monotonic() - self._stopped > self.idle_seconds:
+                self.disarm()
+            return
+        stacks[self._stack(frame, self._base)] += 1
+        spent = time.perf_counter() - started
+        self.samples += 1
+        self.sampling_seconds += spent
+        period = self._next_interval(spent)
+        if period != self._period:
+            self._period = period
+            signal.setitimer(signal.ITIMER_PROF, period, period)
+
+
+class ThreadSampler(BaseSampler):
+    """One background thread sampling the stacks of the threads being profiled.
+
+    Used for requests served off the main thread (runserver, threaded
+    workers), where SIGPROF can't reach. Threads are read through
+    ``sys._current_frames()`` and sampled in wall time, but the sampler only
+    runs when it gets the GIL, so samples lean towards the points where the
+    request blocks (database calls).
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, base_frame):
+        stacks = Counter()
+        with self._lock:
+            self._targets[threading.get_ident()] = (base_frame, stacks)
+            if self._thread is None or not self._thread.is_alive():
+                # Started lazily so forked workers each get their own thread
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return stacks
+
+    def stop(self):
+        with self._lock:
+            self._targets.pop(threading.get_ident(), None)
+            if not self._targets:
+                self._wake.clear()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            started = time.perf_counter()
+            with self._lock:
+                targets = list(self._targets.items())
+            frames = sys._current_frames()
+            for ident, (base, stacks) in targets:
+                frame = frames.get(ident)
+                if frame is not None:
+                    stacks[self._stack(frame, base)] += 1
+            del frames
+            spent = time.perf_counter() - started
+            self.samples += len(targets)
+            self.sampling_seconds += spent
+            time.sleep(self._next_interval(spent))
+
+
+class Profile:
+    """Stacks aggregated per route for this process, published to the cache."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+        # Wall clock of the oldest data held, compared with resets from other workers
+        self.since = time.time_ns()
+
+    def add(self, route, stacks):
+        limit = config('MAX_STACKS_PER_ROUTE')
+        # The sampler may still be adding to a request it took before stop()
+        stacks = dict(stacks)
+        with self._lock:
+            total = self.routes.setdefault(route, Counter())
+            self.requests[route] += 1
+            for stack, count in stacks.items():
+                if stack in total or len(total) < limit:
+                    total[stack] += count
+                else:
+                    total[TRUNCATED] += count
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'routes': {route: dict(stacks) for route, stacks in self.routes.items()},
+                'requests': dict(self.requests),
+            }
+
+    def clear(self):
+        with self._lock:
+            self.routes.clear()
+            self.requests.clear()
+            self.since = time.time_ns()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed < config('FLUSH_SECONDS'):
+            return
+        self._flushed = time.monotonic()
+        flush()
+
+
+profile = Profile()
+samplers = {}
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """The signal sampler on the main thread when the platform has SIGPROF, else the thread sampler."""
+    mode = config('MODE')
+    use_signal = mode == 'signal' or (
+        mode == 'auto' and hasattr(signal, 'setitimer')
+        and threading.current_thread() is threading.main_thread()
+    )
+    kind = SignalSampler if use_signal else ThreadSampler
+    with _sampler_lock:
+        if kind not in samplers:
+            samplers[kind] = kind(config('INTERVAL_MS') / 1000, config('MAX_OVERHEAD'), config('MAX_DEPTH'))
+    return samplers[kind]
+
+
+def should_profile():
+    return config('ENABLED') and random.random() < config('SAMPLE_RATE')
+
+
+def route_name(request):
+    """``GET api/orders/<pk>/`` style key for the matched URL pattern."""
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match is not None else 'unresolved'
+    return f'{request.method} {route}'
+
+
+def worker_key(pid=None):
+    return f'profiling:worker:{pid or os.getpid()}'
+
+
+def overhead():
+    """This worker's sampler accounting: time spent sampling vs time profiled."""
+    return {
+        'samples': sum(s.samples for s in samplers.values()),
+        'sampling_seconds': sum(s.sampling_seconds for s in samplers.values()),
+        'profiled_seconds': sum(s.profiled_seconds for s in samplers.values()),
+    }
+
+
+def flush():
+    """Publish this worker's stacks to the cache for the staff endpoint."""
+    ttl = config('CACHE_TTL')
+    # Another worker may have reset the profile since our last flush
+    reset_at = cache.get(RESET_KEY)
+    if reset_at is not None and reset_at > profile.since:
+        profile.clear()
+    cache.set(worker_key(), dict(profile.snapshot(), overhead=overhead()), ttl)
+    workers = set(cache.get(WORKERS_KEY) or ())
+    if os.getpid() not in workers:
+        cache.set(WORKERS_KEY, sorted(workers | {os.getpid()}), ttl)
+
+
+def collect():
+    """Stacks and request counts per route, merged over every worker that flushed."""
+    flush()
+    routes, requests, costs = {}, Counter(), Counter()
+    for pid in cache.get(WORKERS_KEY) or ():
+        snapshot = cache.get(worker_key(pid))
+        if snapshot is None:
+            continue
+        for route, stacks in snapshot['routes'].items():
+            routes.setdefault(route, Counter()).update(stacks)
+        requests.update(snapshot['requests'])
+        costs.update(snapshot['overhead'])
+    return routes, requests, dict(costs)
+
+
+def reset():
+    """Drop the collected stacks; other workers drop theirs at their next flush."""
+    cache.set(RESET_KEY, time.time_ns(), config('CACHE_TTL'))
+    profile.clear()
+    for pid in cache.get(WORKERS_KEY) or ():
+        cache.delete(worker_key(pid))
+    cache.delete(WORKERS_KEY)
+
+
+def collapsed(stacks, prefix=None):
+    """Brendan Gregg's collapsed format, one ``frame;frame;frame count`` per line.
+
+    Feed it to flamegraph.pl or load it in speedscope. ``prefix`` (e.g. the
+    route) becomes the root frame.
+    """
+    lines = []
+    for stack, count in sorted(stacks.items()):
+        if prefix:
+            stack = f'{prefix};{stack}' if stack else prefix
+        lines.append(f'{stack} {count}')
+    return '\n'.join(lines) + ('\n' if lines else '')
+
+
+def flame_tree(stacks, name='all'):
+    """Nested ``{name, value, children}`` tree, the d3-flame-graph input format."""
+    root = {'name': name, 'value': 0, 'children': {}}
+    for stack, count in stacks.items():
+        root['value'] += count
+        node = root
+        for frame in stack.split(';') if stack else ():
+            node = node['children'].setdefault(frame, {'name': frame, 'value': 0, 'children': {}})
+            node['value'] += count
+
+    def listify(node):
+        node['children'] = [listify(child) for child in node['children'].values()]
+        return node
+    return listify(root)
+
+
+def summary(routes, requests, top=5):
+    """Per-route request and sample counts with the hottest leaf frames (self time)."""
+    report = []
+    for route, stacks in routes.items():
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        samples = sum(stacks.values())
+        report.append({
+            'route': route,
+            'requests': requests.get(route, 0),
+            'samples': samples,
+            'top_frames': [
+                {'frame': frame, 'share': round(count / samples, 3)} for frame, count in leaves.most_common(top)
+            ],
+        })
+    return sorted(report, key=lambda row: -row['samples'])
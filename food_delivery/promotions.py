@@ -0,0 +1,284 @@
+# promotions.py (محرك العروض والقسائم: قواعد مُجمّعة في فهرس داخل الذاكرة)
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Promotion, PromotionRedemption
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0')
+
+RULE_FIELDS = [
+    'promotion_id', 'kind', 'restaurant_id', 'menu_item_id', 'code', 'percent',
+    'buy_quantity', 'free_quantity', 'min_subtotal', 'starts_at', 'ends_at', 'max_uses',
+]
+
+
+class PromotionError(Exception):
+    pass
+
+
+class Exhausted(Exception):
+    def __init__(self, promotion_id):
+        super().__init__(promotion_id)
+        self.promotion_id = promotion_id
+
+
+class Rule:
+    """One compiled promotion: a flat row, no model instance per evaluation."""
+
+    __slots__ = RULE_FIELDS
+
+    def __init__(self, row):
+        for name in RULE_FIELDS:
+            setattr(self, name, row[name])
+
+    def usable(self, restaurant_id, subtotal, now):
+        return (
+            self.restaurant_id in (None, restaurant_id)
+            and subtotal >= self.min_subtotal
+            and self.starts_at <= now
+            and (self.ends_at is None or now < self.ends_at)
+        )
+
+
+class CompiledIndex:
+    """Active promotions grouped by what they apply to.
+
+    Evaluating an order looks up its restaurant and each of its items, so
+    the work grows with the order and not with the number of campaigns.
+    Coupons are kept apart: they only apply when their code is entered.
+    """
+
+    def __init__(self, rows):
+        # restaurant_id (None: every restaurant) -> rules, biggest percent first
+        self.percent = {}
+        # menu_id -> buy_x_get_y rules
+        self.items = {}
+        # restaurant_id (None: every restaurant) -> rules, lowest threshold first
+        self.delivery = {}
+        # upper-cased code -> rule
+        self.codes = {}
+        self.size = 0
+        for row in rows:
+            rule = Rule(row)
+            self.size += 1
+            if rule.code:
+                self.codes[rule.code.upper()] = rule
+            elif rule.kind == 'percent_off':
+                self.percent.setdefault(rule.restaurant_id, []).append(rule)
+            elif rule.kind == 'buy_x_get_y':
+                self.items.setdefault(rule.menu_item_id, []).append(rule)
+            elif rule.kind == 'free_delivery':
+                self.delivery.setdefault(rule.restaurant_id, []).append(rule)
+        for rules in self.percent.values():
+            rules.sort(key=lambda rule: -rule.percent)
+        for rules in self.delivery.values():
+            rules.sort(key=lambda rule: rule.min_subtotal)
+
+
+class Quote:
+    def __init__(self, subtotal, delivery_fee):
+        self.subtotal = subtotal
+        self.discount = ZERO
+        self.delivery_fee = delivery_fee
+        # (rule, amount) for every promotion used
+        self.applied = []
+
+    def add(self, rule, amount):
+        self.applied.append((rule, amount))
+
+
+def delivery_fee():
+    return Decimal(str(getattr(settings, 'DELIVERY_FEE', '0')))
+
+
+def active_rows(now=None):
+    """Promotions that can still apply: active, not ended and not used up."""
+    now = now or timezone.now()
+    return (
+        Promotion.objects.filter(is_active=True)
+        .filter(Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+        .filter(Q(max_uses__isnull=True) | Q(used_count__lt=F('max_uses')))
+        .values(*RULE_FIELDS)
+    )
+
+
+def compile_index():
+    return CompiledIndex(active_rows())
+
+
+def version():
+    """Row count and latest updated_at of Promotion, read from the database.
+
+    Any save in any process moves updated_at and a delete moves the count,
+    so workers see each other's changes without a shared cache.
+    """
+    row = Promotion.objects.aggregate(count=Count('pk'), latest=Max('updated_at'))
+    return row['count'], row['latest']
+
+
+_compiled = (None, None)
+
+
+def get_index():
+    """This process's compiled index, rebuilt when a promotion changed anywhere."""
+    global _compiled
+    current = version()
+    if _compiled[0] != current:
+        _compiled = (current, compile_index())
+    return _compiled[1]
+
+
+def touch(promotion_id):
+    # used_count moves through update(), which skips auto_now: bump updated_at
+    # by hand when a promotion drops out of or comes back into the index
+    Promotion.objects.filter(pk=promotion_id).update(updated_at=timezone.now())
+
+
+def _first(rules, restaurant_id, subtotal, now, exclude):
+    for rule in rules:
+        if rule.promotion_id not in exclude and rule.usable(restaurant_id, subtotal, now):
+            return rule
+    return None
+
+
+def evaluate(index, restaurant_id, lines, coupon=None, exclude=frozenset(), now=None):
+    """Price ``{menu_id: (quantity, unit_price)}`` for one restaurant.
+
+    Buy-X-get-Y is applied per item, then the best percent off on what is
+    left, then free delivery. An entered coupon replaces the automatic
+    promotion of its kind.
+    """
+    now = now or timezone.now()
+    subtotal = sum((price * quantity for quantity, price in lines.values()), ZERO)
+    quote = Quote(subtotal, delivery_fee())
+
+    def pick(rules, kind):
+        if coupon is not None and coupon.kind == kind:
+            return coupon if coupon.usable(restaurant_id, subtotal, now) else None
+        return _first(rules, restaurant_id, subtotal, now, exclude)
+
+    for menu_id, (quantity, price) in lines.items():
+        rules = list(index.items.get(menu_id, ()))
+        if coupon is not None and coupon.kind == 'buy_x_get_y' and coupon.menu_item_id == menu_id:
+            rules = [coupon]
+        best, amount = None, ZERO
+        for rule in rules:
+            if rule.promotion_id in exclude or not rule.usable(restaurant_id, subtotal, now):
+                continue
+            free = quantity // (rule.buy_quantity + rule.free_quantity) * rule.free_quantity
+            if price * free > amount:
+                best, amount = rule, price * free
+        if best is not None:
+            quote.add(best, amount)
+            quote.discount += amount
+
+    candidates = [
+        rule for rule in (
+            pick(index.percent.get(restaurant_id, ()), 'percent_off'),
+            pick(index.percent.get(None, ()), 'percent_off'),
+        ) if rule is not None
+    ]
+    if candidates:
+        rule = max(candidates, key=lambda rule: rule.percent)
+        amount = ((subtotal - quote.discount) * rule.percent / 100).quantize(CENT, ROUND_HALF_UP)
+        if amount > 0:
+            quote.add(rule, amount)
+            quote.discount += amount
+
+    if quote.delivery_fee > 0:
+        rule = pick(index.delivery.get(restaurant_id, ()), 'free_delivery') or pick(
+            index.delivery.get(None, ()), 'free_delivery'
+        )
+        if rule is not None:
+            quote.add(rule, quote.delivery_fee)
+            quote.delivery_fee = ZERO
+
+    quote.discount = min(quote.discount, subtotal)
+    return quote
+
+
+def _lines(items):
+    lines = {}
+    for item in items:
+        menu_id = item['menu_item'].pk
+        quantity, _ = lines.get(menu_id, (0, None))
+        lines[menu_id] = (quantity + item['quantity'], item['price'])
+    return lines
+
+
+def quote(restaurant_id, items, coupon='', exclude=frozenset()):
+    """Price an order's items (CreateOrderSerializer's validated ``items``) without claiming anything."""
+    index = get_index()
+    coupon_rule = None
+    if coupon:
+        coupon_rule = index.codes.get(coupon.strip().upper())
+        if coupon_rule is None or coupon_rule.promotion_id in exclude:
+            raise PromotionError('رمز القسيمة غير صالح أو منتهي الصلاحية')
+    result = evaluate(index, restaurant_id, _lines(items), coupon_rule, exclude)
+    if coupon_rule is not None and all(rule is not coupon_rule for rule, _ in result.applied):
+        raise PromotionError('لا تنطبق القسيمة على هذا الطلب')
+    return result
+
+
+def _claim(result):
+    # One conditional UPDATE per capped promotion, in id order like stock.reserve:
+    # concurrent checkouts can't push used_count past max_uses. Uncapped
+    # promotions aren't counted here so a site-wide campaign isn't a hot row.
+    capped = sorted(rule.promotion_id for rule, _ in result.applied if rule.max_uses is not None)
+    with transaction.atomic():
+        for promotion_id in capped:
+            claimed = Promotion.objects.filter(
+                pk=promotion_id, used_count__lt=F('max_uses')
+            ).update(used_count=F('used_count') + 1)
+            if not claimed:
+                # Rolls back this attempt's other claims
+                raise Exhausted(promotion_id)
+
+
+def apply(restaurant_id, items, coupon=''):
+    """Quote the order and claim its capped promotions; call inside the order's transaction.
+
+    An automatic promotion that ran out meanwhile is dropped and the order
+    re-priced without it. Raises PromotionError for a coupon that is
+    unknown, used up or doesn't apply.
+    """
+    exclude = set()
+    while True:
+        result = quote(restaurant_id, items, coupon, exclude)
+        try:
+            _claim(result)
+        except Exhausted as exc:
+            exclude.add(exc.promotion_id)
+            # Used up: recompile everywhere so other checkouts stop trying it
+            touch(exc.promotion_id)
+            continue
+        return result
+
+
+def record(order, result):
+    PromotionRedemption.objects.bulk_create([
+        PromotionRedemption(order=order, promotion_id=rule.promotion_id, amount=amount)
+        for rule, amount in result.applied
+    ])
+
+
+def release(order):
+    """Give back the capped uses of a canceled order's promotions; safe to call twice."""
+    freed = False
+    with transaction.atomic():
+        for pk, promotion_id in PromotionRedemption.objects.filter(order_id=order.pk).values_list('pk', 'promotion_id'):
+            # Deleting the row is the guard against releasing twice
+            deleted, _ = PromotionRedemption.objects.filter(pk=pk).delete()
+            if not deleted:
+                continue
+            capped = Promotion.objects.filter(pk=promotion_id, max_uses__isnull=False, used_count__gt=0)
+            if capped.filter(used_count__gte=F('max_uses')).exists():
+                # It was used up and out of the index: back in play
+                touch(promotion_id)
+            freed |= bool(capped.update(used_count=F('used_count') - 1))
+    return freed
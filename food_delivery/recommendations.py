@@ -0,0 +1,177 @@
+# recommendations.py (اقتراح "يُطلب عادةً مع" من سجل الطلبات)
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+
+from .analytics import _bump
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ItemPairCount, Menu, MenuRecommendation, Order, OrderItem, Restaurant,
+)
+
+TOP_K = 10
+# Pairs seen together in fewer orders than this are noise
+MIN_SUPPORT = 2
+
+
+def cooccurrence(order_ids, item_ids):
+    """Sparse item x item co-occurrence counts from (order, item) incidence pairs.
+
+    Equivalent to ``A.T @ A`` for the binary order x item matrix ``A``, done
+    with sorting instead of a sparse matrix library. Returns COO arrays
+    ``(rows, cols, counts)`` over the item ids, including the diagonal.
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    if not len(item_ids):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    # 1-D keys sort far faster than np.unique(axis=0) on row pairs
+    width = int(item_ids.max()) + 1
+    keys = np.unique(order_ids * width + item_ids)
+    orders, items = keys // width, keys % width
+    # Orders are sorted by np.unique: find each order's slice of items
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(orders)])
+    group = np.repeat(np.arange(len(starts)), sizes)
+
+    # Every item of an order against every item of the same order
+    per_item = sizes[group]
+    left = np.repeat(items, per_item)
+    offset = np.arange(len(left)) - np.repeat(np.cumsum(per_item) - per_item, per_item)
+    right = items[np.repeat(starts[group], per_item) + offset]
+
+    cells, counts = np.unique(left * width + right, return_counts=True)
+    return cells // width, cells % width, counts
+
+
+def top_neighbours(rows, cols, counts, k=TOP_K, min_support=MIN_SUPPORT):
+    """Top-k neighbours per item by cosine similarity of their order sets.
+
+    Takes COO co-occurrence arrays with the diagonal present and returns
+    ``{item_id: [(other_id, score), ...]}`` best first.
+    """
+    diagonal = rows == cols
+    frequency = dict(zip(rows[diagonal].tolist(), counts[diagonal].tolist()))
+    keep = ~diagonal & (counts >= min_support)
+    rows, cols, counts = rows[keep], cols[keep], counts[keep]
+    if not len(rows):
+        return {}
+    freq_rows = np.fromiter((frequency[r] for r in rows.tolist()), dtype=np.float64, count=len(rows))
+    freq_cols = np.fromiter((frequency[c] for c in cols.tolist()), dtype=np.float64, count=len(cols))
+    scores = counts / np.sqrt(freq_rows * freq_cols)
+
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+    top = rank < k
+
+    neighbours = defaultdict(list)
+    for row, col, score in zip(rows[top].tolist(), cols[top].tolist(), scores[top].tolist()):
+        neighbours[row].append((col, score))
+    return neighbours
+
+
+def _write(neighbours, item_ids):
+    """Replace the stored recommendations of ``item_ids``."""
+    MenuRecommendation.objects.filter(menu_item_id__in=item_ids).delete()
+    MenuRecommendation.objects.bulk_create([
+        MenuRecommendation(menu_item_id=item_id, rank=rank, recommended_id=other_id, score=score)
+        for item_id in item_ids
+        for rank, (other_id, score) in enumerate(neighbours.get(item_id, ()), start=1)
+    ], batch_size=1000)
+
+
+def rebuild(restaurant_id, k=TOP_K):
+    """Recount every delivered order of one restaurant and rewrite its top-k table.
+
+    Archived orders were counted before they left the hot tables, so they
+    are read back from the archive: wiping the counts must not forget them.
+    """
+    with transaction.atomic():
+        # Hot orders first: one being archived meanwhile is waited on, then
+        # found in the archive read below
+        order_ids = list(
+            Order.objects.select_for_update()
+            .filter(restaurant_id=restaurant_id, order_status='delivered')
+            .values_list('order_id', flat=True)
+        )
+        archived_ids = list(
+            ArchivedOrder.objects.filter(restaurant_id=restaurant_id, order_status='delivered')
+            .values_list('order_id', flat=True)
+        )
+        item_ids = list(Menu.objects.filter(restaurant_id=restaurant_id).values_list('menu_id', flat=True))
+        incidence = np.array(
+            list(OrderItem.objects.filter(order_id__in=order_ids).values_list('order_id', 'menu_item_id'))
+            # Archived rows have no foreign key: skip items deleted since
+            + list(
+                ArchivedOrderItem.objects.filter(order_id__in=archived_ids, menu_item_id__in=item_ids)
+                .values_list('order_id', 'menu_item_id')
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        rows, cols, counts = cooccurrence(incidence[:, 0], incidence[:, 1])
+
+        ItemPairCount.objects.filter(restaurant_id=restaurant_id).delete()
+        ItemPairCount.objects.bulk_create([
+            ItemPairCount(restaurant_id=restaurant_id, menu_item_id=r, other_item_id=c, order_count=n)
+            for r, c, n in zip(rows.tolist(), cols.tolist(), counts.tolist())
+        ], batch_size=1000)
+        Order.objects.filter(order_id__in=order_ids, pairs_recorded=False).update(pairs_recorded=True)
+
+        _write(top_neighbours(rows, cols, counts, k), item_ids)
+    return len(order_ids) + len(archived_ids)
+
+
+def rebuild_all(k=TOP_K):
+    # Every restaurant, not only those with hot orders: one whose orders
+    # are all archived still has counts to rebuild
+    restaurant_ids = Restaurant.objects.values_list('restaurant_id', flat=True)
+    return sum(rebuild(restaurant_id, k) for restaurant_id in restaurant_ids)
+
+
+def record_orders(order_ids, k=TOP_K):
+    """Fold newly delivered orders into the counts and rescore the items they touch.
+
+    Only the touched items' rows are recomputed. Their neighbours' rows are
+    not, even though the neighbour's score for them shifts slightly; the
+    periodic rebuild corrects that drift.
+    """
+    with transaction.atomic():
+        orders = dict(
+            Order.objects.select_for_update()
+            .filter(order_id__in=order_ids, order_status='delivered', pairs_recorded=False)
+            .values_list('order_id', 'restaurant_id')
+        )
+        if not orders:
+            return 0
+        incidence = np.array(
+            list(OrderItem.objects.filter(order_id__in=orders).values_list('order_id', 'menu_item_id')),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        # A menu item belongs to one restaurant, so any of its orders names it
+        restaurant_of = {item: orders[order] for order, item in incidence.tolist()}
+        rows, cols, counts = cooccurrence(incidence[:, 0], incidence[:, 1])
+        for a, b, n in zip(rows.tolist(), cols.tolist(), counts.tolist()):
+            _bump(
+                ItemPairCount,
+                {'restaurant_id': restaurant_of[a], 'menu_item_id': a, 'other_item_id': b},
+                {'order_count': n},
+            )
+        Order.objects.filter(order_id__in=orders).update(pairs_recorded=True)
+
+        touched = sorted(restaurant_of)
+        cells = list(
+            ItemPairCount.objects.filter(menu_item_id__in=touched)
+            .values_list('menu_item_id', 'other_item_id', 'order_count')
+        )
+        # Neighbours' own order counts, for the cosine denominator
+        others = {other for _, other, _ in cells} - set(touched)
+        cells += ItemPairCount.objects.filter(
+            menu_item_id__in=others, other_item_id=F('menu_item_id')
+        ).values_list('menu_item_id', 'other_item_id', 'order_count')
+        cells = np.array(cells, dtype=np.int64).reshape(-1, 3)
+        _write(top_neighbours(cells[:, 0], cells[:, 1], cells[:, 2], k), touched)
+    return len(orders)
@@ -3,6 +3,10 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from .models import *
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from . import promotions, stock
+from .sparse import SparseFieldsMixin
 
 # User Serializer
 class UserSerializer(serializers.ModelSerializer):
@@ -35,18 +39,85 @@ class LoginSerializer(serializers.Serializer):
         raise serializers.ValidationError("بيانات الدخول غير صحيحة")
 
 # Restaurant Serializer
-class RestaurantSerializer(serializers.ModelSerializer):
+class RestaurantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Restaurant
         fields = '__all__'
+        # Polygons are large and only needed when editing the zone
+        extra_kwargs = {'delivery_zone': {'write_only': True}}
+    
+    def validate_delivery_zone(self, value):
+        if value is None:
+            return value
+        from .zones import MAX_VERTICES
+        if not isinstance(value, list) or not 3 <= len(value) <= MAX_VERTICES:
+            raise serializers.ValidationError(f'يجب أن تحتوي المنطقة على 3 إلى {MAX_VERTICES} نقطة')
+        for point in value:
+            if (
+                not isinstance(point, list) or len(point) != 2
+                or not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in point)
+                or not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180)
+            ):
+                raise serializers.ValidationError('كل نقطة يجب أن تكون [خط العرض، خط الطول]')
+        return value
 
 # Menu Serializer
-class MenuSerializer(serializers.ModelSerializer):
+class MenuSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     restaurant_name = serializers.ReadOnlyField(source='restaurant.name')
+    expandable_fields = {'restaurant': RestaurantSerializer}
     
     class Meta:
         model = Menu
         fields = '__all__'
+        # Reservations change it without a CatalogChange, so cached catalog
+        # bodies would show a stale count; only availability_status is public
+        extra_kwargs = {'stock': {'write_only': True}}
+
+# Bulk Menu Serializers (restaurant management)
+MAX_BULK_ITEMS = 1000
+
+class BulkMenuListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # التحقق من كل المطاعم باستعلام واحد
+        restaurant_ids = {item['restaurant_id'] for item in attrs}
+        found = set(Restaurant.objects.filter(restaurant_id__in=restaurant_ids).values_list('restaurant_id', flat=True))
+        missing = restaurant_ids - found
+        if missing:
+            raise serializers.ValidationError({'restaurant': f"مطاعم غير موجودة: {sorted(missing)}"})
+        return attrs
+    
+    def create(self, validated_data):
+        return Menu.objects.bulk_create([Menu(**item) for item in validated_data], batch_size=500)
+
+class BulkMenuCreateSerializer(serializers.ModelSerializer):
+    restaurant = serializers.IntegerField(source='restaurant_id')
+    
+    class Meta:
+        model = Menu
+        fields = ['menu_id', 'restaurant', 'item_name', 'description', 'price', 'image_url', 'availability_status']
+        read_only_fields = ['menu_id']
+        list_serializer_class = BulkMenuListSerializer
+
+class BulkMenuUpdateSerializer(serializers.Serializer):
+    menu_id = serializers.IntegerField()
+    item_name = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(allow_blank=True, required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    image_url = serializers.URLField(max_length=500, allow_blank=True, required=False)
+    availability_status = serializers.ChoiceField(choices=Menu.AVAILABILITY_STATUS, required=False)
+
+class BulkMenuIdsSerializer(serializers.Serializer):
+    menu_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=MAX_BULK_ITEMS)
+
+class BulkAvailabilitySerializer(serializers.Serializer):
+    menu_ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=MAX_BULK_ITEMS)
+    restaurant = serializers.IntegerField(required=False)
+    availability_status = serializers.ChoiceField(choices=Menu.AVAILABILITY_STATUS)
+    
+    def validate(self, data):
+        if not data.get('menu_ids') and not data.get('restaurant'):
+            raise serializers.ValidationError("يجب تحديد menu_ids أو restaurant")
+        return data
 
 # OrderItem Serializer (Nested)
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -58,62 +129,230 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['order_item_id', 'menu_item', 'item_name', 'item_price', 'quantity', 'price']
 
 # Order Serializer
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_email = serializers.ReadOnlyField(source='user.email')
     restaurant_name = serializers.ReadOnlyField(source='restaurant.name')
     items = OrderItemSerializer(many=True, read_only=True)
+    expandable_fields = {'restaurant': RestaurantSerializer}
+    ignored_fields = ['archived']
     
     class Meta:
         model = Order
         fields = [
             'order_id', 'user', 'user_email', 'restaurant', 'restaurant_name',
-            'order_status', 'total_amount', 'created_at', 'items'
+            'order_status', 'total_amount', 'discount_amount', 'delivery_fee', 'created_at', 'items'
         ]
         read_only_fields = ['order_id','user', 'created_at']
 
+# Archived Order Serializers (same shape as OrderSerializer)
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+    menu_item = serializers.ReadOnlyField(source='menu_item_id')
+    item_name = serializers.ReadOnlyField()
+    item_price = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['order_item_id', 'menu_item', 'item_name', 'item_price', 'quantity', 'price']
+
+class ArchivedOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.ReadOnlyField(source='user_id')
+    user_email = serializers.ReadOnlyField()
+    restaurant = serializers.ReadOnlyField(source='restaurant_id')
+    restaurant_name = serializers.ReadOnlyField()
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    archived = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ArchivedOrder
+        fields = [
+            'order_id', 'user', 'user_email', 'restaurant', 'restaurant_name',
+            'order_status', 'total_amount', 'discount_amount', 'delivery_fee',
+            'created_at', 'items', 'archived'
+        ]
+    
+    def get_archived(self, obj):
+        return True
+
 # Create Order Serializer
 class CreateOrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
+    # Optional coupon code, see promotions.py
+    coupon = serializers.CharField(write_only=True, required=False, allow_blank=True, max_length=40)
     
     class Meta:
         model = Order
-        fields = ['restaurant', 'total_amount', 'items']
+        fields = ['restaurant', 'total_amount', 'items', 'coupon']
+        # Computed from the menu prices, whatever the client sends
+        read_only_fields = ['total_amount']
+    
+    def price_items(self, restaurant_id, items_data):
+        """Check each line against the menu and return the subtotal computed here."""
+        menus = {
+            menu_id: (menu_restaurant, price) for menu_id, menu_restaurant, price in Menu.objects.filter(
+                pk__in={item['menu_item'].pk for item in items_data}
+            ).values_list('menu_id', 'restaurant_id', 'price')
+        }
+        subtotal = 0
+        for item in items_data:
+            menu_id = item['menu_item'].pk
+            menu_restaurant, price = menus.get(menu_id, (None, None))
+            if menu_restaurant != restaurant_id:
+                raise serializers.ValidationError({'items': f'العنصر رقم {menu_id} لا يتبع هذا المطعم'})
+            if item['price'] != price:
+                raise serializers.ValidationError({'items': f'تغير سعر العنصر رقم {menu_id}، يرجى تحديث الطلب'})
+            subtotal += price * item['quantity']
+        return subtotal
     
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+        coupon = validated_data.pop('coupon', '')
+        # The cart checkout passes restaurant_id rather than an instance
+        restaurant = validated_data.get('restaurant')
+        restaurant_id = restaurant.pk if restaurant is not None else validated_data['restaurant_id']
+        with transaction.atomic():
+            if self.context.get('prices_checked'):
+                # The cart already re-checked its snapshots against the catalog version
+                subtotal = sum(item['price'] * item['quantity'] for item in items_data)
+            else:
+                subtotal = self.price_items(restaurant_id, items_data)
+            try:
+                stock.reserve(items_data)
+            except stock.OutOfStock as exc:
+                raise serializers.ValidationError(
+                    {'items': f'الكمية المتوفرة غير كافية للعنصر رقم {exc.menu_id}'}
+                )
+            try:
+                quote = promotions.apply(restaurant_id, items_data, coupon)
+            except promotions.PromotionError as exc:
+                raise serializers.ValidationError({'coupon': str(exc)})
+            # The fee is never discounted away
+            validated_data['total_amount'] = max(subtotal - quote.discount, 0) + quote.delivery_fee
+            order = Order.objects.create(
+                stock_status='reserved',
+                discount_amount=quote.discount,
+                delivery_fee=quote.delivery_fee,
+                **validated_data
+            )
+            
+            for item_data in items_data:
+                OrderItem.objects.create(order=order, **item_data)
+            promotions.record(order, quote)
         
         return order
 
 # Payment Serializer
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
 
 # Driver Serializer
-class DriverSerializer(serializers.ModelSerializer):
+class DriverSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Driver
         fields = '__all__'
+        read_only_fields = ['user']
 
 # Delivery Serializer
-class DeliverySerializer(serializers.ModelSerializer):
+class DeliverySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     driver_name = serializers.ReadOnlyField(source='driver.name')
     order_id = serializers.ReadOnlyField(source='order.order_id')
+    expandable_fields = {'driver': DriverSerializer}
     
     class Meta:
         model = Delivery
         fields = '__all__'
+        read_only_fields = ['assigned_at']
+        extra_kwargs = {'estimated_time': {'required': False}}
+    
+    def create(self, validated_data):
+        # الوقت المقدر يُحسب من إحصائيات التوصيلات السابقة إذا لم يُرسل
+        validated_data['assigned_at'] = timezone.now()
+        if not validated_data.get('estimated_time'):
+            # eta pulls in numpy; import on first use to keep worker boot fast
+            from .eta import predict_estimated_times
+            driver = validated_data.get('driver')
+            validated_data['estimated_time'] = predict_estimated_times(
+                [validated_data['order'].restaurant_id],
+                [driver.vehicle_type if driver else ''],
+                started_at=validated_data['assigned_at'],
+            )[0]
+        return super().create(validated_data)
+
+# Driver Sync Serializers (batched updates from the driver app)
+MAX_SYNC_ITEMS = 200
+
+class DriverStatusUpdateSerializer(serializers.Serializer):
+    delivery_id = serializers.IntegerField()
+    delivery_status = serializers.ChoiceField(choices=Delivery.DELIVERY_STATUS)
+    recorded_at = serializers.DateTimeField(required=False)
+
+class DriverLocationSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    recorded_at = serializers.DateTimeField(required=False)
+
+class DriverSyncSerializer(serializers.Serializer):
+    updates = DriverStatusUpdateSerializer(many=True, required=False, max_length=MAX_SYNC_ITEMS)
+    locations = DriverLocationSerializer(many=True, required=False, max_length=MAX_SYNC_ITEMS)
 
 # Review Serializer
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.ReadOnlyField(source='user.name')
     restaurant_name = serializers.ReadOnlyField(source='restaurant.name')
+    expandable_fields = {'restaurant': RestaurantSerializer}
     
     class Meta:
         model = Review
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        read_only_fields = ['user', 'helpful_count', 'score']
+    
+    def validate(self, data):
+        request = self.context.get('request')
+        if self.instance is None and data.get('order') is None:
+            # NULL orders are only for reviews whose order was archived
+            raise serializers.ValidationError({'order': 'يجب تحديد الطلب الذي تقيّمه'})
+        if self.instance is not None and 'order' in data and data['order'] != self.instance.order:
+            raise serializers.ValidationError({'order': 'لا يمكن تغيير الطلب بعد التقييم'})
+        order = data.get('order', self.instance.order if self.instance else None)
+        restaurant = data.get('restaurant', self.instance.restaurant if self.instance else None)
+        if order is None or request is None:
+            return data
+        if order.user_id != request.user.pk:
+            raise serializers.ValidationError({'order': 'لا يمكنك تقييم طلب لا يخصك'})
+        if order.restaurant_id != restaurant.pk:
+            raise serializers.ValidationError({'restaurant': 'الطلب لا يخص هذا المطعم'})
+        duplicates = Review.objects.filter(user=request.user, order=order)
+        if self.instance:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError({'order': 'لقد قمت بتقييم هذا الطلب مسبقاً'})
+        return data
+
+# Restaurant Review Feed Serializer (public, no user ids)
+class RestaurantReviewSerializer(serializers.ModelSerializer):
+    user_name = serializers.ReadOnlyField(source='user.name')
+    
+    class Meta:
+        model = Review
+        fields = ['review_id', 'user_name', 'rating', 'comment', 'helpful_count', 'created_at']
+
+# Menu Recommendation Serializer ("frequently ordered together")
+class MenuRecommendationSerializer(serializers.ModelSerializer):
+    menu_id = serializers.ReadOnlyField(source='recommended_id')
+    item_name = serializers.ReadOnlyField(source='recommended.item_name')
+    price = serializers.ReadOnlyField(source='recommended.price')
+    image_url = serializers.ReadOnlyField(source='recommended.image_url')
+    
+    class Meta:
+        model = MenuRecommendation
+        fields = ['menu_id', 'item_name', 'price', 'image_url', 'score']
+
+# Cart Serializers (server-side cart, see cart.py)
+class CartItemSerializer(serializers.Serializer):
+    menu_item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=99, default=1)
+
+class CartQuantitySerializer(serializers.Serializer):
+    # 0 removes the line
+    quantity = serializers.IntegerField(min_value=0, max_value=99)
\ No newline at end of file
@@ -0,0 +1,46 @@
+# signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Restaurant, Menu, Order
+from .sync import record_change
+from . import zones
+from .tasks import enqueue_on_commit
+
+
+# Catalog change log (delta sync)
+@receiver(post_save, sender=Restaurant)
+def log_restaurant_save(sender, instance, created, **kwargs):
+    record_change('restaurant', instance.pk, 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Restaurant)
+def log_restaurant_delete(sender, instance, **kwargs):
+    record_change('restaurant', instance.pk, 'deleted')
+
+
+@receiver(post_save, sender=Menu)
+def log_menu_save(sender, instance, created, **kwargs):
+    record_change('menu', instance.pk, 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Menu)
+def log_menu_delete(sender, instance, **kwargs):
+    record_change('menu', instance.pk, 'deleted')
+
+
+# Sales rollups: a delivered order is folded in by a background task
+@receiver(post_save, sender=Order)
+def queue_order_sales(sender, instance, **kwargs):
+    if instance.order_status == 'delivered' and not instance.sales_recorded:
+        enqueue_on_commit('record_order_sales', order_id=instance.order_id)
+
+
+# Delivery zone grid index
+@receiver(post_save, sender=Restaurant)
+def index_delivery_zone(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'delivery_zone' not in update_fields:
+        return
+    if created and not instance.delivery_zone:
+        return
+    zones.index_restaurants([instance])
@@ -0,0 +1,126 @@
+# sparse.py (اختيار الحقول ?fields= وتضمين العلاقات ?expand=)
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def requested(request, param):
+    """``?fields=a,b`` -> ``{'a', 'b'}``; empty set when absent."""
+    value = request.query_params.get(param, '') if request is not None else ''
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Trim a serializer to ``?fields=`` and embed ``?expand=`` relations.
+
+    Only applies to GET requests on serializers built with the request in
+    their context (i.e. by the view), never to nested or write serializers.
+    ``expandable_fields`` maps a relation to the serializer that replaces
+    its primary key when expanded. Unknown ``?fields=`` names are a 400.
+    """
+
+    expandable_fields = {}
+    # Accepted in ?fields= without being rendered: for serializers answering
+    # one query string together (hot and archived orders in the history)
+    ignored_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        for name in requested(request, 'expand') & self.expandable_fields.keys():
+            self.fields[name] = self.expandable_fields[name](read_only=True)
+        fields = requested(request, 'fields')
+        if fields:
+            readable = {name for name, field in self.fields.items() if not field.write_only}
+            unknown = fields - readable - set(self.ignored_fields)
+            if unknown:
+                # A typo would otherwise silently return less than asked for
+                raise serializers.ValidationError({'error': 'حقول غير معروفة في fields', 'fields': sorted(unknown)})
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class QueryPlan:
+    """Columns, joins and prefetches needed to render a serializer."""
+
+    def __init__(self):
+        # None means some field needs the full row, so nothing is deferred
+        self.only = set()
+        self.select_related = set()
+        self.prefetch_related = []
+
+    def restrict(self, *names):
+        if self.only is not None:
+            self.only.update(names)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only is not None:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+
+def query_plan(serializer):
+    model = serializer.Meta.model
+    plan = QueryPlan()
+    for field in serializer.fields.values():
+        source = field.source
+        if source == '*':
+            plan.only = None
+            continue
+        parts = source.split('.')
+        try:
+            model_field = model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            # A property or method on the model: it may read any column
+            plan.only = None
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            # Reverse relation rendered in full, e.g. an order's items
+            child = query_plan(field.child)
+            child.restrict(model_field.field.name)
+            queryset = child.apply(field.child.Meta.model.objects.all())
+            plan.prefetch_related.append(Prefetch(source, queryset=queryset))
+        elif isinstance(field, serializers.BaseSerializer):
+            # Expanded forward relation: join it and load only what it renders
+            child = query_plan(field)
+            plan.select_related.add(source)
+            plan.select_related.update(f'{source}__{name}' for name in child.select_related)
+            plan.restrict(source)
+            if child.only is None:
+                plan.only = None
+            else:
+                plan.restrict(*(f'{source}__{name}' for name in child.only))
+            plan.prefetch_related.extend(
+                Prefetch(f'{source}__{p.prefetch_through}', queryset=p.queryset) for p in child.prefetch_related
+            )
+        elif not model_field.concrete:
+            plan.prefetch_related.append(Prefetch(source))
+        elif len(parts) == 1:
+            plan.restrict(source)
+        elif len(parts) == 2 and model_field.is_relation and parts[1] == model_field.related_model._meta.pk.name:
+            # order.order_id is just the foreign key column
+            plan.restrict(parts[0])
+        elif len(parts) == 2 and model_field.is_relation:
+            plan.select_related.add(parts[0])
+            plan.restrict(parts[0], '__'.join(parts))
+        else:
+            plan.only = None
+    return plan
+
+
+class SparseFieldsViewMixin:
+    """Shape list/retrieve querysets after the trimmed serializer."""
+
+    # filter_queryset rather than get_queryset, which viewsets override freely
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method == 'GET' and getattr(self, 'action', None) in ('list', 'retrieve'):
+            queryset = query_plan(self.get_serializer()).apply(queryset)
+        return queryset
@@ -0,0 +1,91 @@
+# startup.py (قياس زمن إقلاع العامل واستيراد الوحدات)
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+# Run in a fresh interpreter: boots the WSGI app the way gunicorn does, then
+# serves one request, once in-process (no preload) and once in a forked
+# child (what a --preload worker pays).
+COLD_START_SCRIPT = '''
+import io, json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', %(settings)r)
+from food_delivery_project.wsgi import application
+booted = time.perf_counter()
+
+def call(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    }
+    status = []
+    b''.join(application(environ, lambda s, h, e=None: status.append(s)))
+    return status[0]
+
+from django.db import connections
+connections.close_all()
+read_end, write_end = os.pipe()
+forked = time.perf_counter()
+if os.fork() == 0:
+    call(%(path)r)
+    os.write(write_end, str(time.perf_counter() - forked).encode())
+    os._exit(0)
+os.wait()
+forked_first = float(os.read(read_end, 64))
+before = time.perf_counter()
+status = call(%(path)r)
+first = time.perf_counter() - before
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'first_request_ms': first * 1000,
+    'forked_first_request_ms': forked_first * 1000,
+    'status': status,
+}))
+'''
+
+IMPORT_SCRIPT = '''
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', %(settings)r)
+from food_delivery_project.wsgi import application
+'''
+
+
+def _run(script, *flags):
+    """Run ``script`` in a new interpreter from the project root."""
+    code = script % {'settings': os.environ.get('DJANGO_SETTINGS_MODULE', 'food_delivery_project.settings')}
+    return subprocess.run(
+        [sys.executable, *flags, '-c', code],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+
+
+def import_times():
+    """Per-module ``(name, self_us, cumulative_us, depth)`` for a cold WSGI boot."""
+    result = _run(IMPORT_SCRIPT, '-X', 'importtime')
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def by_package(modules):
+    """Sum of self time per top-level package, largest first."""
+    totals = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def cold_start(path):
+    """Boot and first-request timings (ms) measured in a fresh interpreter."""
+    script = COLD_START_SCRIPT.replace('%(path)r', repr(path))
+    return json.loads(_run(script).stdout.strip().splitlines()[-1])
@@ -0,0 +1,86 @@
+# stock.py (حجز كميات عناصر القائمة للطلبات)
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .models import Menu, Order, OrderItem
+from .sync import record_changes
+
+
+class OutOfStock(Exception):
+    def __init__(self, menu_id):
+        super().__init__(menu_id)
+        self.menu_id = menu_id
+
+
+def _quantities(items):
+    quantities = Counter()
+    for item in items:
+        quantities[item['menu_item'].pk] += item['quantity']
+    return quantities
+
+
+def reserve(items):
+    """Take stock for a new order's items; call inside the order's transaction.
+
+    Each item is one conditional UPDATE (``stock >= n``), so concurrent
+    orders never read-modify-write the counter and can't oversell it. Items
+    without a tracked stock always succeed. The item flips to out_of_stock
+    in the same UPDATE when it reaches zero. Raises OutOfStock, leaving the
+    rollback to the caller's transaction.
+    """
+    quantities = _quantities(items)
+    for menu_id, quantity in sorted(quantities.items()):
+        updated = Menu.objects.filter(
+            Q(stock__isnull=True) | Q(stock__gte=quantity), pk=menu_id
+        ).update(
+            stock=F('stock') - quantity,
+            # SET expressions see the row before the update
+            availability_status=Case(
+                When(stock=quantity, availability_status='available', then=Value('out_of_stock')),
+                default=F('availability_status'),
+            ),
+        )
+        if not updated:
+            raise OutOfStock(menu_id)
+
+    sold_out = list(
+        Menu.objects.filter(pk__in=quantities, stock=0).values_list('menu_id', flat=True)
+    )
+    if sold_out:
+        # .update() skips the post_save signal that feeds the delta sync
+        record_changes('menu', sold_out, 'updated')
+
+
+def release(order):
+    """Return a canceled order's reservation; does nothing if already released or committed."""
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, stock_status='reserved').update(stock_status='released'):
+            return False
+        quantities = Counter()
+        for menu_id, quantity in OrderItem.objects.filter(order_id=order.pk).values_list('menu_item_id', 'quantity'):
+            quantities[menu_id] += quantity
+        # Only items this release brings back from zero; one taken off the
+        # menu by hand while it still had stock stays out
+        restocked = list(
+            Menu.objects.filter(pk__in=quantities, stock=0, availability_status='out_of_stock')
+            .values_list('menu_id', flat=True)
+        )
+        for menu_id, quantity in sorted(quantities.items()):
+            Menu.objects.filter(pk=menu_id, stock__isnull=False).update(
+                stock=F('stock') + quantity,
+                availability_status=Case(
+                    When(stock=0, availability_status='out_of_stock', then=Value('available')),
+                    default=F('availability_status'),
+                ),
+            )
+        if restocked:
+            record_changes('menu', restocked, 'updated')
+    order.stock_status = 'released'
+    return True
+
+
+def commit(order_ids):
+    """Make the reservations of delivered orders final so they can't be released."""
+    return Order.objects.filter(order_id__in=order_ids, stock_status='reserved').update(stock_status='committed')
@@ -0,0 +1,121 @@
+# sync.py (مزامنة الكتالوج التفاضلية لتطبيق Flutter)
+import base64
+import binascii
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import CatalogChange, Restaurant, Menu
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+# Longer than any catalog write transaction, see collect_changes
+GAP_GRACE = timedelta(seconds=60)
+
+ENTITY_MODELS = {
+    'restaurant': Restaurant,
+    'menu': Menu,
+}
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+# The token is opaque to clients; only the server knows it wraps a log sequence
+def encode_token(seq):
+    return base64.urlsafe_b64encode(f"v1:{seq}".encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    if not token:
+        return 0
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        version, seq = base64.urlsafe_b64decode(padded.encode()).decode().split(':', 1)
+        if version != 'v1':
+            raise InvalidSyncToken(token)
+        seq = int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidSyncToken(token)
+    if seq < 0:
+        raise InvalidSyncToken(token)
+    return seq
+
+
+# While a batch is open, signal handlers append here instead of inserting per row
+_pending = ContextVar('catalog_changes_pending', default=None)
+
+
+@contextmanager
+def batch_changes():
+    """Collect change-log rows written inside the block and insert them in one go."""
+    if _pending.get() is not None:
+        yield
+        return
+    token = _pending.set([])
+    try:
+        yield
+        pending = _pending.get()
+    finally:
+        _pending.reset(token)
+    CatalogChange.objects.bulk_create(pending, batch_size=1000)
+
+
+def record_change(entity, object_id, action):
+    change = CatalogChange(entity=entity, object_id=object_id, action=action)
+    pending = _pending.get()
+    if pending is not None:
+        pending.append(change)
+    else:
+        change.save()
+
+
+def record_changes(entity, object_ids, action):
+    # Used by set-based writes (queryset.update / bulk_create) that skip signals
+    with batch_changes():
+        for pk in object_ids:
+            record_change(entity, pk, action)
+
+
+def collect_changes(since_seq, limit):
+    """Read one page of the change log and collapse it to the latest action per object.
+
+    Returns ``(changes, last_seq, has_more)`` where ``changes`` maps
+    ``entity -> {object_id: action}``.
+
+    seq is handed out at INSERT but rows become visible at COMMIT, so on
+    PostgreSQL a later seq can be read while an earlier one is still
+    uncommitted. The page therefore stops before a gap in seq younger
+    than GAP_GRACE: the missing row may still arrive, and moving the cursor
+    past it would skip it for good. Older gaps are rolled-back inserts.
+    SQLite serializes writers, so its log has no such gaps.
+    """
+    rows = list(
+        CatalogChange.objects.filter(seq__gt=since_seq)
+        .order_by('seq')
+        .values_list('seq', 'entity', 'object_id', 'action', 'changed_at')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    recent = timezone.now() - GAP_GRACE
+    previous_seq = since_seq
+    for index, row in enumerate(rows):
+        if row[0] != previous_seq + 1 and row[4] > recent:
+            rows, has_more = rows[:index], False
+            break
+        previous_seq = row[0]
+
+    changes = {entity: {} for entity in ENTITY_MODELS}
+    for seq, entity, object_id, action, _ in rows:
+        previous = changes[entity].get(object_id)
+        # created + updated in the same page is still "created" for the client
+        if previous == 'created' and action == 'updated':
+            continue
+        changes[entity][object_id] = action
+
+    last_seq = rows[-1][0] if rows else since_seq
+    return changes, last_seq, has_more
@@ -0,0 +1,217 @@
+# tasks.py (طابور مهام خلفية مخزن في قاعدة البيانات)
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# A running task whose worker has not finished within this window is retried
+LOCK_TIMEOUT = timedelta(minutes=10)
+RETRY_BASE_SECONDS = 5
+
+_registry = {}
+# Task name -> handler called with the payload once the task has failed for good
+_give_up = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(func):
+    """Register ``func`` as a background task under its function name."""
+    _registry[func.__name__] = func
+    return func
+
+
+def on_give_up(name):
+    """Register the handler run when task ``name`` has used up its attempts."""
+    def register(func):
+        _give_up[name] = func
+        return func
+    return register
+
+
+def enqueue(name, delay=None, max_attempts=5, **payload):
+    if name not in _registry:
+        raise UnknownTask(name)
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+
+
+def enqueue_on_commit(name, **payload):
+    """Queue the task once the surrounding transaction commits (immediately in autocommit)."""
+    if name not in _registry:
+        raise UnknownTask(name)
+    transaction.on_commit(lambda: enqueue(name, **payload))
+
+
+def _claim_skip_locked(batch_size, now):
+    with transaction.atomic():
+        ids = list(
+            Task.objects.filter(status='queued', run_after__lte=now)
+            .order_by('run_after')
+            .select_for_update(skip_locked=True)
+            .values_list('task_id', flat=True)[:batch_size]
+        )
+        Task.objects.filter(task_id__in=ids).update(status='running', locked_at=now)
+    return ids
+
+
+def _claim_optimistic(batch_size, now):
+    # SQLite has no row locks: claim each row with a conditional UPDATE and
+    # keep only the ones this worker actually flipped.
+    candidates = (
+        Task.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after')
+        .values_list('task_id', flat=True)[:batch_size]
+    )
+    return [
+        task_id for task_id in list(candidates)
+        if Task.objects.filter(task_id=task_id, status='queued').update(status='running', locked_at=now)
+    ]
+
+
+def claim(batch_size=10):
+    """Mark up to ``batch_size`` due tasks as running and return them."""
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        ids = _claim_skip_locked(batch_size, now)
+    else:
+        ids = _claim_optimistic(batch_size, now)
+    return list(Task.objects.filter(task_id__in=ids).order_by('run_after'))
+
+
+def _call_give_up(task_obj):
+    handler = _give_up.get(task_obj.name)
+    if handler is None:
+        return
+    try:
+        handler(**task_obj.payload)
+    except Exception:
+        logger.exception('Give-up handler of task %s failed', task_obj.task_id)
+
+
+def requeue_stale():
+    """Put tasks back in the queue whose worker died while running them.
+
+    The crash counts as an attempt, so a task that keeps killing its worker
+    fails for good after max_attempts instead of being requeued forever.
+    Returns the number of tasks requeued.
+    """
+    stale = Task.objects.filter(status='running', locked_at__lt=timezone.now() - LOCK_TIMEOUT)
+    error = f'Worker did not finish within {LOCK_TIMEOUT}'
+    for task_obj in stale.filter(attempts__gte=F('max_attempts') - 1):
+        # Conditional on the lock seen here, so two runners don't both give up
+        if Task.objects.filter(task_id=task_obj.task_id, status='running', locked_at=task_obj.locked_at).update(
+            status='failed', attempts=F('attempts') + 1, locked_at=None, last_error=error
+        ):
+            logger.error('Task %s failed permanently: %s', task_obj.task_id, task_obj.name)
+            _call_give_up(task_obj)
+    return stale.filter(attempts__lt=F('max_attempts') - 1).update(
+        status='queued', attempts=F('attempts') + 1, locked_at=None, last_error=error
+    )
+
+
+def run(task_obj):
+    func = _registry.get(task_obj.name)
+    task_obj.attempts += 1
+    try:
+        if func is None:
+            raise UnknownTask(task_obj.name)
+        # A handler that raises leaves none of its writes behind, and the
+        # 'done' status commits with them
+        with transaction.atomic():
+            func(**task_obj.payload)
+            task_obj.status = 'done'
+            task_obj.locked_at = None
+            task_obj.save(update_fields=['status', 'attempts', 'locked_at'])
+    except Exception:
+        task_obj.last_error = traceback.format_exc()
+        if task_obj.attempts >= task_obj.max_attempts:
+            task_obj.status = 'failed'
+            logger.error('Task %s failed permanently: %s', task_obj.task_id, task_obj.name)
+        else:
+            task_obj.status = 'queued'
+            task_obj.run_after = timezone.now() + timedelta(
+                seconds=RETRY_BASE_SECONDS * 2 ** (task_obj.attempts - 1)
+            )
+        task_obj.locked_at = None
+        task_obj.save(update_fields=['status', 'attempts', 'run_after', 'locked_at', 'last_error'])
+        if task_obj.status == 'failed':
+            _call_give_up(task_obj)
+        return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Tasks
+# ---------------------------------------------------------------------------
+
+@task
+def notify_order_created(order_id):
+    # مكان إشعار المطعم بالطلب الجديد
+    logger.info('Order #%s created', order_id)
+
+
+@task
+def send_payment_receipt(payment_id):
+    # مكان إرسال إيصال الدفع للعميل
+    logger.info('Payment #%s completed', payment_id)
+
+
+@task
+def delivery_status_changed(delivery_id, delivery_status):
+    from .models import Delivery, Driver
+
+    logger.info('Delivery #%s is now %s', delivery_id, delivery_status)
+    if delivery_status not in ('delivered', 'canceled'):
+        return
+    driver_id = Delivery.objects.filter(delivery_id=delivery_id).values_list('driver_id', flat=True).first()
+    if driver_id is None:
+        return
+    # Free the driver once they have nothing left on the road
+    still_busy = Delivery.objects.filter(
+        driver_id=driver_id, delivery_status__in=['assigned', 'on_the_way']
+    ).exists()
+    if not still_busy:
+        Driver.objects.filter(driver_id=driver_id, availability_status='busy').update(
+            availability_status='available'
+        )
+
+
+@task
+def record_order_sales(order_id=None, order_ids=()):
+    from .analytics import record_orders
+    from .recommendations import record_orders as record_pairs
+    from .stock import commit
+
+    order_ids = [order_id] if order_id is not None else list(order_ids)
+    record_orders(order_ids)
+    record_pairs(order_ids)
+    # Delivered orders can no longer give their stock back
+    commit(order_ids)
+
+
+@task
+def submit_payment(payment_id):
+    from .payments import submit_payment as submit
+
+    submit(payment_id)
+
+
+@on_give_up('submit_payment')
+def submit_payment_given_up(payment_id):
+    from .payments import submission_given_up
+
+    submission_given_up(payment_id)
@@ -1,3 +1,1369 @@
-from django.test import TestCase
+import signal
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    dispatch, eta, payments, profiling, promotions, recommendations, sync, tasks, transfer, usercache, zones,
+)
+from .archive import OrderHistoryPagination, archive_batch
+from .checks import check_payment_webhook_secret
+from .middleware import ScopedMiddleware
+from .online_schema import Backfill
+from .serializers import CreateOrderSerializer
+from .models import (
+    ArchivedOrder, ArchivedPromotionRedemption, BackfillProgress, Cart, CatalogChange, Delivery, DeliveryZoneCell, Driver,
+    EtaStat, ItemPairCount, Menu, MenuRecommendation, Order, OrderItem, Payment, PaymentWebhookEvent,
+    Promotion, PromotionRedemption, Restaurant, Review, Task, User,
+)
+
 
 # Create your tests here.
+class MenuStockConcurrencyTests(TransactionTestCase):
+    STOCK = 100
+    ORDERS = 300
+    THREADS = 16
+
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.item = Menu.objects.create(
+            restaurant=self.restaurant, item_name='برجر', price=Decimal('25.00'), stock=self.STOCK
+        )
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', name=f'user{i}', phone='1')
+            for i in range(self.THREADS)
+        ]
+
+    def place_orders(self, user, count, statuses):
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {
+            'restaurant': self.restaurant.pk,
+            'total_amount': '25.00',
+            'items': [{'menu_item': self.item.pk, 'quantity': 1, 'price': '25.00'}],
+        }
+        try:
+            for _ in range(count):
+                statuses.append(client.post('/api/orders/', payload, format='json').status_code)
+        finally:
+            connection.close()
+
+    def test_simultaneous_orders_never_oversell(self):
+        statuses = []
+        per_thread = self.ORDERS // self.THREADS
+        threads = [
+            threading.Thread(target=self.place_orders, args=(user, per_thread, statuses))
+            for user in self.users
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        placed = per_thread * self.THREADS
+        self.assertEqual(len(statuses), placed)
+        self.assertEqual(statuses.count(201), self.STOCK)
+        self.assertEqual(statuses.count(400), placed - self.STOCK)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 0)
+        self.assertEqual(self.item.availability_status, 'out_of_stock')
+        self.assertEqual(OrderItem.objects.filter(menu_item=self.item).count(), self.STOCK)
+        sys.stderr.write(
+            f'\n{placed} orders from {self.THREADS} threads in {elapsed:.2f} s '
+            f'({placed / elapsed:.0f} orders/s), {self.STOCK} accepted\n'
+        )
+
+    def test_cancel_releases_stock_once(self):
+        self.item.stock = 1
+        self.item.save()
+        statuses = []
+        self.place_orders(self.users[0], 2, statuses)
+        self.assertEqual(statuses, [201, 400])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.availability_status, 'out_of_stock')
+
+        order = Order.objects.get(user=self.users[0])
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.post(f'/api/orders/{order.pk}/cancel/').status_code, 200)
+        self.assertEqual(client.post(f'/api/orders/{order.pk}/cancel/').status_code, 400)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 1)
+        self.assertEqual(self.item.availability_status, 'available')
+
+    def test_editing_a_stale_item_keeps_the_reserved_stock(self):
+        stale = Menu.objects.get(pk=self.item.pk)
+        statuses = []
+        self.place_orders(self.users[0], 3, statuses)
+        self.assertEqual(statuses, [201] * 3)
+        stale.price = Decimal('30.00')
+        stale.save()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.stock, self.item.price), (self.STOCK - 3, Decimal('30.00')))
+
+        # Set on purpose, it is written
+        stale.stock = 50
+        stale.save()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 50)
+
+    def test_status_set_by_hand_is_kept(self):
+        # Taken off the menu while there is still stock
+        self.item.availability_status = 'out_of_stock'
+        self.item.save()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.availability_status, 'out_of_stock')
+
+        self.item.availability_status = 'available'
+        self.item.stock = 2
+        self.item.save()
+        statuses = []
+        self.place_orders(self.users[0], 1, statuses)
+        self.assertEqual(statuses, [201])
+        Menu.objects.filter(pk=self.item.pk).update(availability_status='out_of_stock')
+        order = Order.objects.get(user=self.users[0])
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.post(f'/api/orders/{order.pk}/cancel/').status_code, 200)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.stock, self.item.availability_status), (2, 'out_of_stock'))
+
+        # Restocked by hand from zero: back on the menu
+        Menu.objects.filter(pk=self.item.pk).update(stock=0)
+        self.item.stock = 5
+        self.item.save()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.availability_status, 'available')
+
+
+class PromotionUsageCapTests(TransactionTestCase):
+    MAX_USES = 20
+    ORDERS = 96
+    THREADS = 16
+
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.item = Menu.objects.create(restaurant=self.restaurant, item_name='برجر', price=Decimal('20.00'))
+        self.coupon = Promotion.objects.create(
+            name='خصم', kind='percent_off', restaurant=self.restaurant, code='SAVE10',
+            percent=Decimal('10'), max_uses=self.MAX_USES,
+        )
+        # Automatic, capped: orders past the cap still go through without it
+        self.bogo = Promotion.objects.create(
+            name='اثنان بسعر واحد', kind='buy_x_get_y', menu_item=self.item,
+            buy_quantity=1, free_quantity=1, max_uses=self.MAX_USES,
+        )
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', name=f'user{i}', phone='1')
+            for i in range(self.THREADS)
+        ]
+
+    def place_orders(self, user, count, results, coupon=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {
+            'restaurant': self.restaurant.pk,
+            'total_amount': '40.00',
+            'items': [{'menu_item': self.item.pk, 'quantity': 2, 'price': '20.00'}],
+        }
+        if coupon:
+            payload['coupon'] = coupon
+        try:
+            for _ in range(count):
+                response = client.post('/api/orders/', payload, format='json')
+                results.append((response.status_code, response.json()))
+        finally:
+            connection.close()
+
+    def test_simultaneous_checkouts_respect_caps(self):
+        results = []
+        per_thread = self.ORDERS // self.THREADS
+        threads = [
+            threading.Thread(target=self.place_orders, args=(user, per_thread, results, 'save10'))
+            for user in self.users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        statuses = [status for status, _ in results]
+        self.assertEqual(statuses.count(201), self.MAX_USES)
+        self.assertEqual(statuses.count(400), self.ORDERS - self.MAX_USES)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, self.MAX_USES)
+        self.assertEqual(PromotionRedemption.objects.filter(promotion=self.coupon).count(), self.MAX_USES)
+        # Every coupon order also got the item promotion: 40 - 20 free, then 10% of 20
+        self.assertEqual(
+            {(body['total_amount']) for status, body in results if status == 201}, {'18.00'}
+        )
+
+        results = []
+        self.place_orders(self.users[0], 1, results)
+        self.assertEqual(results[0][0], 201)
+        self.assertEqual(results[0][1]['total_amount'], '40.00')
+
+    def test_cancel_gives_back_the_use(self):
+        self.coupon.max_uses = 1
+        self.coupon.save()
+        results = []
+        self.place_orders(self.users[0], 2, results, 'SAVE10')
+        self.assertEqual([status for status, _ in results], [201, 400])
+
+        order = Order.objects.get(user=self.users[0])
+        self.assertEqual(order.discount_amount, Decimal('22.00'))
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.post(f'/api/orders/{order.pk}/cancel/').status_code, 200)
+        self.coupon.refresh_from_db()
+        self.bogo.refresh_from_db()
+        self.assertEqual((self.coupon.used_count, self.bogo.used_count), (0, 0))
+        self.assertFalse(PromotionRedemption.objects.exists())
+
+        results = []
+        self.place_orders(self.users[1], 1, results, 'SAVE10')
+        self.assertEqual(results[0][0], 201)
+
+    def test_prices_come_from_the_menu(self):
+        Promotion.objects.create(
+            name='نصف السعر', kind='percent_off', restaurant=self.restaurant, percent=Decimal('50'),
+        )
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        payload = {
+            'restaurant': self.restaurant.pk,
+            'total_amount': '10.00',
+            'items': [{'menu_item': self.item.pk, 'quantity': 1, 'price': '1000.00'}],
+        }
+        response = client.post('/api/orders/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+        payload['items'][0]['price'] = '20.00'
+        payload['total_amount'] = '999.00'
+        response = client.post('/api/orders/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        # The client's total is ignored: 20 at half price
+        self.assertEqual(response.json()['total_amount'], '10.00')
+        order = Order.objects.get()
+        self.assertEqual((order.total_amount, order.discount_amount), (Decimal('10.00'), Decimal('10.00')))
+
+    def test_changes_from_other_workers_recompile_the_index(self):
+        items = [{'menu_item': self.item, 'quantity': 2, 'price': Decimal('20.00')}]
+        self.assertEqual(promotions.quote(self.restaurant.pk, items).discount, Decimal('20.00'))
+        # Written by another process: no signal reaches this one
+        Promotion.objects.filter(pk=self.bogo.pk).update(is_active=False, updated_at=timezone.now())
+        self.assertEqual(promotions.quote(self.restaurant.pk, items).discount, Decimal('0'))
+        Promotion.objects.create(
+            name='ربع السعر', kind='percent_off', restaurant=self.restaurant, percent=Decimal('25'),
+        )
+        self.assertEqual(promotions.quote(self.restaurant.pk, items).discount, Decimal('10.00'))
+        Promotion.objects.filter(kind='percent_off', code__isnull=True).delete()
+        self.assertEqual(promotions.quote(self.restaurant.pk, items).discount, Decimal('0'))
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        usercache.local_cache.clear()
+        self.addCleanup(usercache.local_cache.clear)
+        self.user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_lru_evicts_oldest_and_expires(self):
+        lru = usercache.LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        expired = usercache.LRUCache(ttl=-1)
+        expired.set('a', 1)
+        self.assertIsNone(expired.get('a'))
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.05)
+            return {'built': True}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(usercache.get_or_build('test:key', build)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'built': True}] * 8)
+
+    def test_profile_is_served_from_cache_until_updated(self):
+        self.assertEqual(self.client.get('/api/profile/').json()['name'], 'diner')
+        # A write that skips the view is not seen: the cached copy answers
+        User.objects.filter(pk=self.user.pk).update(name='stale')
+        self.assertEqual(self.client.get('/api/profile/').json()['name'], 'diner')
+
+        self.client.put('/api/profile/', {'name': 'new'}, format='json')
+        self.assertEqual(self.client.get('/api/profile/').json()['name'], 'new')
+
+    def test_active_orders_follow_order_writes(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        menu = Menu.objects.create(restaurant=restaurant, item_name='برجر', price=Decimal('10.00'))
+        self.assertEqual(self.client.get('/api/orders/active/').json(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/orders/', {
+                'restaurant': restaurant.pk,
+                'items': [{'menu_item': menu.pk, 'quantity': 1, 'price': '10.00'}],
+            }, format='json')
+        order_id = Order.objects.get(user=self.user).pk
+        self.assertEqual([o['order_id'] for o in self.client.get('/api/orders/active/').json()], [order_id])
+
+        self.client.post(f'/api/orders/{order_id}/cancel/')
+        self.assertEqual(self.client.get('/api/orders/active/').json(), [])
+
+
+class ReviewTests(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.user, self.other = [
+            User.objects.create_user(email=f'reviewer{i}@example.com', name=f'reviewer{i}', phone='1')
+            for i in range(2)
+        ]
+        self.order = Order.objects.create(
+            user=self.user, restaurant=self.restaurant, total_amount=Decimal('25.00'), order_status='delivered'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, **data):
+        return self.client.post('/api/reviews/', {'restaurant': self.restaurant.pk, 'rating': 5, **data}, format='json')
+
+    def test_review_needs_an_order(self):
+        self.assertEqual(self.post().status_code, 400)
+        self.assertEqual(self.post(order=None).status_code, 400)
+        self.assertEqual(self.post(order=self.order.pk).status_code, 201)
+        self.assertEqual(self.post(order=self.order.pk).status_code, 400)
+        self.assertEqual(Review.objects.count(), 1)
+
+    def test_only_own_orders_and_order_is_fixed(self):
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.post(order=self.order.pk).status_code, 400)
+
+        self.client.force_authenticate(self.user)
+        review_id = self.post(order=self.order.pk).json()['review_id']
+        response = self.client.patch(f'/api/reviews/{review_id}/', {'order': None}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.patch(f'/api/reviews/{review_id}/', {'rating': 3}, format='json').status_code, 200)
+
+
+def busy(seconds):
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        sum(range(100))
+
+
+class ProfilingTests(TestCase):
+    ENABLED = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'INTERVAL_MS': 1, 'FLUSH_SECONDS': 0}
+
+    def setUp(self):
+        profiling.reset()
+        profiling.samplers.clear()
+        self.staff = User.objects.create_user(email='staff@example.com', name='staff', phone='1', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def sample(self, kind):
+        sampler = kind(0.001, 0.05, 64)
+        stacks = sampler.start(sys._getframe())
+        try:
+            busy(0.2)
+        finally:
+            sampler.stop()
+        return sampler, stacks
+
+    def test_signal_sampler(self):
+        with override_settings(PROFILING={'IDLE_SECONDS': 0.05}):
+            sampler, stacks = self.sample(profiling.SignalSampler)
+        self.assertGreater(sampler.samples, 0)
+        self.assertTrue(any('food_delivery.tests:busy' in stack for stack in stacks))
+        self.assertNotEqual(signal.getitimer(signal.ITIMER_PROF), (0.0, 0.0))
+        # Unprofiled CPU time past IDLE_SECONDS switches the timer off
+        busy(0.2)
+        self.assertEqual(signal.getitimer(signal.ITIMER_PROF), (0.0, 0.0))
+
+    def test_thread_sampler(self):
+        sampler, stacks = self.sample(profiling.ThreadSampler)
+        self.assertGreater(sum(stacks.values()), 0)
+        self.assertTrue(any('food_delivery.tests:busy' in stack for stack in stacks))
+
+    def test_middleware_groups_requests_by_route(self):
+        with override_settings(PROFILING=dict(self.ENABLED, MODE='thread'), RATE_LIMITS={}):
+            client = APIClient()
+            client.force_authenticate(self.staff)
+            for _ in range(3):
+                self.assertEqual(client.get('/api/restaurants/').status_code, 200)
+        self.assertEqual(profiling.profile.requests['GET api/restaurants/$'], 3)
+
+    def test_outputs(self):
+        profiling.profile.add('GET api/menus/$', {'a;b': 3, 'a;c': 1})
+        response = self.client.get('/api/manage/profile/')
+        self.assertEqual(response.status_code, 200)
+        route = response.json()['routes'][0]
+        self.assertEqual((route['route'], route['samples']), ('GET api/menus/$', 4))
+
+        response = self.client.get('/api/manage/profile/', {'output': 'collapsed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode(), 'GET api/menus/$;a;b 3\nGET api/menus/$;a;c 1\n')
+
+        response = self.client.get('/api/manage/profile/', {'output': 'flame'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['value'], 4)
+        self.assertEqual(response.json()['children'][0]['children'][0]['name'], 'a')
+
+        self.assertEqual(self.client.get('/api/manage/profile/', {'output': 'svg'}).status_code, 400)
+        self.assertEqual(self.client.delete('/api/manage/profile/').status_code, 204)
+        self.assertEqual(self.client.get('/api/manage/profile/').json()['routes'], [])
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(email='u@example.com', name='u', phone='1'))
+        self.assertEqual(self.client.get('/api/manage/profile/').status_code, 403)
+
+
+class CartTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.burger, self.fries = [
+            Menu.objects.create(restaurant=self.restaurant, item_name=name, price=price)
+            for name, price in [('برجر', Decimal('25.00')), ('بطاطس', Decimal('8.00'))]
+        ]
+        self.user = User.objects.create_user(email='cart@example.com', name='cart', phone='1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, menu, quantity=1):
+        return self.client.post('/api/cart/items/', {'menu_item': menu.pk, 'quantity': quantity}, format='json')
+
+    def test_add_patch_and_checkout(self):
+        self.assertEqual(self.add(self.burger, 2).status_code, 200)
+        response = self.add(self.fries)
+        self.assertEqual(response.json()['total'], '58.00')
+        response = self.client.patch(f'/api/cart/items/{self.fries.pk}/', {'quantity': 3}, format='json')
+        self.assertEqual(response.json()['total'], '74.00')
+        # Another worker, or a fresh client, sees the same cart: it lives in the database
+        self.assertEqual(Cart.objects.get(user=self.user).data['items'][str(self.fries.pk)]['quantity'], 3)
+
+        # Nothing changed since the items were added: the snapshot prices are
+        # used as they are, the menu rows are not read again
+        with mock.patch.object(CreateOrderSerializer, 'price_items', side_effect=AssertionError):
+            response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_amount'], '74.00')
+        self.assertEqual(OrderItem.objects.filter(order__user=self.user).count(), 2)
+        self.assertEqual(self.client.get('/api/cart/').json()['items'], [])
+        self.assertEqual(self.client.post('/api/cart/checkout/').status_code, 400)
+
+    def test_changed_price_returns_409_with_refreshed_cart(self):
+        self.add(self.burger)
+        self.burger.price = Decimal('30.00')
+        self.burger.save()
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['cart']['total'], '30.00')
+        self.assertFalse(Order.objects.exists())
+        # The refreshed snapshot was kept: the next checkout goes through at the new price
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_amount'], '30.00')
+
+    def checkout(self, statuses):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            statuses.append(client.post('/api/cart/checkout/').status_code)
+        finally:
+            connection.close()
+
+    def test_simultaneous_checkouts_place_one_order(self):
+        self.add(self.burger)
+        statuses = []
+        threads = [threading.Thread(target=self.checkout, args=(statuses,)) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses.count(201), 1)
+        self.assertEqual(statuses.count(400), self.THREADS - 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@override_settings(RATE_LIMITS={})
+class CatalogCacheTests(TestCase):
+    def test_change_from_another_process_retires_cached_responses(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        menu = Menu.objects.create(restaurant=restaurant, item_name='برجر', price=Decimal('25.00'))
+        client = APIClient()
+        self.assertEqual(client.get(f'/api/menus/{menu.pk}/').json()['price'], '25.00')
+
+        # Written by another worker or the task runner: only the rows reach
+        # this process, through the database
+        Menu.objects.filter(pk=menu.pk).update(price=Decimal('30.00'))
+        CatalogChange.objects.create(entity='menu', object_id=menu.pk, action='updated')
+        self.assertEqual(client.get(f'/api/menus/{menu.pk}/').json()['price'], '30.00')
+
+    def test_stock_is_not_public_and_links_keep_their_host(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        Menu.objects.bulk_create([
+            Menu(restaurant=restaurant, item_name=f'صنف {i}', price=Decimal('10.00'), stock=5) for i in range(21)
+        ])
+        client = APIClient()
+        first = client.get('/api/menus/', HTTP_HOST='a.example.com').json()
+        self.assertNotIn('stock', first['results'][0])
+        self.assertEqual(client.get('/api/menus/', {'fields': 'stock'}).status_code, 400)
+        self.assertTrue(first['next'].startswith('http://a.example.com/'))
+        second = client.get('/api/menus/', HTTP_HOST='b.example.com').json()
+        self.assertTrue(second['next'].startswith('http://b.example.com/'))
+
+
+@override_settings(RATE_LIMITS={})
+class CatalogSyncTests(TestCase):
+    URL = '/api/catalog/changes/'
+
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.client = APIClient()
+
+    def changed_ids(self, body, entity):
+        return {action: [row if action == 'deleted' else row['menu_id'] for row in rows]
+                for action, rows in body[entity].items()}
+
+    def test_pages_follow_seq_and_resume_from_the_cursor(self):
+        menus = [
+            Menu.objects.create(restaurant=self.restaurant, item_name=f'صنف {i}', price=Decimal('10.00'))
+            for i in range(3)
+        ]
+        first = self.client.get(self.URL, {'limit': 2}).json()
+        self.assertTrue(first['has_more'])
+        self.assertEqual([row['restaurant_id'] for row in first['restaurants']['created']], [self.restaurant.pk])
+        self.assertEqual(self.changed_ids(first, 'menus')['created'], [menus[0].pk])
+
+        # Changes made between polls come after the cursor, nothing is repeated
+        menus[0].price = Decimal('12.00')
+        menus[0].save()
+        second = self.client.get(self.URL, {'since': first['next'], 'limit': 10}).json()
+        self.assertFalse(second['has_more'])
+        self.assertEqual(self.changed_ids(second, 'menus'),
+                         {'created': [menus[1].pk, menus[2].pk], 'updated': [menus[0].pk], 'deleted': []})
+        self.assertEqual(second['restaurants'], {'created': [], 'updated': [], 'deleted': []})
+
+        third = self.client.get(self.URL, {'since': second['next']}).json()
+        self.assertEqual(third['next'], second['next'])
+        self.assertEqual(self.changed_ids(third, 'menus'), {'created': [], 'updated': [], 'deleted': []})
+
+    def test_deleted_rows_are_tombstones(self):
+        cursor = self.client.get(self.URL).json()['next']
+        kept, removed = [
+            Menu.objects.create(restaurant=self.restaurant, item_name=name, price=Decimal('10.00'))
+            for name in ('برجر', 'سلطة')
+        ]
+        removed_id = removed.pk
+        cursor_after_create = self.client.get(self.URL, {'since': cursor}).json()['next']
+        removed.delete()
+        # An update followed by a delete in the same page is only the tombstone
+        Menu.objects.filter(pk=kept.pk).update(price=Decimal('11.00'))
+        sync.record_changes('menu', [kept.pk], 'updated')
+        Menu.objects.filter(pk=kept.pk).delete()
+
+        body = self.client.get(self.URL, {'since': cursor_after_create}).json()
+        self.assertEqual(self.changed_ids(body, 'menus'),
+                         {'created': [], 'updated': [], 'deleted': [removed_id, kept.pk]})
+        # A client that missed the creation still gets the tombstone, never the row
+        body = self.client.get(self.URL, {'since': cursor}).json()
+        self.assertEqual(sorted(self.changed_ids(body, 'menus')['deleted']), sorted([kept.pk, removed_id]))
+        self.assertEqual(body['menus']['created'], [])
+
+    def test_invalid_limit_is_rejected(self):
+        self.assertEqual(self.client.get(self.URL, {'limit': 'ten'}).status_code, 400)
+        self.assertEqual(self.client.get(self.URL, {'limit': '10'}).status_code, 200)
+
+    def test_cursor_stops_before_a_recent_gap(self):
+        start = sync.decode_token(self.client.get(self.URL).json()['next'])
+        fries, burger = [
+            Menu.objects.create(restaurant=self.restaurant, item_name=name, price=Decimal('10.00'))
+            for name in ('بطاطس', 'برجر')
+        ]
+        # Seq start + 2 is taken by a transaction that hasn't committed yet
+        CatalogChange.objects.filter(entity='menu', object_id=burger.pk).update(seq=start + 3)
+        body = self.client.get(self.URL, {'since': sync.encode_token(start)}).json()
+        self.assertEqual([row['menu_id'] for row in body['menus']['created']], [fries.pk])
+        self.assertEqual(sync.decode_token(body['next']), start + 1)
+        self.assertFalse(body['has_more'])
+
+        # Once the gap is old it was a rollback: the cursor moves past it
+        CatalogChange.objects.filter(seq=start + 3).update(changed_at=timezone.now() - sync.GAP_GRACE * 2)
+        body = self.client.get(self.URL, {'since': body['next']}).json()
+        self.assertEqual([row['menu_id'] for row in body['menus']['created']], [burger.pk])
+        self.assertEqual(sync.decode_token(body['next']), start + 3)
+
+
+@override_settings(RATE_LIMITS={})
+class BulkMenuTests(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(email='staff@example.com', name='staff', phone='1', is_staff=True)
+        )
+
+    def item(self, name, price='10.00', restaurant=None):
+        return {'restaurant': restaurant or self.restaurant.pk, 'item_name': name, 'price': price}
+
+    def test_bulk_writes_are_all_or_nothing(self):
+        url = '/api/menus/bulk_create/'
+        response = self.client.post(url, [self.item('برجر'), self.item('بطاطس', price='abc')], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('price', response.json()[1])
+        response = self.client.post(url, [self.item('برجر'), self.item('سلطة', restaurant=999)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Menu.objects.exists())
+
+        response = self.client.post(url, [self.item('برجر'), self.item('بطاطس')], format='json')
+        self.assertEqual(response.status_code, 201)
+        burger, fries = Menu.objects.order_by('menu_id')
+        changes = [{'menu_id': burger.pk, 'price': '12.00'}, {'menu_id': 999, 'price': '1.00'}]
+        response = self.client.patch('/api/menus/bulk_update/', changes, format='json')
+        self.assertEqual((response.status_code, response.json()['menu_ids']), (404, [999]))
+        burger.refresh_from_db()
+        self.assertEqual(burger.price, Decimal('10.00'))
+
+        changes[1]['menu_id'] = fries.pk
+        self.assertEqual(self.client.patch('/api/menus/bulk_update/', changes, format='json').json(), {'updated': 2})
+        self.assertEqual(sorted(Menu.objects.values_list('price', flat=True)), [Decimal('1.00'), Decimal('12.00')])
+
+    def test_import_keeps_valid_rows_and_reports_the_rest(self):
+        body = '\n'.join([
+            'restaurant,item_name,price',
+            f'{self.restaurant.pk},برجر,10.00',
+            f'{self.restaurant.pk},بطاطس,abc',
+            '999,سلطة,5.00',
+            f'{self.restaurant.pk},عصير,4.00',
+        ])
+        upload = SimpleUploadedFile('menus.csv', body.encode())
+        response = self.client.post('/api/manage/import/menus/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['created'], report['failed'], report['errors_truncated']), (2, 2, False))
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+        self.assertEqual(set(Menu.objects.values_list('item_name', flat=True)), {'برجر', 'عصير'})
+        # Imported rows reach the delta sync like any other write
+        self.assertEqual(CatalogChange.objects.filter(entity='menu', action='created').count(), 2)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        self.burger, self.fries, self.salad = [
+            Menu.objects.create(restaurant=self.restaurant, item_name=name, price=Decimal('10.00'))
+            for name in ('برجر', 'بطاطس', 'سلطة')
+        ]
+
+    def deliver(self, *items):
+        order = Order.objects.create(
+            user=self.user, restaurant=self.restaurant, total_amount=Decimal('20.00'), order_status='delivered'
+        )
+        for item in items:
+            OrderItem.objects.create(order=order, menu_item=item, quantity=1, price=item.price)
+        return order.pk
+
+    def pair_count(self, item, other):
+        return ItemPairCount.objects.get(menu_item=item, other_item=other).order_count
+
+    def test_rebuild_keeps_archived_orders(self):
+        archive_batch([self.deliver(self.burger, self.fries) for _ in range(2)])
+        self.deliver(self.burger, self.salad)
+        self.deliver(self.burger, self.salad)
+
+        self.assertEqual(recommendations.rebuild(self.restaurant.pk), 4)
+        self.assertEqual(self.pair_count(self.burger, self.burger), 4)
+        self.assertEqual(self.pair_count(self.burger, self.fries), 2)
+        self.assertEqual(self.pair_count(self.burger, self.salad), 2)
+        self.assertEqual(
+            set(MenuRecommendation.objects.filter(menu_item=self.burger).values_list('recommended_id', flat=True)),
+            {self.fries.pk, self.salad.pk},
+        )
+
+    def test_rebuild_all_covers_fully_archived_restaurants(self):
+        archive_batch([self.deliver(self.burger, self.fries) for _ in range(2)])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(recommendations.rebuild_all(), 2)
+        self.assertEqual(self.pair_count(self.burger, self.fries), 2)
+        self.assertTrue(MenuRecommendation.objects.filter(menu_item=self.burger, recommended=self.fries).exists())
+
+    def test_recommendations_endpoint(self):
+        self.deliver(self.burger, self.fries)
+        self.deliver(self.burger, self.fries)
+        recommendations.rebuild(self.restaurant.pk)
+        client = APIClient()
+        response = client.get(f'/api/menus/{self.burger.pk}/recommendations/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['menu_id'] for row in response.json()], [self.fries.pk])
+        self.assertEqual(client.get('/api/menus/abc/recommendations/').status_code, 404)
+        self.assertEqual(client.get('/api/menus/999999/recommendations/').status_code, 404)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        self.driver = Driver.objects.create(name='سائق', phone='1', vehicle_type='Bike')
+        # The history's archived count is cached per user
+        cache.clear()
+        usercache.local_cache.clear()
+
+    def deliver(self, minutes):
+        order = Order.objects.create(
+            user=self.user, restaurant=self.restaurant, total_amount=Decimal('22.00'),
+            discount_amount=Decimal('5.00'), delivery_fee=Decimal('7.00'), order_status='delivered',
+        )
+        assigned_at = timezone.now() - timedelta(hours=1)
+        Delivery.objects.create(
+            order=order, driver=self.driver, delivery_status='delivered', assigned_at=assigned_at,
+            estimated_time=assigned_at, actual_time=assigned_at + timedelta(minutes=minutes),
+        )
+        return order
+
+    def test_archive_keeps_totals_redemptions_and_eta_observations(self):
+        promotion = Promotion.objects.create(name='خصم', kind='percent_off', percent=Decimal('10'))
+        order = self.deliver(30)
+        PromotionRedemption.objects.create(order=order, promotion=promotion, amount=Decimal('5.00'))
+        self.deliver(40)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive_batch([order.pk]), 1)
+        archived = ArchivedOrder.objects.get(pk=order.pk)
+        self.assertEqual((archived.discount_amount, archived.delivery_fee), (Decimal('5.00'), Decimal('7.00')))
+        self.assertEqual(
+            list(ArchivedPromotionRedemption.objects.values_list('order_id', 'promotion_id', 'amount')),
+            [(order.pk, promotion.pk, Decimal('5.00'))],
+        )
+
+        # The archived delivery still trains the ETA tables, in actual_time order
+        observations = list(eta.completed_deliveries())
+        self.assertEqual([(o[0], o[2], o[3]) for o in observations],
+                         [(self.restaurant.pk, 'bike', 1800), (self.restaurant.pk, 'bike', 2400)])
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/orders/', {'fields': 'order_id,archived,discount_amount'})
+        self.assertEqual(response.json()['results'][-1],
+                         {'order_id': order.pk, 'archived': True, 'discount_amount': '5.00'})
+
+
+    def test_history_pages_run_from_hot_into_archived_orders(self):
+        now = timezone.now()
+        ids = []
+        for age in range(5):
+            order = Order.objects.create(
+                user=self.user, restaurant=self.restaurant, total_amount=Decimal('10.00'), order_status='delivered'
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=age))
+            ids.append(order.pk)
+        # The three oldest go to the archive, newest first is still the order
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_batch(ids[2:])
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch.object(OrderHistoryPagination, 'page_size', 2):
+            pages = [client.get('/api/orders/', {'page': page}).json() for page in (1, 2, 3)]
+            self.assertEqual(client.get('/api/orders/', {'page': 4}).status_code, 404)
+            self.assertEqual(client.get('/api/orders/', {'page': 'x'}).status_code, 404)
+        self.assertEqual([page['count'] for page in pages], [5, 5, 5])
+        self.assertEqual([[o['order_id'] for o in page['results']] for page in pages], [ids[:2], ids[2:4], ids[4:]])
+        self.assertEqual([[o.get('archived', False) for o in page['results']] for page in pages],
+                         [[False, False], [True, True], [True]])
+        self.assertTrue(pages[0]['next'].endswith('page=2'))
+        self.assertIsNone(pages[2]['next'])
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+
+    def order_at(self, lat, lng, order_status='confirmed'):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي', latitude=lat, longitude=lng
+        )
+        return Order.objects.create(
+            user=self.user, restaurant=restaurant, total_amount=Decimal('20.00'), order_status=order_status
+        )
+
+    def driver_at(self, lat, lng, availability_status='available'):
+        return Driver.objects.create(
+            name='سائق', phone='1', vehicle_type='bike', latitude=lat, longitude=lng,
+            availability_status=availability_status,
+        )
+
+    def test_nearest_available_drivers_are_assigned_and_marked_busy(self):
+        north = self.order_at(24.80, 46.70)
+        south = self.order_at(24.60, 46.70)
+        self.order_at(24.70, 46.70, order_status='pending')
+        near_south = self.driver_at(24.61, 46.70)
+        near_north = self.driver_at(24.79, 46.70)
+        far = self.driver_at(21.50, 39.20)
+        offline = self.driver_at(24.70, 46.70, availability_status='offline')
+
+        deliveries = dispatch.dispatch_pending_orders()
+        self.assertEqual(
+            {(d.order_id, d.driver_id) for d in deliveries},
+            {(north.pk, near_north.pk), (south.pk, near_south.pk)},
+        )
+        self.assertTrue(all(d.assigned_at and d.estimated_time > d.assigned_at for d in deliveries))
+        self.assertEqual(
+            dict(Driver.objects.values_list('driver_id', 'availability_status')),
+            {near_south.pk: 'busy', near_north.pk: 'busy', far.pk: 'available', offline.pk: 'offline'},
+        )
+        # Both orders have a delivery now, and the far driver is out of range for new ones
+        self.order_at(24.70, 46.70)
+        self.assertEqual(dispatch.dispatch_pending_orders(), [])
+
+    def test_greedy_takes_the_cheapest_pairs_first(self):
+        cost = np.array([[1.0, 2.0], [0.5, np.inf], [np.inf, np.inf]])
+        self.assertEqual(dispatch.assign_greedy(cost), [(1, 0), (0, 1)])
+        self.assertEqual(dispatch.assign_greedy(np.empty((0, 3))), [])
+
+
+class ZoneIndexTests(TestCase):
+    def restaurant(self, zone):
+        return Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي', delivery_zone=zone
+        )
+
+    def test_points_on_cell_edges_match_the_polygon(self):
+        step = zones.CELL_SIZE_DEG
+        # A square whose sides lie on cell edges, and a triangle whose long side cuts across cells
+        square = self.restaurant([[24.60, 46.60], [24.60, 46.75], [24.75, 46.75], [24.75, 46.60]])
+        triangle = self.restaurant([[24.60, 46.60], [24.60, 46.80], [24.80, 46.60]])
+        self.assertTrue(DeliveryZoneCell.objects.filter(restaurant=square, full=True).exists())
+        self.assertTrue(DeliveryZoneCell.objects.filter(restaurant=triangle, full=False).exists())
+
+        # Every cell corner and edge midpoint around both zones, nudged to each side of the edge
+        for row in range(-2, 8):
+            for col in range(-2, 8):
+                for dlat, dlng in ((0, 0), (step / 2, 0), (0, step / 2)):
+                    for nudge in (-1e-7, 1e-7):
+                        lat = 24.60 + row * step / 2 + dlat + nudge
+                        lng = 46.60 + col * step / 2 + dlng - nudge
+                        expected = [
+                            r.pk for r in (square, triangle) if zones.contains(r.delivery_zone, lat, lng)
+                        ]
+                        with self.subTest(lat=lat, lng=lng):
+                            self.assertEqual(sorted(zones.restaurants_delivering_to(lat, lng)), expected)
+
+    def test_zone_change_replaces_the_cells(self):
+        restaurant = self.restaurant([[24.60, 46.60], [24.60, 46.65], [24.65, 46.65], [24.65, 46.60]])
+        self.assertEqual(zones.restaurants_delivering_to(24.62, 46.62), [restaurant.pk])
+        restaurant.delivery_zone = [[21.50, 39.10], [21.50, 39.20], [21.60, 39.20], [21.60, 39.10]]
+        restaurant.save(update_fields=['delivery_zone'])
+        self.assertEqual(zones.restaurants_delivering_to(24.62, 46.62), [])
+        self.assertEqual(zones.restaurants_delivering_to(21.55, 39.15), [restaurant.pk])
+
+
+class EtaTests(TestCase):
+    def test_table_smooths_sparse_cells_towards_coarser_means(self):
+        # Restaurant 1: many slow bike deliveries at 12h; restaurant 2: one fast one
+        table = eta.EtaTable({
+            (1, 12, 'bike'): (100, 100 * 3000.0),
+            (1, 12, 'car'): (100, 100 * 1500.0),
+            (2, 12, 'bike'): (1, 600.0),
+        })
+        bike_1, car_1, bike_2, unknown, other_hour = table.predict_seconds(
+            [1, 1, 2, 99, 1], [12, 12, 12, 12, 3], ['Bike', 'car', 'bike', 'bike', 'bike']
+        )
+        self.assertAlmostEqual(bike_1, 3000, delta=100)
+        self.assertAlmostEqual(car_1, 1500, delta=100)
+        # One observation barely moves the estimate away from its prior
+        self.assertGreater(bike_2, 1500)
+        self.assertLess(bike_2, 3000)
+        # Unknown restaurants fall back to the hour x vehicle mean
+        self.assertAlmostEqual(unknown, 3000, delta=150)
+        self.assertGreater(other_hour, 0)
+
+        empty = eta.EtaTable({})
+        self.assertEqual(empty.predict_seconds([1], [0], ['bike']).tolist(), [eta.DEFAULT_ETA_SECONDS])
+
+    def test_refreshed_stats_drive_new_estimates(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        driver = Driver.objects.create(name='سائق', phone='1', vehicle_type='bike')
+        assigned_at = timezone.now() - timedelta(hours=3)
+        for minutes in (20, 30, 40, 600):
+            order = Order.objects.create(user=user, restaurant=restaurant, total_amount=Decimal('20.00'))
+            Delivery.objects.create(
+                order=order, driver=driver, delivery_status='delivered', assigned_at=assigned_at,
+                estimated_time=assigned_at, actual_time=assigned_at + timedelta(minutes=minutes),
+            )
+        eta.invalidate()
+        self.addCleanup(eta.invalidate)
+        self.assertEqual(eta.refresh_stats(), 3)  # the 10 hour one is bad data
+        stat = EtaStat.objects.get()
+        self.assertEqual((stat.restaurant_id, stat.vehicle_type, stat.sample_count), (restaurant.pk, 'bike', 3))
+        self.assertEqual(stat.total_seconds, 90 * 60)
+
+        started_at = assigned_at.replace(minute=0)
+        estimated, = eta.predict_estimated_times([restaurant.pk], ['bike'], started_at=started_at)
+        # The only cell there is: its mean is also every prior it is smoothed towards
+        self.assertEqual(estimated - started_at, timedelta(minutes=30))
+
+
+class DriverSyncTests(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        customer = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        driver_user = User.objects.create_user(email='driver@example.com', name='driver', phone='1')
+        self.driver = Driver.objects.create(
+            user=driver_user, name='سائق', phone='1', vehicle_type='bike', availability_status='busy'
+        )
+        self.assigned_at = timezone.now() - timedelta(hours=2)
+        self.deliveries = []
+        for _ in range(3):
+            order = Order.objects.create(user=customer, restaurant=self.restaurant, total_amount=Decimal('20.00'))
+            self.deliveries.append(Delivery.objects.create(
+                order=order, driver=self.driver, assigned_at=self.assigned_at, estimated_time=self.assigned_at,
+            ))
+        self.client = APIClient()
+        self.client.force_authenticate(driver_user)
+
+    def sync(self, *updates):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/deliveries/sync/', {'updates': list(updates)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [row['result'] for row in response.json()['results']]
+
+    def delivered(self, delivery, minutes):
+        return {
+            'delivery_id': delivery.pk, 'delivery_status': 'delivered',
+            'recorded_at': (self.assigned_at + timedelta(minutes=minutes)).isoformat(),
+        }
+
+    def test_replayed_batch_changes_nothing(self):
+        first, second, _ = self.deliveries
+        other_driver = Driver.objects.create(name='آخر', phone='1', vehicle_type='car')
+        order = Order.objects.create(user=first.order.user, restaurant=self.restaurant, total_amount=Decimal('20.00'))
+        foreign = Delivery.objects.create(
+            order=order, driver=other_driver, assigned_at=self.assigned_at, estimated_time=self.assigned_at,
+        )
+        batch = [
+            {'delivery_id': first.pk, 'delivery_status': 'on_the_way'},
+            self.delivered(first, 30),
+            {'delivery_id': second.pk, 'delivery_status': 'canceled'},
+            {'delivery_id': foreign.pk, 'delivery_status': 'delivered'},
+        ]
+        self.assertEqual(self.sync(*batch), ['applied', 'applied', 'applied', 'not_found'])
+        first.refresh_from_db()
+        delivered_at = first.actual_time
+        self.assertEqual(delivered_at, self.assigned_at + timedelta(minutes=30))
+        self.assertEqual(Order.objects.get(pk=first.order_id).order_status, 'delivered')
+        tasks_after_first = Task.objects.count()
+
+        # The app timed out and sends the same batch again
+        self.assertEqual(self.sync(*batch), ['invalid_transition', 'unchanged', 'unchanged', 'not_found'])
+        first.refresh_from_db()
+        self.assertEqual(first.actual_time, delivered_at)
+        self.assertEqual(Task.objects.count(), tasks_after_first)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.delivery_status, 'assigned')
+
+    def test_late_sync_is_counted_and_every_finished_delivery_is_reported(self):
+        first, second, third = self.deliveries
+        self.sync(self.delivered(first, 40))
+        self.assertEqual(eta.refresh_stats(), 1)
+
+        # Offline for a while: the app reports older completions after the refresh
+        self.assertEqual(self.sync(self.delivered(second, 20), self.delivered(third, 30)), ['applied', 'applied'])
+        self.assertEqual(eta.refresh_stats(), 2)
+        self.assertEqual(eta.refresh_stats(), 0)
+        self.assertEqual(
+            sorted(Task.objects.filter(name='delivery_status_changed').values_list('payload__delivery_id', flat=True)),
+            [first.pk, second.pk, third.pk],
+        )
+        self.assertEqual(eta.refresh_stats(full=True), 3)
+
+
+class PaymentTests(TestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        user = User.objects.create_user(email='payer@example.com', name='payer', phone='1')
+        order = Order.objects.create(user=user, restaurant=restaurant, total_amount=Decimal('25.00'))
+        self.payment = Payment.objects.create(order=order, payment_method='card', amount=Decimal('25.00'))
+        self.addCleanup(setattr, payments, '_gateway', payments._gateway)
+
+    def test_submission_that_keeps_failing_goes_back_to_pending(self):
+        payments._gateway = payments.SimulatorGateway(latency_ms=0, failure_rate=1)
+        self.assertTrue(payments.request_payment(self.payment.pk))
+        task = Task.objects.get(name='submit_payment')
+        with self.assertLogs('food_delivery.tasks', 'ERROR'):
+            for _ in range(task.max_attempts):
+                self.assertFalse(tasks.run(task))
+        self.assertEqual(task.status, 'failed')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'pending')
+
+        # Requested again once the gateway is back
+        payments._gateway = payments.SimulatorGateway(latency_ms=0)
+        self.assertTrue(payments.request_payment(self.payment.pk))
+        self.assertTrue(tasks.run(Task.objects.get(name='submit_payment', status='queued')))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'completed')
+
+    def test_webhook_before_the_transaction_id_is_stored(self):
+        gateway = payments.SimulatorGateway(latency_ms=0, async_confirm=True)
+        transaction_ids = []
+
+        def submit(payment):
+            result = payments.SimulatorGateway.submit(gateway, payment)
+            transaction_ids.append(result.transaction_id)
+            # The gateway confirms before submit_payment has stored the id
+            self.assertEqual(payments.apply_webhook(result.transaction_id, 'completed'), 0)
+            return result
+
+        gateway.submit = submit
+        payments._gateway = gateway
+        payments.request_payment(self.payment.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(payments.submit_payment(self.payment.pk), 'processing')
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.transaction_id, self.payment.payment_status), (transaction_ids[0], 'completed'))
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+        self.assertTrue(Task.objects.filter(name='send_payment_receipt').exists())
+
+        # One that slipped past the replay is applied by the next reconciliation
+        PaymentWebhookEvent.objects.create(transaction_id=transaction_ids[0], status='refunded')
+        self.assertEqual(payments.reconcile_webhook_events(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'refunded')
+
+    def test_webhook_secret_is_required_to_serve(self):
+        with override_settings(PAYMENT_GATEWAY={'OPTIONS': {'webhook_secret': ''}}):
+            self.assertEqual([e.id for e in check_payment_webhook_secret(None)], ['food_delivery.E001'])
+        with override_settings(PAYMENT_GATEWAY={'OPTIONS': {'webhook_secret': 'secret'}}):
+            self.assertEqual(check_payment_webhook_secret(None), [])
+
+
+def rename_restaurant(restaurant_id, fail=False):
+    Restaurant.objects.filter(pk=restaurant_id).update(name='جديد')
+    if fail:
+        raise RuntimeError('handler failed')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.given_up = []
+        self.addCleanup(tasks._registry.pop, 'rename_restaurant', None)
+        self.addCleanup(tasks._give_up.pop, 'rename_restaurant', None)
+        tasks.task(rename_restaurant)
+        tasks.on_give_up('rename_restaurant')(lambda **payload: self.given_up.append(payload))
+
+    def test_claim_takes_due_tasks_once(self):
+        due = tasks.enqueue('rename_restaurant', restaurant_id=self.restaurant.pk)
+        later = tasks.enqueue('rename_restaurant', delay=timedelta(minutes=5), restaurant_id=self.restaurant.pk)
+        claimed = tasks.claim(batch_size=10)
+        self.assertEqual([t.pk for t in claimed], [due.pk])
+        self.assertEqual(claimed[0].status, 'running')
+        self.assertIsNotNone(claimed[0].locked_at)
+        self.assertEqual(tasks.claim(), [])
+
+        self.assertTrue(tasks.run(claimed[0]))
+        due.refresh_from_db()
+        self.assertEqual((due.status, due.attempts, due.locked_at), ('done', 1, None))
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.name, 'جديد')
+        later.refresh_from_db()
+        self.assertEqual(later.status, 'queued')
+        with self.assertRaises(tasks.UnknownTask):
+            tasks.enqueue('no_such_task')
+
+    def test_retries_back_off_until_max_attempts(self):
+        task_obj = tasks.enqueue('rename_restaurant', max_attempts=2, restaurant_id=self.restaurant.pk, fail=True)
+        before = timezone.now()
+        self.assertFalse(tasks.run(tasks.claim()[0]))
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts), ('queued', 1))
+        self.assertGreaterEqual(task_obj.run_after, before + timedelta(seconds=tasks.RETRY_BASE_SECONDS))
+        # Not due yet
+        self.assertEqual(tasks.claim(), [])
+
+        Task.objects.filter(pk=task_obj.pk).update(run_after=timezone.now())
+        with self.assertLogs('food_delivery.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(tasks.claim()[0]))
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts), ('failed', 2))
+        self.assertEqual(self.given_up, [{'restaurant_id': self.restaurant.pk, 'fail': True}])
+
+    def test_only_stale_running_tasks_are_requeued(self):
+        stale, fresh = [tasks.enqueue('rename_restaurant', restaurant_id=self.restaurant.pk) for _ in range(2)]
+        tasks.claim()
+        Task.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - tasks.LOCK_TIMEOUT * 2)
+        self.assertEqual(tasks.requeue_stale(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.attempts, stale.locked_at), ('queued', 1, None))
+        self.assertEqual(fresh.status, 'running')
+        self.assertEqual([t.pk for t in tasks.claim()], [stale.pk])
+
+    def test_failed_handler_leaves_no_writes(self):
+        task_obj = tasks.enqueue('rename_restaurant', restaurant_id=self.restaurant.pk, fail=True)
+        self.assertFalse(tasks.run(tasks.claim()[0]))
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.name, 'مطعم')
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts), ('queued', 1))
+        self.assertIn('handler failed', task_obj.last_error)
+
+    def test_stale_requeues_count_as_attempts(self):
+        task_obj = tasks.enqueue('rename_restaurant', max_attempts=2, restaurant_id=self.restaurant.pk)
+        for expected in ('queued', 'failed'):
+            tasks.claim()
+            # The worker died mid-run
+            Task.objects.filter(pk=task_obj.pk).update(locked_at=timezone.now() - tasks.LOCK_TIMEOUT * 2)
+            with self.assertLogs('food_delivery.tasks', 'ERROR') if expected == 'failed' else nullcontext():
+                tasks.requeue_stale()
+            task_obj.refresh_from_db()
+            self.assertEqual(task_obj.status, expected)
+        self.assertEqual(task_obj.attempts, 2)
+        self.assertEqual(self.given_up, [{'restaurant_id': self.restaurant.pk}])
+        self.assertEqual(tasks.claim(), [])
+
+
+class ThrottleTests(TestCase):
+    @override_settings(RATE_LIMITS={'catalog': '2/min'})
+    def test_forwarded_for_cannot_be_spoofed(self):
+        client = APIClient()
+
+        def get(forwarded_for):
+            return client.get('/api/restaurants/', HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+        # The client writes the first entries, the proxy appends the address it saw
+        self.assertEqual(get('198.51.100.1, 203.0.113.7'), 200)
+        self.assertEqual(get('198.51.100.2, 203.0.113.7'), 200)
+        self.assertEqual(get('198.51.100.3, 203.0.113.7'), 429)
+        self.assertEqual(get('203.0.113.8'), 200)
+
+
+class StatsTests(TestCase):
+    def test_hourly_stats_reject_impossible_dates(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create_user(email='staff@example.com', name='staff', phone='1', is_staff=True)
+        )
+        url = f'/api/restaurants/{restaurant.pk}/stats/hourly/'
+        self.assertEqual(client.get(url, {'date': '2024-02-29'}).status_code, 200)
+        self.assertEqual(client.get(url, {'date': '2024-02-30'}).status_code, 400)
+        self.assertEqual(client.get(url, {'date': 'yesterday'}).status_code, 400)
+
+    def test_unknown_restaurant_is_404(self):
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create_user(email='staff@example.com', name='staff', phone='1', is_staff=True)
+        )
+        for pk in ('999', 'abc'):
+            self.assertEqual(client.get(f'/api/restaurants/{pk}/stats/').status_code, 404)
+            self.assertEqual(client.get(f'/api/restaurants/{pk}/stats/hourly/').status_code, 404)
+
+
+class OrderExportTests(TestCase):
+    def test_export_rejects_impossible_bounds(self):
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create_user(email='staff@example.com', name='staff', phone='1', is_staff=True)
+        )
+        url = '/api/manage/export/orders/'
+        response = client.get(url, {'since': '2024-02-29T10:00:00'})
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+        self.assertEqual(client.get(url, {'since': '2024-02-30T10:00:00'}).status_code, 400)
+        self.assertEqual(client.get(url, {'until': 'soon'}).status_code, 400)
+        for since in ('2024-02-30T10:00:00', 'soon'):
+            with self.assertRaises(CommandError):
+                call_command('export_orders', since=since)
+
+    def test_export_includes_archived_orders(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        menu = Menu.objects.create(restaurant=restaurant, item_name='برجر', price=Decimal('10.00'))
+        user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        orders = []
+        for _ in range(4):
+            order = Order.objects.create(
+                user=user, restaurant=restaurant, total_amount=Decimal('10.00'), order_status='delivered'
+            )
+            OrderItem.objects.create(order=order, menu_item=menu, quantity=1, price=menu.price)
+            Payment.objects.create(order=order, payment_method='cash', amount=order.total_amount)
+            orders.append(order.pk)
+        archive_batch(orders[1::2])
+
+        rows = list(transfer.iter_order_rows(chunk_size=1))
+        self.assertEqual([row['order_id'] for row in rows], orders)
+        self.assertTrue(all(row['menu_item_id'] == menu.pk and row['payment_method'] == 'cash' for row in rows))
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        self.menu = Menu.objects.create(restaurant=restaurant, item_name='برجر', price=Decimal('25.00'))
+        self.user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        Order.objects.create(user=self.user, restaurant=restaurant, total_amount=Decimal('25.00'))
+
+    def test_unknown_fields_are_rejected(self):
+        client = APIClient()
+        response = client.get(f'/api/menus/{self.menu.pk}/', {'fields': 'item_name,pricee'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['fields'], ['pricee'])
+        response = client.get(f'/api/menus/{self.menu.pk}/', {'fields': 'item_name,price'})
+        self.assertEqual(response.json(), {'item_name': 'برجر', 'price': '25.00'})
+
+        # The order history answers hot and archived orders from one ?fields=
+        client.force_authenticate(self.user)
+        response = client.get('/api/orders/', {'fields': 'order_id,archived,delivery_fee'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['results'][0]), {'order_id', 'delivery_fee'})
+
+
+class ScopedMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='diner@example.com', name='diner', phone='1')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_admin_keeps_csrf_and_frame_options(self):
+        response = Client().get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('csrftoken', response.cookies)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        # CsrfViewMiddleware.process_view runs through ScopedMiddleware's hook
+        self.assertEqual(Client(enforce_csrf_checks=True).post('/admin/login/').status_code, 403)
+
+    def test_api_skips_the_browser_middleware(self):
+        response = Client().get('/api/profile/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertFalse(response.cookies)
+
+    def test_api_session_is_never_saved_and_user_comes_from_the_jwt(self):
+        seen = {}
+
+        def view(request):
+            request.session['cart'] = [1]
+            seen['user'] = request.user.pk
+            return HttpResponse()
+
+        middleware = ScopedMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.get('/api/anything/', HTTP_AUTHORIZATION=f'Bearer {self.token}'))
+        self.assertEqual(seen['user'], self.user.pk)
+        self.assertFalse(response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+        middleware(factory.get('/api/anything/', HTTP_AUTHORIZATION='Bearer junk'))
+        self.assertIsNone(seen['user'])
+
+        # Outside /api/ the same view gets the real session
+        response = middleware(factory.get('/anything/'))
+        self.assertIn('sessionid', response.cookies)
+        self.assertTrue(Session.objects.exists())
+
+
+class BackfillTests(TestCase):
+    def test_run_in_batches_and_resume(self):
+        restaurant = Restaurant.objects.create(
+            name='مطعم', address='الرياض', phone='0500000000', cuisine_type='شعبي'
+        )
+        menus = [
+            Menu.objects.create(restaurant=restaurant, item_name=f'صنف {i}', price=Decimal('10.00'))
+            for i in range(5)
+        ]
+        backfill = Backfill(
+            'test_menu_description', 'food_delivery.Menu', values={'description': 'جديد'},
+            where=Q(description=''), batch_size=2, pause=0, duty_cycle=1,
+        )
+
+        self.assertEqual(backfill.run(max_batches=1), 2)
+        progress = BackfillProgress.objects.get(name='test_menu_description')
+        self.assertEqual((progress.last_pk, progress.rows_updated), (menus[1].pk, 2))
+        self.assertIsNone(progress.finished_at)
+        self.assertEqual(Menu.objects.filter(description='جديد').count(), 2)
+
+        # Resumes after the saved key and finishes
+        self.assertEqual(backfill.run(), 3)
+        progress.refresh_from_db()
+        self.assertEqual(progress.rows_updated, 5)
+        self.assertIsNotNone(progress.finished_at)
+        self.assertFalse(Menu.objects.exclude(description='جديد').exists())
+        self.assertEqual(backfill.run(), 0)
+
+    def test_integer_primary_key_required(self):
+        with self.assertRaises(ValueError):
+            Backfill('test_sessions', 'sessions.Session', values={'expire_date': timezone.now()})
@@ -0,0 +1,118 @@
+# throttling.py (تحديد معدل الطلبات لكل مستخدم/عنوان IP ومسار)
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """``'120/min'`` -> ``(120, 60)``."""
+    count, period = rate.split('/')
+    return int(count), DURATIONS[period]
+
+
+class TokenBucketLimiter:
+    """In-process token buckets: O(1) per check, bounded number of keys.
+
+    Each key refills ``limit`` tokens per ``period`` seconds continuously,
+    so short bursts up to ``limit`` are allowed but the sustained rate is not.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period):
+        """Consume one token; return 0 if allowed, else seconds until the next token."""
+        now = time.monotonic()
+        rate = limit / period
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (limit, now))
+            tokens = min(limit, tokens + (now - last) * rate)
+            if tokens >= 1:
+                wait = 0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class SlidingWindowLimiter:
+    """Shared-cache sliding window counter, consistent across workers.
+
+    Uses the current and previous fixed windows weighted by overlap, which
+    needs two cache reads and one increment per check.
+    """
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        window = int(now // period)
+        current_key = f'rl:{key}:{window}'
+        previous_key = f'rl:{key}:{window - 1}'
+        counts = cache.get_many([current_key, previous_key])
+        elapsed = (now % period) / period
+        estimated = counts.get(previous_key, 0) * (1 - elapsed) + counts.get(current_key, 0)
+        if estimated >= limit:
+            return max(1, math.ceil(period * (1 - elapsed)))
+        if not cache.add(current_key, 1, period * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, period * 2)
+        return 0
+
+
+LIMITERS = {
+    'memory': TokenBucketLimiter,
+    'cache': SlidingWindowLimiter,
+}
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = LIMITERS[getattr(settings, 'RATE_LIMIT_BACKEND', 'memory')]()
+    return _limiter
+
+
+class RouteRateThrottle(BaseThrottle):
+    """Throttle keyed by (user or client IP, route).
+
+    The rate comes from ``settings.RATE_LIMITS[view.throttle_scope]``,
+    falling back to ``'default'``. Views whose scope maps to ``None`` are
+    not throttled.
+    """
+
+    def allow_request(self, request, view):
+        rates = getattr(settings, 'RATE_LIMITS', {})
+        scope = getattr(view, 'throttle_scope', None) or 'default'
+        rate = rates.get(scope, rates.get('default'))
+        if not rate:
+            return True
+        limit, period = parse_rate(rate)
+
+        if request.user and request.user.is_authenticated:
+            ident = f'u{request.user.pk}'
+        else:
+            ident = f'ip{self.get_ident(request)}'
+        route = f"{view.__class__.__name__}.{getattr(view, 'action', None) or request.method}"
+        self._wait = get_limiter().hit(f'{scope}:{ident}:{route}', limit, period)
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,227 @@
+# transfer.py (استيراد وتصدير البيانات بكميات كبيرة)
+import csv
+import heapq
+import io
+import json
+from itertools import islice
+from operator import itemgetter
+
+from django.db import transaction
+
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, Restaurant, Menu, Order, OrderItem, Payment,
+)
+from .serializers import RestaurantSerializer, BulkMenuCreateSerializer
+from . import sync
+from . import zones
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+# Keep error reports bounded for files that are wrong on every line
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ('csv', 'ndjson')
+
+IMPORT_KINDS = {
+    'restaurants': (Restaurant, RestaurantSerializer, 'restaurant'),
+    'menus': (Menu, BulkMenuCreateSerializer, 'menu'),
+}
+
+ORDER_EXPORT_FIELDS = [
+    'order_id', 'created_at', 'user_id', 'restaurant_id', 'order_status', 'total_amount',
+    'order_item_id', 'menu_item_id', 'quantity', 'price',
+    'payment_id', 'payment_method', 'payment_status', 'transaction_id', 'payment_amount', 'paid_at',
+]
+
+
+def guess_format(filename, default='csv'):
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return default
+
+
+def iter_records(lines, fmt):
+    """Yield ``(line_number, dict)`` from an iterable of text lines."""
+    if fmt == 'ndjson':
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            yield number, record if isinstance(record, dict) else ValueError('Expected a JSON object')
+    else:
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # CSV has no nulls: treat empty cells as absent
+            yield reader.line_num, {key: value for key, value in record.items() if value not in ('', None)}
+
+
+def decode_lines(binary_lines, encoding='utf-8-sig'):
+    for line in binary_lines:
+        yield line.decode(encoding) if isinstance(line, bytes) else line
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def _import_batch(kind, batch, report):
+    model, serializer_class, entity = IMPORT_KINDS[kind]
+    valid = []
+    for line, record in batch:
+        if isinstance(record, Exception):
+            report.add_error(line, {'non_field_errors': [str(record)]})
+            continue
+        serializer = serializer_class(data=record)
+        if serializer.is_valid():
+            valid.append((line, serializer.validated_data))
+        else:
+            report.add_error(line, serializer.errors)
+
+    if kind == 'menus' and valid:
+        # One existence check for every restaurant referenced by the batch
+        wanted = {data['restaurant_id'] for _, data in valid}
+        found = set(Restaurant.objects.filter(restaurant_id__in=wanted).values_list('restaurant_id', flat=True))
+        checked = []
+        for line, data in valid:
+            if data['restaurant_id'] in found:
+                checked.append((line, data))
+            else:
+                report.add_error(line, {'restaurant': ['مطعم غير موجود']})
+        valid = checked
+
+    if not valid:
+        return
+    with transaction.atomic():
+        objs = model.objects.bulk_create([model(**data) for _, data in valid], batch_size=IMPORT_BATCH_SIZE)
+        sync.record_changes(entity, [obj.pk for obj in objs], 'created')
+        if kind == 'restaurants':
+            # bulk_create skips the post_save signal that indexes delivery zones
+            zones.index_restaurants(objs)
+    report.created += len(objs)
+
+
+def import_records(kind, records, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and insert records in fixed-size batches; returns an ImportReport."""
+    report = ImportReport()
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return report
+        _import_batch(kind, batch, report)
+
+
+def _iter_table_rows(order_model, item_model, payment_model, since, until, chunk_size):
+    orders = order_model.objects.order_by('order_id').values(
+        'order_id', 'created_at', 'user_id', 'restaurant_id', 'order_status', 'total_amount'
+    )
+    if since:
+        orders = orders.filter(created_at__gte=since)
+    if until:
+        orders = orders.filter(created_at__lt=until)
+
+    last_id = 0
+    while True:
+        chunk = list(orders.filter(order_id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1]['order_id']
+        ids = [order['order_id'] for order in chunk]
+
+        items = {}
+        for item in item_model.objects.filter(order_id__in=ids).order_by('order_item_id').values(
+            'order_id', 'order_item_id', 'menu_item_id', 'quantity', 'price'
+        ):
+            items.setdefault(item.pop('order_id'), []).append(item)
+        payments = {
+            payment['order_id']: payment
+            for payment in payment_model.objects.filter(order_id__in=ids).values(
+                'order_id', 'payment_id', 'payment_method', 'payment_status', 'transaction_id',
+                'amount', 'paid_at',
+            )
+        }
+
+        for order in chunk:
+            payment = payments.get(order['order_id'], {})
+            base = dict(order)
+            base.update({
+                'payment_id': payment.get('payment_id'),
+                'payment_method': payment.get('payment_method'),
+                'payment_status': payment.get('payment_status'),
+                'transaction_id': payment.get('transaction_id'),
+                'payment_amount': payment.get('amount'),
+                'paid_at': payment.get('paid_at'),
+            })
+            for item in items.get(order['order_id']) or [{}]:
+                row = dict(base)
+                row.update(item)
+                yield row
+
+
+def iter_order_rows(since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one flat dict per order item (or per order without items).
+
+    Orders are read in primary-key ordered chunks, each followed by one query
+    for its items and one for its payments, so memory use does not grow with
+    the size of the table. Hot and archived orders are merged by order_id.
+    """
+    return heapq.merge(
+        _iter_table_rows(Order, OrderItem, Payment, since, until, chunk_size),
+        _iter_table_rows(ArchivedOrder, ArchivedOrderItem, ArchivedPayment, since, until, chunk_size),
+        key=itemgetter('order_id'),
+    )
+
+
+def _plain(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _json_value(value):
+    # Decimals stay strings so amounts keep their exact precision
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return _plain(value)
+
+
+def render_rows(rows, fmt, fields=ORDER_EXPORT_FIELDS):
+    """Turn dict rows into text chunks (one per row) in CSV or NDJSON."""
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps({field: _json_value(row.get(field)) for field in fields}, ensure_ascii=False) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow([_plain(row.get(field)) for field in fields])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
@@ -13,6 +13,14 @@ from .views import (
     DriverViewSet,
     DeliveryViewSet,
     ReviewViewSet,
+    CartView,
+    CartItemsView,
+    CartItemView,
+    CartCheckoutView,
+    CatalogChangesView,
+    CatalogImportView,
+    OrderExportView,
+    ProfileView,
 )
 
 router = DefaultRouter()
@@ -33,6 +41,20 @@ urlpatterns = [
     # User Profile
     path('profile/', UserProfileView.as_view(), name='profile'),
     
+    # Server-side cart
+    path('cart/', CartView.as_view(), name='cart'),
+    path('cart/items/', CartItemsView.as_view(), name='cart_items'),
+    path('cart/items/<int:menu_id>/', CartItemView.as_view(), name='cart_item'),
+    path('cart/checkout/', CartCheckoutView.as_view(), name='cart_checkout'),
+    
+    # Catalog delta sync
+    path('catalog/changes/', CatalogChangesView.as_view(), name='catalog_changes'),
+    
+    # Staff import / export
+    path('manage/import/<str:kind>/', CatalogImportView.as_view(), name='catalog_import'),
+    path('manage/export/orders/', OrderExportView.as_view(), name='order_export'),
+    path('manage/profile/', ProfileView.as_view(), name='profile_stacks'),
+    
     # API
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,162 @@
+# usercache.py (تخزين مؤقت لبيانات المستخدم الأكثر طلباً)
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+# Shared-cache lifetime; writes invalidate explicitly, this only bounds leaks
+SHARED_TTL = 300
+# In-process copies may trail another worker's invalidation by at most this long
+LOCAL_TTL = 5
+LOCAL_MAX_ENTRIES = 10000
+# Single-flight: how long a rebuild may hold the lock and how long others wait
+REBUILD_LOCK_TTL = 10
+REBUILD_WAIT = 0.5
+REBUILD_POLL = 0.02
+
+ACTIVE_ORDER_STATUSES = ['pending', 'confirmed', 'preparing', 'on_the_way']
+
+
+class LRUCache:
+    """Small thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, maxsize=LOCAL_MAX_ENTRIES, ttl=LOCAL_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LRUCache()
+
+# Striped locks keep memory bounded no matter how many users are cached
+_rebuild_locks = [threading.Lock() for _ in range(64)]
+
+
+def _key_lock(key):
+    return _rebuild_locks[hash(key) % len(_rebuild_locks)]
+
+
+def get_or_build(key, build):
+    """Two-tier read-through cache with single-flight rebuilds.
+
+    Inside a process one thread rebuilds a missing key while the others wait
+    on its lock; across processes a short ``cache.add`` lock lets one worker
+    rebuild while the rest poll briefly before giving up and building too.
+    """
+    value = local_cache.get(key)
+    if value is not None:
+        return value
+    value = cache.get(key)
+    if value is not None:
+        local_cache.set(key, value)
+        return value
+
+    with _key_lock(key):
+        value = local_cache.get(key)
+        if value is not None:
+            return value
+        lock_key = f'{key}:rebuild'
+        if not cache.add(lock_key, 1, REBUILD_LOCK_TTL):
+            deadline = time.monotonic() + REBUILD_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(REBUILD_POLL)
+                value = cache.get(key)
+                if value is not None:
+                    local_cache.set(key, value)
+                    return value
+        try:
+            value = build()
+            cache.set(key, value, SHARED_TTL)
+            local_cache.set(key, value)
+        finally:
+            cache.delete(lock_key)
+    return value
+
+
+def profile_key(user_id):
+    return f'user:{user_id}:profile'
+
+
+def active_orders_key(user_id):
+    return f'user:{user_id}:active_orders'
+
+
+def archived_orders_key(user_id):
+    return f'user:{user_id}:archived_orders'
+
+
+def _invalidate(keys):
+    for key in keys:
+        local_cache.delete(key)
+    cache.delete_many(keys)
+
+
+def invalidate_profile(user_id):
+    _invalidate([profile_key(user_id)])
+
+
+def invalidate_active_orders(*user_ids):
+    _invalidate([active_orders_key(user_id) for user_id in user_ids])
+
+
+def invalidate_archived_orders(*user_ids):
+    _invalidate([archived_orders_key(user_id) for user_id in user_ids])
+
+
+def get_profile(user):
+    from .serializers import UserSerializer
+
+    return get_or_build(profile_key(user.pk), lambda: dict(UserSerializer(user).data))
+
+
+def get_active_orders(user):
+    from .models import Order
+    from .serializers import OrderSerializer
+
+    def build():
+        orders = (
+            Order.objects.filter(user=user, order_status__in=ACTIVE_ORDER_STATUSES)
+            .select_related('user', 'restaurant')
+            .prefetch_related('items__menu_item')
+            .order_by('-created_at')
+        )
+        return [dict(row) for row in OrderSerializer(orders, many=True).data]
+
+    return get_or_build(active_orders_key(user.pk), build)
+
+
+def get_archived_order_count(user):
+    from .models import ArchivedOrder
+
+    return get_or_build(
+        archived_orders_key(user.pk), lambda: ArchivedOrder.objects.filter(user_id=user.pk).count()
+    )
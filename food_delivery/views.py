@@ -1,24 +1,50 @@
 # views.py
+from collections import Counter
+from django.db import IntegrityError, transaction
+from datetime import datetime, time, timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import CursorPagination
+from rest_framework.parsers import MultiPartParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from .models import *
 from .serializers import *
+from . import sync
+from . import analytics
+from . import transfer
+from . import payments
+from .driver_sync import apply_driver_sync
+from . import usercache
+from . import stock
+from . import zones
+from . import cart
+from . import profiling
+from . import promotions
+from .archive import OrderHistoryPagination
+from .sparse import SparseFieldsViewMixin
+from .compression import CachedCatalogMixin, cached_catalog_response
+from .tasks import enqueue_on_commit
 
 # Authentication Views
 class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'auth'
 
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'auth'
     
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -38,9 +64,7 @@ class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        serializer = UserSerializer(user)
-        return Response(serializer.data)
+        return Response(usercache.get_profile(request.user))
     
     def put(self, request):
         user = request.user
@@ -48,31 +72,178 @@ class UserProfileView(APIView):
         
         if serializer.is_valid():
             serializer.save()
+            usercache.invalidate_profile(user.pk)
             return Response(serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# Keyset pagination for the public review feed
+class ReviewFeedPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-created_at', '-review_id')
+    
+    # ?sort=top uses the stored ranking score instead of recency
+    ORDERINGS = {
+        'recent': ('-created_at', '-review_id'),
+        'top': ('-score', '-review_id'),
+    }
+
 # Restaurant ViewSet
-class RestaurantViewSet(viewsets.ModelViewSet):
+class RestaurantViewSet(CachedCatalogMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Restaurant.objects.all()
     serializer_class = RestaurantSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+    
+    # ?lat=&lng= يعرض فقط المطاعم التي توصل إلى هذه النقطة
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if self.action != 'list' or ('lat' not in params and 'lng' not in params):
+            return queryset
+        try:
+            lat, lng = float(params['lat']), float(params['lng'])
+        except (KeyError, ValueError):
+            raise ValidationError({'error': 'يجب إرسال lat و lng كأرقام'})
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({'error': 'الإحداثيات خارج النطاق'})
+        return queryset.filter(restaurant_id__in=zones.restaurants_delivering_to(lat, lng))
     
     @action(detail=True, methods=['get'])
     def menus(self, request, pk=None):
+        def render():
+            restaurant = self.get_object()
+            menus = Menu.objects.filter(restaurant=restaurant, availability_status='available').select_related('restaurant')
+            serializer = MenuSerializer(menus, many=True)
+            return Response(serializer.data)
+        return cached_catalog_response(request, render, self.get_renderer_context())
+    
+    # تقييمات المطعم العامة (الأحدث أو الأعلى ترتيباً)
+    @action(detail=True, methods=['get'])
+    def reviews(self, request, pk=None):
         restaurant = self.get_object()
-        menus = Menu.objects.filter(restaurant=restaurant, availability_status='available')
-        serializer = MenuSerializer(menus, many=True)
-        return Response(serializer.data)
+        sort = request.query_params.get('sort', 'recent')
+        if sort not in ReviewFeedPagination.ORDERINGS:
+            return Response({'error': 'قيمة sort غير صالحة'}, status=400)
+        paginator = ReviewFeedPagination()
+        paginator.ordering = ReviewFeedPagination.ORDERINGS[sort]
+        reviews = Review.objects.filter(restaurant=restaurant).select_related('user')
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        return paginator.get_paginated_response(RestaurantReviewSerializer(page, many=True).data)
+    
+    # إحصائيات المبيعات اليومية (تقرأ من الجداول المجمعة فقط)
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
+    def stats(self, request, pk=None):
+        restaurant = self.get_object()
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'قيمة days غير صالحة'}, status=400)
+        days = max(1, min(days, analytics.MAX_STATS_DAYS))
+        today = analytics.bucket_starts(timezone.now())['day']
+        end = today + timedelta(days=1)
+        return Response(analytics.restaurant_stats(restaurant.pk, 'day', end - timedelta(days=days), end))
+    
+    # إحصائيات المبيعات بالساعة ليوم واحد
+    @action(detail=True, methods=['get'], url_path='stats/hourly', permission_classes=[IsAdminUser])
+    def stats_hourly(self, request, pk=None):
+        restaurant = self.get_object()
+        day = request.query_params.get('date')
+        if day:
+            try:
+                # None when malformed, ValueError for an impossible date like 2024-02-30
+                parsed = parse_date(day)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                return Response({'error': 'التاريخ غير صالح'}, status=400)
+            start = timezone.make_aware(datetime.combine(parsed, time.min))
+        else:
+            start = analytics.bucket_starts(timezone.now())['day']
+        return Response(analytics.restaurant_stats(restaurant.pk, 'hour', start, start + timedelta(days=1)))
 
 # Menu ViewSet
-class MenuViewSet(viewsets.ModelViewSet):
+class MenuViewSet(CachedCatalogMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Menu.objects.all()
     serializer_class = MenuSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+    
+    # "يُطلب عادةً مع": الجيران المحسوبون مسبقاً، استعلام واحد على الفهرس
+    @action(detail=True, methods=['get'])
+    def recommendations(self, request, pk=None):
+        menu = self.get_object()
+        recommendations = (
+            MenuRecommendation.objects
+            .filter(menu_item=menu, recommended__availability_status='available')
+            .select_related('recommended')
+            .order_by('rank')
+        )
+        return Response(MenuRecommendationSerializer(recommendations, many=True).data)
+    
+    # Bulk endpoints: one validation query, one transaction and one
+    # change-log insert per batch instead of per item.
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_create(self, request):
+        serializer = BulkMenuCreateSerializer(data=request.data, many=True, max_length=MAX_BULK_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            menus = serializer.save()
+            sync.record_changes('menu', [menu.menu_id for menu in menus], 'created')
+        return Response(BulkMenuCreateSerializer(menus, many=True).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['patch'], permission_classes=[IsAdminUser])
+    def bulk_update(self, request):
+        serializer = BulkMenuUpdateSerializer(data=request.data, many=True, max_length=MAX_BULK_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        changes = serializer.validated_data
+        
+        with transaction.atomic():
+            menus = Menu.objects.select_for_update().in_bulk([change['menu_id'] for change in changes])
+            missing = [change['menu_id'] for change in changes if change['menu_id'] not in menus]
+            if missing:
+                return Response({'error': 'عناصر غير موجودة', 'menu_ids': missing}, status=404)
+            fields = set()
+            for change in changes:
+                menu = menus[change['menu_id']]
+                for field, value in change.items():
+                    if field != 'menu_id':
+                        setattr(menu, field, value)
+                        fields.add(field)
+            if fields:
+                Menu.objects.bulk_update(list(menus.values()), sorted(fields), batch_size=500)
+                sync.record_changes('menu', list(menus), 'updated')
+        return Response({'updated': len(menus) if fields else 0})
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_availability(self, request):
+        serializer = BulkAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        menus = Menu.objects.exclude(availability_status=data['availability_status'])
+        if data.get('menu_ids'):
+            menus = menus.filter(menu_id__in=data['menu_ids'])
+        if data.get('restaurant'):
+            menus = menus.filter(restaurant_id=data['restaurant'])
+        with transaction.atomic():
+            ids = list(menus.select_for_update().values_list('menu_id', flat=True))
+            updated = Menu.objects.filter(menu_id__in=ids).update(availability_status=data['availability_status'])
+            sync.record_changes('menu', ids, 'updated')
+        return Response({'updated': updated})
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_delete(self, request):
+        serializer = BulkMenuIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(), sync.batch_changes():
+            _, deleted = Menu.objects.filter(menu_id__in=serializer.validated_data['menu_ids']).delete()
+        return Response({'deleted': deleted.get(Menu._meta.label, 0)})
 
 # Order ViewSet
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
@@ -84,15 +255,39 @@ class OrderViewSet(viewsets.ModelViewSet):
             return CreateOrderSerializer
         return OrderSerializer
     
+    # الطلبات الحديثة أولاً ثم المؤرشفة عند تجاوز الصفحات الحديثة
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-created_at', '-order_id')
+        paginator = OrderHistoryPagination()
+        hot, archived = paginator.paginate_history(queryset, request)
+        context = self.get_serializer_context()
+        data = (
+            self.get_serializer(hot, many=True).data
+            + ArchivedOrderSerializer(archived, many=True, context=context).data
+        )
+        return paginator.get_paginated_response(data)
+    
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            order = serializer.save(user=self.request.user)
+            enqueue_on_commit('notify_order_created', order_id=order.order_id)
+            transaction.on_commit(lambda: usercache.invalidate_active_orders(order.user_id))
+    
+    # الطلبات الجارية للمستخدم (من الذاكرة المؤقتة)
+    @action(detail=False, methods=['get'])
+    def active(self, request):
+        return Response(usercache.get_active_orders(request.user))
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         order = self.get_object()
         if order.order_status in ['pending', 'confirmed']:
-            order.order_status = 'canceled'
-            order.save()
+            with transaction.atomic():
+                order.order_status = 'canceled'
+                order.save(update_fields=['order_status'])
+                stock.release(order)
+                promotions.release(order)
+            usercache.invalidate_active_orders(order.user_id)
             return Response({'message': 'تم إلغاء الطلب بنجاح'})
         return Response({'error': 'لا يمكن إلغاء الطلب حالياً'}, status=400)
     
@@ -103,8 +298,66 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer = OrderItemSerializer(items, many=True)
         return Response(serializer.data)
 
+# Cart Views (server-side cart, see cart.py)
+class CartView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response(cart.summary(cart.get_cart(request.user.pk)))
+    
+    def delete(self, request):
+        return Response(cart.summary(cart.clear(request.user.pk)))
+
+class CartItemsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = CartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            data = cart.add_item(
+                request.user.pk, serializer.validated_data['menu_item'], serializer.validated_data['quantity']
+            )
+        except cart.CartError as exc:
+            return Response({'error': str(exc)}, status=400)
+        return Response(cart.summary(data))
+
+class CartItemView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def patch(self, request, menu_id):
+        serializer = CartQuantitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            data = cart.update_quantity(request.user.pk, menu_id, serializer.validated_data['quantity'])
+        except cart.CartError as exc:
+            return Response({'error': str(exc)}, status=400)
+        return Response(cart.summary(data))
+    
+    def delete(self, request, menu_id):
+        try:
+            data = cart.update_quantity(request.user.pk, menu_id, 0)
+        except cart.CartError as exc:
+            return Response({'error': str(exc)}, status=400)
+        return Response(cart.summary(data))
+
+# إتمام الطلب من السلة: يعاد فحص العناصر التي تغيرت فقط
+class CartCheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        try:
+            order = cart.checkout(request.user.pk, coupon=str(request.data.get('coupon') or ''))
+        except cart.CartChanged as exc:
+            return Response({'error': str(exc), 'cart': cart.summary(exc.cart)}, status=status.HTTP_409_CONFLICT)
+        except cart.CartError as exc:
+            return Response({'error': str(exc)}, status=400)
+        enqueue_on_commit('notify_order_created', order_id=order.order_id)
+        usercache.invalidate_active_orders(order.user_id)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
 # Payment ViewSet
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [AllowAny]
     
@@ -118,16 +371,37 @@ class PaymentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def process_payment(self, request, pk=None):
         payment = self.get_object()
-        # هنا يمكنك إضافة منطق معالجة الدفع
-        payment.payment_status = 'completed'
-        payment.save()
-        return Response({'message': 'تمت معالجة الدفع بنجاح'})
+        # الإرسال لبوابة الدفع يتم في الخلفية، والنتيجة تصل عبر المهمة أو الـ webhook
+        if payments.request_payment(payment.payment_id):
+            return Response(
+                {'message': 'جاري معالجة الدفع', 'payment_status': 'processing'},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        return Response(
+            {'error': 'لا يمكن معالجة هذا الدفع', 'payment_status': payment.payment_status},
+            status=400,
+        )
+    
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny], authentication_classes=[],
+            throttle_classes=[])
+    def webhook(self, request):
+        gateway = payments.get_gateway()
+        if not gateway.verify_webhook(request.body, request.headers.get('X-Signature')):
+            return Response({'error': 'توقيع غير صالح'}, status=403)
+        transaction_id = request.data.get('transaction_id')
+        new_status = request.data.get('status')
+        try:
+            updated = payments.apply_webhook(transaction_id, new_status)
+        except ValueError:
+            return Response({'error': 'حالة غير صالحة'}, status=400)
+        return Response({'updated': updated})
 
 # Driver ViewSet
-class DriverViewSet(viewsets.ModelViewSet):
+class DriverViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
     
     @action(detail=False, methods=['get'])
     def available(self, request):
@@ -136,7 +410,7 @@ class DriverViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 # Delivery ViewSet
-class DeliveryViewSet(viewsets.ModelViewSet):
+class DeliveryViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = DeliverySerializer
     permission_classes = [IsAuthenticated]
     
@@ -156,19 +430,42 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         new_status = request.data.get('delivery_status')
         
         if new_status in dict(Delivery.DELIVERY_STATUS).keys():
-            delivery.delivery_status = new_status
-            if new_status == 'delivered':
-                delivery.actual_time = timezone.now()
-                # تحديث حالة الطلب أيضاً
-                delivery.order.order_status = 'delivered'
-                delivery.order.save()
-            delivery.save()
+            with transaction.atomic():
+                delivery.delivery_status = new_status
+                if new_status == 'delivered':
+                    delivery.actual_time = timezone.now()
+                    # تحديث حالة الطلب أيضاً
+                    delivery.order.order_status = 'delivered'
+                    delivery.order.save(update_fields=['order_status'])
+                delivery.save(update_fields=['delivery_status', 'actual_time'])
+                enqueue_on_commit(
+                    'delivery_status_changed',
+                    delivery_id=delivery.delivery_id,
+                    delivery_status=new_status,
+                )
+                order_user_id = delivery.order.user_id
+                transaction.on_commit(lambda: usercache.invalidate_active_orders(order_user_id))
             return Response({'message': 'تم تحديث حالة التوصيل'})
         
         return Response({'error': 'حالة غير صالحة'}, status=400)
+    
+    # مزامنة عدة تحديثات ومواقع من تطبيق السائق في طلب واحد
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        driver_id = Driver.objects.filter(user=request.user).values_list('driver_id', flat=True).first()
+        if driver_id is None:
+            return Response({'error': 'هذا الحساب ليس حساب سائق'}, status=403)
+        serializer = DriverSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_driver_sync(
+            driver_id,
+            serializer.validated_data.get('updates', []),
+            serializer.validated_data.get('locations', []),
+        )
+        return Response({'results': results})
 
 # Review ViewSet
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
     
@@ -176,4 +473,155 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return Review.objects.filter(user=self.request.user)
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        # The serializer checks for duplicates; the constraint catches races
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError({'order': 'لقد قمت بتقييم هذا الطلب مسبقاً'})
+    
+    # الإشادة بتقييم مفيد (مرة واحدة لكل مستخدم)
+    @action(detail=True, methods=['post'])
+    def helpful(self, request, pk=None):
+        review = get_object_or_404(Review.objects.only('review_id', 'user_id'), pk=pk)
+        if review.user_id == request.user.pk:
+            return Response({'error': 'لا يمكنك الإشادة بتقييمك'}, status=400)
+        try:
+            with transaction.atomic():
+                ReviewVote.objects.create(review_id=review.pk, user=request.user)
+                # Only this row is rescored; the feed index stays ordered
+                review = Review.objects.select_for_update().get(pk=review.pk)
+                review.helpful_count += 1
+                review.save(update_fields=['helpful_count'])
+        except IntegrityError:
+            return Response({'error': 'لقد أشدت بهذا التقييم مسبقاً'}, status=400)
+        return Response({'helpful_count': review.helpful_count})
+
+# Catalog Delta Sync View
+class CatalogChangesView(APIView):
+    permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+    
+    def get(self, request):
+        try:
+            since = sync.decode_token(request.query_params.get('since'))
+        except sync.InvalidSyncToken:
+            return Response({'error': 'رمز المزامنة غير صالح'}, status=400)
+        
+        try:
+            limit = int(request.query_params.get('limit', sync.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'قيمة limit غير صالحة'}, status=400)
+        limit = max(1, min(limit, sync.MAX_PAGE_SIZE))
+        
+        changes, last_seq, has_more = sync.collect_changes(since, limit)
+        
+        restaurant_ids = [pk for pk, action in changes['restaurant'].items() if action != 'deleted']
+        menu_ids = [pk for pk, action in changes['menu'].items() if action != 'deleted']
+        restaurants = Restaurant.objects.in_bulk(restaurant_ids)
+        menus = Menu.objects.select_related('restaurant').in_bulk(menu_ids)
+        
+        payload = {}
+        for entity, key, rows, serializer_class in (
+            ('restaurant', 'restaurants', restaurants, RestaurantSerializer),
+            ('menu', 'menus', menus, MenuSerializer),
+        ):
+            created, updated, deleted = [], [], []
+            for pk, action in changes[entity].items():
+                # A row updated and then removed later in the log is a tombstone
+                if action == 'deleted' or pk not in rows:
+                    deleted.append(pk)
+                elif action == 'created':
+                    created.append(rows[pk])
+                else:
+                    updated.append(rows[pk])
+            payload[key] = {
+                'created': serializer_class(created, many=True).data,
+                'updated': serializer_class(updated, many=True).data,
+                'deleted': deleted,
+            }
+        
+        payload['next'] = sync.encode_token(last_seq)
+        payload['has_more'] = has_more
+        return Response(payload)
+
+
+# Catalog Import View (staff only)
+class CatalogImportView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request, kind):
+        if kind not in transfer.IMPORT_KINDS:
+            return Response({'error': 'نوع غير مدعوم'}, status=404)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'يجب إرفاق ملف'}, status=400)
+        fmt = request.query_params.get('type') or transfer.guess_format(upload.name)
+        if fmt not in transfer.FORMATS:
+            return Response({'error': 'صيغة غير مدعومة'}, status=400)
+        
+        records = transfer.iter_records(transfer.decode_lines(upload), fmt)
+        report = transfer.import_records(kind, records)
+        return Response(report.as_dict(), status=201 if report.created else 400)
+
+# Sampling Profiler View (staff only)
+class ProfileView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    # ?output=collapsed نص للأداة flamegraph.pl، و ?output=flame شجرة JSON
+    # (not ?format=, which DRF keeps for renderer selection)
+    def get(self, request):
+        routes, requests, overhead = profiling.collect()
+        route = request.query_params.get('route')
+        fmt = request.query_params.get('output', 'summary')
+        if route is not None and route not in routes:
+            return Response({'error': 'لا توجد عينات لهذا المسار'}, status=404)
+        selected = {route: routes[route]} if route is not None else routes
+        if fmt == 'collapsed':
+            text = ''.join(profiling.collapsed(stacks, prefix=name) for name, stacks in selected.items())
+            return HttpResponse(text, content_type='text/plain; charset=utf-8')
+        if fmt == 'flame':
+            merged = Counter()
+            for name, stacks in selected.items():
+                merged.update({f'{name};{stack}' if stack else name: n for stack, n in stacks.items()})
+            return Response(profiling.flame_tree(merged))
+        if fmt != 'summary':
+            return Response({'error': 'صيغة غير مدعومة'}, status=400)
+        return Response({
+            'enabled': profiling.config('ENABLED'),
+            'sample_rate': profiling.config('SAMPLE_RATE'),
+            'overhead': overhead,
+            'routes': profiling.summary(selected, requests),
+        })
+    
+    def delete(self, request):
+        profiling.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+# Orders Export View (staff only, streamed)
+class OrderExportView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        fmt = request.query_params.get('type', 'csv')
+        if fmt not in transfer.FORMATS:
+            return Response({'error': 'صيغة غير مدعومة'}, status=400)
+        bounds = {}
+        for name in ('since', 'until'):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    bounds[name] = parse_datetime(value)
+                except ValueError:
+                    # Well-formed but impossible, like 2024-02-30T10:00
+                    bounds[name] = None
+                if bounds[name] is None:
+                    return Response({'error': f'قيمة {name} غير صالحة'}, status=400)
+        
+        response = StreamingHttpResponse(
+            transfer.render_rows(transfer.iter_order_rows(**bounds), fmt),
+            content_type='text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+        return response
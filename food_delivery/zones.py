@@ -0,0 +1,123 @@
+# zones.py (مناطق التوصيل: فهرس خلايا الشبكة واختبار النقطة داخل المضلع)
+import math
+
+from django.db import transaction
+
+from .models import DeliveryZoneCell, Restaurant
+
+# About 5.5 km north-south. Changing it needs `build_zone_index` to rerun.
+CELL_SIZE_DEG = 0.05
+COLUMNS = math.ceil(360 / CELL_SIZE_DEG) + 1
+MAX_VERTICES = 500
+
+
+def cell_key(lat, lng):
+    row = math.floor((lat + 90) / CELL_SIZE_DEG)
+    col = math.floor((lng + 180) / CELL_SIZE_DEG)
+    return row * COLUMNS + col
+
+
+def contains(polygon, lat, lng):
+    """Even-odd ray casting test for one point; ``polygon`` is ``[[lat, lng], ...]``."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        yi, xi = polygon[i]
+        yj, xj = polygon[j]
+        if (yi > lat) != (yj > lat) and lng < xi + (lat - yi) * (xj - xi) / (yj - yi):
+            inside = not inside
+        j = i
+    return inside
+
+
+def cover(polygon):
+    """Grid cells touched by a polygon as ``[(cell, full), ...]``.
+
+    A cell is kept when one of its corners is inside the polygon or the
+    polygon's boundary passes through it; it is ``full`` when all four
+    corners are inside and no boundary crosses it. Edges are sampled every
+    half cell, which catches every crossing that doesn't just clip a corner
+    (and a clipped corner is always caught by the corner test).
+    """
+    # numpy is heavy, keep it out of web worker startup
+    import numpy as np
+
+    vertices = np.asarray(polygon, dtype=np.float64)
+    lat, lng = vertices[:, 0], vertices[:, 1]
+    row0 = math.floor((lat.min() + 90) / CELL_SIZE_DEG)
+    row1 = math.floor((lat.max() + 90) / CELL_SIZE_DEG)
+    col0 = math.floor((lng.min() + 180) / CELL_SIZE_DEG)
+    col1 = math.floor((lng.max() + 180) / CELL_SIZE_DEG)
+
+    # Corners of every cell in the bounding box, tested against every edge at once
+    grid_lat = (np.arange(row0, row1 + 2) * CELL_SIZE_DEG - 90)[:, None]
+    grid_lng = (np.arange(col0, col1 + 2) * CELL_SIZE_DEG - 180)[None, :]
+    inside = np.zeros((len(grid_lat), grid_lng.shape[1]), dtype=bool)
+    next_lat, next_lng = np.roll(lat, -1), np.roll(lng, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for yi, xi, yj, xj in zip(lat, lng, next_lat, next_lng):
+            crosses = (yi > grid_lat) != (yj > grid_lat)
+            inside ^= crosses & (grid_lng < xi + (grid_lat - yi) * (xj - xi) / (yj - yi))
+
+    boundary = np.zeros((row1 - row0 + 1, col1 - col0 + 1), dtype=bool)
+    for yi, xi, yj, xj in zip(lat, lng, next_lat, next_lng):
+        steps = int(max(abs(yj - yi), abs(xj - xi)) / (CELL_SIZE_DEG / 2)) + 2
+        t = np.linspace(0, 1, steps)
+        rows = np.floor((yi + (yj - yi) * t + 90) / CELL_SIZE_DEG).astype(np.int64) - row0
+        cols = np.floor((xi + (xj - xi) * t + 180) / CELL_SIZE_DEG).astype(np.int64) - col0
+        boundary[rows, cols] = True
+
+    corners = (inside[:-1, :-1], inside[1:, :-1], inside[:-1, 1:], inside[1:, 1:])
+    touched = boundary | np.logical_or.reduce(corners)
+    full = ~boundary & np.logical_and.reduce(corners)
+    rows, cols = np.nonzero(touched)
+    keys = (rows + row0) * COLUMNS + cols + col0
+    return list(zip(keys.tolist(), full[rows, cols].tolist()))
+
+
+def index_restaurants(restaurants):
+    """Replace the zone cells of the given restaurants."""
+    restaurants = list(restaurants)
+    with transaction.atomic():
+        DeliveryZoneCell.objects.filter(restaurant__in=restaurants).delete()
+        DeliveryZoneCell.objects.bulk_create([
+            DeliveryZoneCell(cell=cell, restaurant_id=restaurant.pk, full=full)
+            for restaurant in restaurants if restaurant.delivery_zone
+            for cell, full in cover(restaurant.delivery_zone)
+        ], batch_size=2000)
+
+
+def rebuild_index(batch_size=1000):
+    """Re-index every restaurant, e.g. after CELL_SIZE_DEG changed. Returns the number indexed."""
+    DeliveryZoneCell.objects.all().delete()
+    total = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Restaurant.objects.filter(restaurant_id__gt=last_id, delivery_zone__isnull=False)
+            .order_by('restaurant_id').only('restaurant_id', 'delivery_zone')[:batch_size]
+        )
+        if not batch:
+            return total
+        index_restaurants(batch)
+        total += len(batch)
+        last_id = batch[-1].pk
+
+
+def restaurants_delivering_to(lat, lng):
+    """Ids of restaurants whose zone contains the point: one indexed cell lookup,
+    then the exact polygon test for cells on a zone's boundary."""
+    rows = DeliveryZoneCell.objects.filter(cell=cell_key(lat, lng)).values_list(
+        'restaurant_id', 'full', 'restaurant__delivery_zone'
+    )
+    return [restaurant_id for restaurant_id, full, zone in rows if full or contains(zone, lat, lng)]
+
+
+def circle(lat, lng, radius_km, vertices=16):
+    """Regular polygon approximating a delivery radius around a point."""
+    dlat = radius_km / 111.32
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return [
+        [round(lat + dlat * math.sin(a), 6), round(lng + dlng * math.cos(a), 6)]
+        for a in (2 * math.pi * i / vertices for i in range(vertices))
+    ]
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os  # ADD THIS LINE
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,7 +34,8 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # No autodiscover at startup; admin modules load on the first /admin/ request
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -55,21 +57,88 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'food_delivery.throttling.RouteRateThrottle',
+    ],
+    # Proxies in front of the app (Render's load balancer): anonymous clients
+    # are throttled by the address that hop saw, not by the X-Forwarded-For
+    # entries they can write themselves
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
+}
+
+# Rate limits per view throttle_scope, keyed by user (or IP) and route.
+# 'memory' limits per worker process; 'cache' shares counters through CACHES.
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMITS = {
+    'default': '300/min',
+    'catalog': '120/min',
+    'auth': '10/min',
+}
+
+# Shed non-critical requests with 503 when queue latency or in-flight load is too high
+LOAD_SHEDDING = {
+    'ENABLED': True,
+    'MAX_QUEUE_LATENCY_MS': 500,
+    'MAX_IN_FLIGHT': 0,  # 0 disables the in-flight check (sync workers serve one request)
+    'RETRY_AFTER': 5,
+    'CRITICAL_PATHS': ['/api/orders/', '/api/cart/checkout/', '/api/payments/', '/api/login/', '/api/token/refresh/', '/admin/'],
+}
+
+# gzip/Brotli (if the brotli package is installed). Public catalog responses are
+# compressed once and cached; other responses on the fly above MIN_SIZE bytes.
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'CACHE_MAX_BYTES': 64 * 1024 * 1024,
+    # Never compress responses that carry tokens (BREACH)
+    'EXCLUDE_PATHS': ['/api/login/', '/api/register/', '/api/token/refresh/'],
+}
+
+# Flat fee added to each order; free_delivery promotions waive it
+DELIVERY_FEE = os.environ.get('DELIVERY_FEE', '0.00')
+
+# Opt-in sampling profiler: stacks of SAMPLE_RATE of requests, grouped by route,
+# served at /api/manage/profile/. The sampler is capped at MAX_OVERHEAD of the process.
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING_ENABLED') == '1',
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01')),
+    'INTERVAL_MS': 5,
+    'MAX_OVERHEAD': 0.05,
 }
 
 # CHANGE ONLY THIS MIDDLEWARE SECTION:
 MIDDLEWARE = [
+    # First, so the sampled stacks include every other middleware
+    'food_delivery.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'food_delivery.middleware.LoadSheddingMiddleware',
+    'food_delivery.middleware.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # ADD THIS LINE
     'corsheaders.middleware.CorsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # The rest depends on the URL prefix, see SCOPED_MIDDLEWARE
+    'food_delivery.middleware.ScopedMiddleware',
 ]
 
+# Middleware only some URL prefixes need; the longest matching prefix wins.
+# The API authenticates with JWT alone, so it skips sessions, CSRF, messages
+# and X-Frame-Options. The admin and everything else ('') get the full stack.
+SCOPED_MIDDLEWARE = {
+    '/api/': [
+        'food_delivery.middleware.JWTUserMiddleware',
+    ],
+    '': [
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ],
+}
+
+# The admin's middleware checks only look at MIDDLEWARE; food_delivery/checks.py
+# checks SCOPED_MIDDLEWARE for /admin/ instead
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -77,6 +146,14 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',   # Add this line
 }
 
+# Payment gateway backend; the simulator needs no credentials
+PAYMENT_GATEWAY = {
+    'BACKEND': os.environ.get('PAYMENT_GATEWAY_BACKEND', 'food_delivery.payments.SimulatorGateway'),
+    'OPTIONS': {
+        'webhook_secret': os.environ.get('PAYMENT_WEBHOOK_SECRET', ''),
+    },
+}
+
 ROOT_URLCONF = 'food_delivery_project.urls'
 
 TEMPLATES = [
@@ -127,9 +204,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than shared in-memory DB, so threaded tests see real locking
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Test runs only: the threaded concurrency tests take the write lock at BEGIN
+# so their writers wait on the busy timeout instead of failing with
+# "database is locked" when a read transaction upgrades to a write
+if sys.argv[1:2] == ['test']:
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE', 'timeout': 20}
+
+
+# Cache
+# Shared across workers when REDIS_URL is set, per-process memory otherwise
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
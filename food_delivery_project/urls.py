@@ -14,10 +14,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path
 from django.urls import include 
+from django.utils.functional import cached_property
+
+
+class LazyAdminURLConf:
+    """Defers importing the admin and every app's admin.py until /admin/ is hit."""
+
+    @cached_property
+    def urlpatterns(self):
+        from django.contrib import admin
+
+        admin.autodiscover()
+        return admin.site.get_urls()
+
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('admin/', (LazyAdminURLConf(), 'admin', 'admin')),
     path('api/', include('food_delivery.urls')),    
 ]
@@ -15,6 +15,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_delivery_project.settings'
 
 application = get_wsgi_application()
 
+# Import the URLconf (views, serializers, DRF) now rather than on the first
+# request, so with gunicorn --preload the workers inherit it already loaded.
+from importlib import import_module
+from django.conf import settings
+import_module(settings.ROOT_URLCONF)
+
 # ADD THESE 2 LINES:
 from whitenoise import WhiteNoise
 application = WhiteNoise(application)
\ No newline at end of file
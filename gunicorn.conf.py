@@ -0,0 +1,42 @@
+# gunicorn.conf.py (إعدادات خادم الإنتاج)
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Load Django once in the master; workers fork with the code already imported
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+
+def on_starting(server):
+    # Unlike runserver, gunicorn runs no system checks: refuse to start on an
+    # error such as a missing PAYMENT_WEBHOOK_SECRET rather than serve 403s
+    import django
+    from django.core.management import call_command
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_delivery_project.settings')
+    django.setup()
+    call_command('check', deploy=True, fail_level='ERROR')
+
+
+def _close_shared_resources():
+    from django.core.cache import caches
+    from django.db import connections
+
+    connections.close_all()
+    caches.close_all()
+
+
+def pre_fork(server, worker):
+    # A socket opened in the master must never be shared by two workers
+    if preload_app:
+        _close_shared_resources()
+
+
+def post_fork(server, worker):
+    import random
+
+    # Forked workers would otherwise share the master's random state
+    random.seed()
+    if preload_app:
+        _close_shared_resources()